@@ -1,112 +1,146 @@
-# import sqlite3
-# import pandas as pd
-# import ast
-# import matplotlib.pyplot as plt
-# from sklearn.ensemble import IsolationForest
-# from sklearn.preprocessing import StandardScaler
-#
-# # Fechar todos os plots anteriores antes de rodar o script
-# plt.close('all')
-#
-# # Conectar ao banco de dados usando contexto para garantir o fechamento da conexão
-# db_path = '/Users/novaki/Documents/developer/inteligencia_artificial/device_logs.db'
-# with sqlite3.connect(db_path) as conn:
-#     # Carregar as tabelas no DataFrame
-#     cafeteira_log = pd.read_sql_query("SELECT * FROM CafeteiraLog", conn)
-#     geladeira_log = pd.read_sql_query("SELECT * FROM GeladeiraLog", conn)
-#     device_log = pd.read_sql_query("SELECT * FROM DeviceLog", conn)
-#
-# # Função para extrair o valor de cur_voltage e cur_current do campo 'status' e ajustar a escala
-# def extract_voltage_and_current(status_str):
-#     try:
-#         status_list = ast.literal_eval(status_str)
-#         voltages = [float(item['value']) / 10 for item in status_list if 'cur_voltage' in item.get('code', '')]
-#         currents = [float(item['value']) / 10 for item in status_list if 'cur_current' in item.get('code', '')]
-#         voltage = voltages[0] if voltages else None
-#         current = currents[0] if currents else None
-#         return pd.Series([voltage, current])
-#     except (ValueError, SyntaxError):
-#         return pd.Series([None, None])
-#
-# # Aplicar a função para extrair a voltagem e corrente em cada log
-# cafeteira_log[['voltage', 'current']] = cafeteira_log['status'].apply(extract_voltage_and_current)
-# geladeira_log[['voltage', 'current']] = geladeira_log['status'].apply(extract_voltage_and_current)
-# device_log[['voltage', 'current']] = device_log['status'].apply(extract_voltage_and_current)
-#
-# # Concatenar as tabelas em um único DataFrame e remover valores nulos de voltagem e corrente
-# all_logs = pd.concat([cafeteira_log, geladeira_log, device_log])
-# all_logs_clean = all_logs.dropna(subset=['voltage', 'current'])
-#
-# # Função para detectar anomalias com base nos limites ajustados para cada dispositivo
-# def detect_anomalies_by_device(logs, device_id):
-#     device_logs = logs[logs['device_id'] == device_id].copy()
-#
-#     if len(device_logs) < 10:
-#         print(f"Dispositivo {device_id} ignorado (menos de 10 logs).")
-#         return pd.DataFrame(), pd.DataFrame()
-#
-#     # Calcular a média da voltagem e corrente e os limites de anomalia para o dispositivo
-#     mean_voltage = device_logs['voltage'].mean()
-#     mean_current = device_logs['current'].mean()
-#     voltage_lower_limit = mean_voltage * 0.90
-#     voltage_upper_limit = mean_voltage * 1.10
-#     current_lower_limit = mean_current * 0.90
-#     current_upper_limit = mean_current * 1.10
-#
-#     # Normalizar os dados para detecção de anomalias
-#     scaler = StandardScaler()
-#     scaled_features = scaler.fit_transform(device_logs[['voltage', 'current']])
-#
-#     # Treinar o modelo de detecção de anomalias
-#     model = IsolationForest(contamination=0.05, random_state=42)
-#     device_logs['anomaly'] = model.fit_predict(scaled_features)
-#
-#     # Identificar anomalias
-#     anomalies = device_logs[device_logs['anomaly'] == -1]
-#
-#     # Filtrar anomalias baseadas na variação da média
-#     anomalies_filtered = anomalies[
-#         (anomalies['voltage'] < voltage_lower_limit) | (anomalies['voltage'] > voltage_upper_limit) |
-#         (anomalies['current'] < current_lower_limit) | (anomalies['current'] > current_upper_limit)
-#     ]
-#
-#     # Adicionar colunas de limites para visualização
-#     device_logs['voltage_lower_limit'] = voltage_lower_limit
-#     device_logs['voltage_upper_limit'] = voltage_upper_limit
-#     device_logs['current_lower_limit'] = current_lower_limit
-#     device_logs['current_upper_limit'] = current_upper_limit
-#
-#     return device_logs, anomalies_filtered
-#
-# # Obter os device_ids únicos e detectar anomalias para cada um
-# device_ids = all_logs_clean['device_id'].unique()
-#
-# for device_id in device_ids:
-#     device_logs, anomalies = detect_anomalies_by_device(all_logs_clean, device_id)
-#
-#     if not anomalies.empty:
-#         plt.figure(figsize=(12, 8))
-#
-#         # Plotar a voltagem
-#         plt.subplot(2, 1, 1)
-#         plt.plot(device_logs.index, device_logs['voltage'], label="Voltagem", color='blue')
-#         plt.axhline(y=device_logs['voltage_lower_limit'].iloc[0], color='red', linestyle='--', label=f'Limite Inferior de Voltagem ({device_logs["voltage_lower_limit"].iloc[0]:.1f}V)')
-#         plt.axhline(y=device_logs['voltage_upper_limit'].iloc[0], color='red', linestyle='--', label=f'Limite Superior de Voltagem ({device_logs["voltage_upper_limit"].iloc[0]:.1f}V)')
-#         plt.scatter(anomalies.index, anomalies['voltage'], color='orange', label='Anomalias de Voltagem')
-#         plt.title(f'Análise de Anomalias para o Device ID: {device_id}')
-#         plt.xlabel('Índice do Log')
-#         plt.ylabel('Voltagem (V)')
-#         plt.legend()
-#
-#         # Plotar a corrente
-#         plt.subplot(2, 1, 2)
-#         plt.plot(device_logs.index, device_logs['current'], label="Corrente", color='green')
-#         plt.axhline(y=device_logs['current_lower_limit'].iloc[0], color='purple', linestyle='--', label=f'Limite Inferior de Corrente ({device_logs["current_lower_limit"].iloc[0]:.1f}A)')
-#         plt.axhline(y=device_logs['current_upper_limit'].iloc[0], color='purple', linestyle='--', label=f'Limite Superior de Corrente ({device_logs["current_upper_limit"].iloc[0]:.1f}A)')
-#         plt.scatter(anomalies.index, anomalies['current'], color='red', label='Anomalias de Corrente')
-#         plt.xlabel('Índice do Log')
-#         plt.ylabel('Corrente (A)')
-#         plt.legend()
-#
-#         plt.tight_layout()
-#         plt.show()
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+
+from anomalia_ia_media_dispositivo import split_by_device
+from report import render_reports
+from telemetry_arrays import TelemetryArrays
+from telemetry_cache import load_telemetry, update_cache
+from telemetry_db import period_start, sync_telemetry
+
+# Caminho do banco de dados com os logs dos dispositivos
+db_path = '/Users/novaki/Documents/developer/inteligencia_artificial/device_logs.db'
+
+# Dispositivos analisados (None para todos) e período em dias até agora (None para todo o histórico)
+device_ids = None
+period_days = None
+
+# Pasta do cache com a telemetria de cada dispositivo em arquivos mapeados em memória, usado
+# quando o histórico completo é analisado (None consulta sempre a tabela de telemetria)
+cache_dir = '/Users/novaki/Documents/developer/inteligencia_artificial/telemetry_cache'
+
+# Pasta e formato ('png', 'svg' ou 'pdf') do relatório de anomalias; PNG e SVG são
+# renderizados em paralelo, o PDF é um único arquivo montado em um só processo
+report_dir = 'relatorio_anomalias_corrente'
+report_format = 'png'
+
+def load_logs(db_path, device_ids=device_ids, period_days=period_days, cache_dir=cache_dir):
+    """
+    Atualiza a tabela de telemetria e consulta os logs que têm voltagem e corrente.
+
+    Apenas os logs gravados desde a última execução são interpretados. O histórico
+    completo vem do cache em disco; a consulta de um dispositivo ou período usa o índice
+    (device_id, ts) e lê só a faixa correspondente.
+    Como antes, leituras sem timestamp entram na análise, exceto com period_days.
+
+    :param db_path: Caminho do banco SQLite com os logs
+    :param device_ids: Dispositivos a consultar (None para todos)
+    :param period_days: Quantidade de dias até agora (None para todo o histórico)
+    :param cache_dir: Pasta do cache de telemetria (None para não usar o cache)
+    :return: TelemetryArrays com voltage e current, agrupado por dispositivo
+    """
+    sync_telemetry(db_path)
+    if cache_dir is not None:
+        update_cache(db_path, cache_dir)
+    return load_telemetry(db_path, cache_dir, device_ids, start=period_start(period_days),
+                          fields=('voltage', 'current'))
+
+def compute_limits(voltages, currents):
+    """
+    Calcula os limites de ±10% da média de voltagem e de corrente de um dispositivo.
+
+    :param voltages: Array com as voltagens do dispositivo
+    :param currents: Array com as correntes do dispositivo
+    :return: Dicionário com os quatro limites
+    """
+    mean_voltage = voltages.mean()
+    mean_current = currents.mean()
+    return {
+        'voltage_lower_limit': mean_voltage * 0.90,
+        'voltage_upper_limit': mean_voltage * 1.10,
+        'current_lower_limit': mean_current * 0.90,
+        'current_upper_limit': mean_current * 1.10,
+    }
+
+# Função para detectar anomalias com base nos limites ajustados para cada dispositivo
+def detect_anomalies_by_device(logs, device_id, use_model=True):
+    """
+    Detecta anomalias conjuntas de voltagem e corrente de um dispositivo.
+
+    :param logs: DataFrame com device_id, voltage e current
+    :param device_id: Identificador do dispositivo
+    :param use_model: Se False, todas as leituras fora dos limites são anomalias, sem IsolationForest
+    :return: Tupla (logs do dispositivo, anomalias, dicionário com os limites)
+    """
+    if isinstance(logs, TelemetryArrays):
+        return _detect_device_anomalies(logs.frame_for(device_id), device_id, use_model)
+    return _detect_device_anomalies(logs[logs['device_id'] == device_id], device_id, use_model)
+
+def _detect_device_anomalies(device_logs, device_id, use_model=True):
+    if len(device_logs) < 10:
+        print(f"Dispositivo {device_id} ignorado (menos de 10 logs).")
+        return device_logs.iloc[:0], device_logs.iloc[:0], None
+
+    features = device_logs[['voltage', 'current']].to_numpy(dtype=float)
+    voltages = features[:, 0]
+    currents = features[:, 1]
+
+    # Os limites são escalares, calculados uma vez por dispositivo
+    limits = compute_limits(voltages, currents)
+    outside_limits = ((voltages < limits['voltage_lower_limit']) | (voltages > limits['voltage_upper_limit']) |
+                      (currents < limits['current_lower_limit']) | (currents > limits['current_upper_limit']))
+
+    if use_model and outside_limits.any():
+        # Normalizar os dados e treinar o modelo de detecção de anomalias
+        scaled_features = StandardScaler().fit_transform(features)
+        model = IsolationForest(contamination=0.05, random_state=42)
+        outside_limits &= model.fit_predict(scaled_features) == -1
+
+    return device_logs, device_logs[outside_limits], limits
+
+def detect_anomalies_all_devices(logs, use_model=True):
+    """
+    Detecta as anomalias de todos os dispositivos separando os logs com uma única ordenação.
+
+    :param logs: TelemetryArrays ou DataFrame com device_id, voltage e current
+    :param use_model: Se False, dispensa o IsolationForest e usa só os limites
+    :return: Lista de tuplas (device_id, device_logs, anomalies, limits)
+    """
+    return [(device_id, *_detect_device_anomalies(device_logs, device_id, use_model))
+            for device_id, device_logs in split_by_device(logs)]
+
+def main():
+    all_logs_clean = load_logs(db_path)
+
+    reports = []
+    for device_id, device_logs, anomalies, limits in detect_anomalies_all_devices(all_logs_clean):
+        if not anomalies.empty:
+            reports.append({
+                'device_id': device_id,
+                'title': f'Análise de Anomalias para o Device ID: {device_id}',
+                'panels': [
+                    # Voltagem
+                    {
+                        'x': device_logs['timestamp'], 'y': device_logs['voltage'], 'label': "Voltagem", 'color': 'blue',
+                        'limits': [(limits['voltage_lower_limit'], f'Limite Inferior de Voltagem ({limits["voltage_lower_limit"]:.1f}V)', 'red'),
+                                   (limits['voltage_upper_limit'], f'Limite Superior de Voltagem ({limits["voltage_upper_limit"]:.1f}V)', 'red')],
+                        'anomalies_x': anomalies['timestamp'], 'anomalies_y': anomalies['voltage'],
+                        'anomaly_label': 'Anomalias de Voltagem', 'anomaly_color': 'orange',
+                        'xlabel': 'Timestamp', 'ylabel': 'Voltagem (V)',
+                    },
+                    # Corrente
+                    {
+                        'x': device_logs['timestamp'], 'y': device_logs['current'], 'label': "Corrente", 'color': 'green',
+                        'limits': [(limits['current_lower_limit'], f'Limite Inferior de Corrente ({limits["current_lower_limit"]:.1f}A)', 'purple'),
+                                   (limits['current_upper_limit'], f'Limite Superior de Corrente ({limits["current_upper_limit"]:.1f}A)', 'purple')],
+                        'anomalies_x': anomalies['timestamp'], 'anomalies_y': anomalies['current'],
+                        'anomaly_label': 'Anomalias de Corrente', 'anomaly_color': 'red',
+                        'xlabel': 'Timestamp', 'ylabel': 'Corrente (A)',
+                    },
+                ],
+            })
+
+    paths = render_reports(reports, report_dir, fmt=report_format, figsize=(12, 8))
+    print(f"{len(reports)} dispositivos com anomalias; relatório salvo em: {', '.join(paths) or '-'}")
+
+if __name__ == '__main__':
+    main()
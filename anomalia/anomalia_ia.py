@@ -1,83 +1,277 @@
-import sqlite3
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
-import ast
-import matplotlib.pyplot as plt
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 
-# Fechar todos os plots anteriores antes de rodar o script
-plt.close('all')
+from report import render_reports
+from telemetry_arrays import TelemetryArrays
+from telemetry_cache import iter_telemetry, update_cache
+from telemetry_db import period_start, sync_telemetry
 
-# Conectar ao banco de dados usando contexto para garantir o fechamento da conexão
+# Caminho do banco de dados com os logs dos dispositivos
 db_path = '/Users/novaki/Documents/developer/inteligencia_artificial/device_logs.db'
-with sqlite3.connect(db_path) as conn:
-    # Carregar as tabelas no DataFrame
-    cafeteira_log = pd.read_sql_query("SELECT * FROM CafeteiraLog", conn)
-    geladeira_log = pd.read_sql_query("SELECT * FROM GeladeiraLog", conn)
-    device_log = pd.read_sql_query("SELECT * FROM DeviceLog", conn)
-
-# Função para extrair o valor de cur_voltage do campo 'status' e ajustar a escala
-def extract_voltage(status_str):
-    try:
-        status_list = ast.literal_eval(status_str)
-        voltages = [float(item['value']) / 10 for item in status_list if 'cur_voltage' in item.get('code', '')]
-        timestamps = [item['t'] for item in status_list if 'cur_voltage' in item.get('code', '')]
-        return voltages[0] if voltages else None, timestamps[0] if timestamps else None
-    except (ValueError, SyntaxError):
-        return None, None
 
-# Aplicar a função para extrair a voltagem e o timestamp em cada log
-cafeteira_log[['voltage', 'timestamp']] = cafeteira_log['status'].apply(lambda x: pd.Series(extract_voltage(x)))
-geladeira_log[['voltage', 'timestamp']] = geladeira_log['status'].apply(lambda x: pd.Series(extract_voltage(x)))
-device_log[['voltage', 'timestamp']] = device_log['status'].apply(lambda x: pd.Series(extract_voltage(x)))
+# Dispositivos analisados (None para todos) e período em dias até agora (None para todo o histórico)
+device_ids = None
+period_days = None
 
-# Concatenar as tabelas em um único DataFrame e remover valores nulos de voltagem
-all_logs = pd.concat([cafeteira_log, geladeira_log, device_log])
-all_logs_clean = all_logs.dropna(subset=['voltage', 'timestamp'])
+# Pasta do cache com a telemetria de cada dispositivo em arquivos mapeados em memória, usado
+# quando o histórico completo é analisado (None consulta sempre a tabela de telemetria)
+cache_dir = '/Users/novaki/Documents/developer/inteligencia_artificial/telemetry_cache'
 
-# Normalizar os dados
-scaler = StandardScaler()
-X = scaler.fit_transform(all_logs_clean[['voltage']])
+# Leituras usadas no treino (amostra uniforme de todo o período) e leituras por lote na predição
+sample_size = 200000
+chunk_size = 100000
 
-# Treinar o modelo de Isolation Forest
-model = IsolationForest(contamination=0.01)  # Define a taxa de contaminação esperada
-model.fit(X)
+# Taxa de contaminação esperada e semente da amostra e do modelo
+contamination = 0.01
+random_state = 42
 
-# Fazer previsões
-all_logs_clean['anomaly'] = model.predict(X)
+# Quantidade de processos usados na predição (None usa todos os núcleos)
+n_jobs = None
 
-# As anomalias são marcadas como -1
-anomalies = all_logs_clean[all_logs_clean['anomaly'] == -1]
+# Arquivo CSV com o escore de cada leitura, gravado lote a lote (None não grava)
+scores_path = 'escores_anomalia_global.csv'
 
-# Agrupar por timestamp para verificar anomalias simultâneas
 # Define a janela de tempo (em milissegundos) para considerar como "aproximado"
 time_window = 60000  # 60 segundos
 
+# Pasta e formato ('png', 'svg' ou 'pdf') do relatório de anomalias; PNG e SVG são
+# renderizados em paralelo, o PDF é um único arquivo montado em um só processo
+report_dir = 'relatorio_anomalias_simultaneas'
+report_format = 'png'
+
+def iter_logs(db_path, device_ids=device_ids, period_days=period_days, chunk_size=chunk_size, cache_dir=cache_dir):
+    """
+    Percorre as leituras com voltagem e timestamp em lotes, sem carregar o período inteiro
+    na memória: o histórico completo vem do cache (já atualizado), um dispositivo ou
+    período vem da tabela de telemetria.
+
+    :param db_path: Caminho do banco SQLite com os logs
+    :param device_ids: Dispositivos a consultar (None para todos)
+    :param period_days: Quantidade de dias até agora (None para todo o histórico)
+    :param chunk_size: Número máximo de linhas por lote
+    :param cache_dir: Pasta do cache de telemetria (None para não usar o cache)
+    :return: Gerador de DataFrames com source, rowid, device_id, voltage e timestamp
+    """
+    for chunk in iter_telemetry(db_path, cache_dir, chunk_size, device_ids, start=period_start(period_days),
+                                fields=('voltage',)):
+        chunk = chunk.dropna(subset=['voltage', 'timestamp'])
+        if not chunk.empty:
+            yield chunk
+
+
+def reservoir_sample(chunks, sample_size, random_state=None):
+    """
+    Sorteia uma amostra uniforme de tamanho fixo de uma sequência de lotes, sem saber o
+    total de antemão (algoritmo R, aplicado a um lote inteiro de cada vez).
+
+    :param chunks: Iterável de arrays com os valores
+    :param sample_size: Tamanho da amostra
+    :param random_state: Semente do sorteio
+    :return: Array com min(sample_size, total de valores) valores
+    """
+    rng = np.random.default_rng(random_state)
+    reservoir = np.empty(sample_size)
+    seen = 0
+
+    for values in chunks:
+        values = np.asarray(values, dtype=float)
+
+        # Enquanto a amostra não está cheia, os valores entram direto
+        fill = min(len(values), max(sample_size - seen, 0))
+        reservoir[seen:seen + fill] = values[:fill]
+
+        rest = values[fill:]
+        if len(rest):
+            # O valor de posição global i substitui uma posição sorteada em [0, i] se ela
+            # cair dentro da amostra; com posições repetidas vale o último, como no laço
+            positions = seen + fill + np.arange(len(rest))
+            slots = rng.integers(0, positions + 1)
+            keep = np.flatnonzero(slots < sample_size)[::-1]
+            slots, first = np.unique(slots[keep], return_index=True)
+            reservoir[slots] = rest[keep[first]]
+
+        seen += len(values)
+
+    return reservoir[:min(seen, sample_size)]
+
+
+def fit_global_model(sample, contamination=contamination, random_state=random_state):
+    """
+    Treina o escalonador e o IsolationForest na amostra e calibra o limite de anomalia.
+
+    O limite é o quantil 'contamination' dos escores da própria amostra: com a mesma
+    semente, a fração de leituras marcadas fica estável entre execuções.
+
+    :param sample: Array com as voltagens da amostra
+    :param contamination: Fração esperada de anomalias
+    :param random_state: Semente do IsolationForest
+    :return: Dicionário com 'scaler', 'model' e 'threshold' (escores abaixo dele são anomalias)
+    """
+    scaler = StandardScaler()
+    X = scaler.fit_transform(sample.reshape(-1, 1))
+
+    model = IsolationForest(contamination=contamination, random_state=random_state)
+    model.fit(X)
+
+    threshold = float(np.quantile(model.score_samples(X), contamination))
+    return {'scaler': scaler, 'model': model, 'threshold': threshold}
+
+
+def _score_values(global_model, voltage):
+    return global_model['model'].score_samples(global_model['scaler'].transform(voltage.reshape(-1, 1)))
+
+
+_worker_model = None
+
+
+def _init_worker(global_model):
+    # O modelo é enviado uma vez para cada processo, e não a cada lote
+    global _worker_model
+    _worker_model = global_model
+
+
+def _score_in_worker(voltage):
+    return _score_values(_worker_model, voltage)
+
+
+def score_chunks(global_model, chunks, n_jobs=None, scores_path=None):
+    """
+    Calcula o escore de cada lote, distribuindo os lotes entre processos.
+
+    Só as voltagens vão para os processos, e poucos lotes ficam em andamento ao mesmo
+    tempo, então a memória não cresce com o histórico. Os escores são gravados no CSV à
+    medida que os lotes terminam, na ordem de leitura, e apenas as anomalias são mantidas.
+
+    :param global_model: Dicionário retornado por fit_global_model
+    :param chunks: Iterável de DataFrames com a coluna 'voltage'
+    :param n_jobs: Número de processos (None usa todos os núcleos, 1 roda no processo atual)
+    :param scores_path: CSV com os escores de todas as leituras (opcional)
+    :return: DataFrame com as anomalias e a coluna 'score'
+    """
+    workers = n_jobs or os.cpu_count() or 1
+    anomalies = []
+    scores_file = open(scores_path, 'w', newline='') if scores_path else None
+
+    def collect(chunk, scores):
+        chunk = chunk.assign(score=scores)
+        if scores_file is not None:
+            chunk.to_csv(scores_file, header=scores_file.tell() == 0, index=False)
+        anomalies.append(chunk[scores < global_model['threshold']])
+
+    try:
+        if workers == 1:
+            for chunk in chunks:
+                collect(chunk, _score_values(global_model, chunk['voltage'].to_numpy(dtype=float)))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(global_model,)) as executor:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append((chunk, executor.submit(_score_in_worker, chunk['voltage'].to_numpy(dtype=float))))
+                    if len(pending) >= 2 * workers:
+                        chunk, future = pending.popleft()
+                        collect(chunk, future.result())
+                while pending:
+                    chunk, future = pending.popleft()
+                    collect(chunk, future.result())
+    finally:
+        if scores_file is not None:
+            scores_file.close()
+
+    if not anomalies:
+        return pd.DataFrame(columns=['source', 'rowid', 'device_id', 'voltage', 'timestamp', 'score'])
+    return pd.concat(anomalies, ignore_index=True)
+
+
 def find_simultaneous_anomalies(anomalies, time_window):
-    anomalies_sorted = anomalies.sort_values(by='timestamp')
-    simultaneous_anomalies = []
-
-    for i, row in anomalies_sorted.iterrows():
-        start_time = row['timestamp']
-        end_time = start_time + time_window
-        time_range_anomalies = anomalies_sorted[(anomalies_sorted['timestamp'] >= start_time) & (anomalies_sorted['timestamp'] <= end_time)]
-        simultaneous_anomalies.append(time_range_anomalies)
-
-    return pd.concat(simultaneous_anomalies).drop_duplicates()
-
-simultaneous_anomalies = find_simultaneous_anomalies(anomalies, time_window)
-
-# Visualização das anomalias simultâneas
-for device_id in simultaneous_anomalies['device_id'].unique():
-    device_logs = all_logs_clean[all_logs_clean['device_id'] == device_id]
-    device_anomalies = simultaneous_anomalies[simultaneous_anomalies['device_id'] == device_id]
-
-    if not device_anomalies.empty:
-        plt.figure(figsize=(12, 6))
-        plt.plot(device_logs['timestamp'], device_logs['voltage'], label="Voltagem", color='blue')
-        plt.scatter(device_anomalies['timestamp'], device_anomalies['voltage'], color='red', label='Anomalias')
-        plt.title(f'Análise de Anomalias Simultâneas para o Device ID: {device_id}')
-        plt.xlabel('Timestamp')
-        plt.ylabel('Voltagem (V)')
-        plt.legend()
-        plt.show()
+    """
+    Agrupa as anomalias próximas no tempo com uma varredura linear sobre os timestamps ordenados.
+
+    Cada anomalia abre uma janela [timestamp, timestamp + time_window]; janelas que se
+    sobrepõem formam um mesmo cluster. O conjunto de anomalias retornado é o mesmo da
+    versão anterior (ordenado por timestamp e sem linhas duplicadas).
+
+    :param anomalies: DataFrame com as anomalias (colunas 'timestamp' e 'device_id')
+    :param time_window: Tamanho da janela em milissegundos
+    :return: Tupla (anomalias com as colunas 'cluster_id' e 'window_count',
+             DataFrame por cluster com window_start, window_end, n_anomalies e devices)
+    """
+    anomalies_sorted = anomalies.sort_values(by='timestamp', kind='mergesort').drop_duplicates()
+    timestamps = anomalies_sorted['timestamp'].to_numpy(dtype=float)
+
+    # Quantidade de anomalias dentro da janela aberta por cada anomalia
+    window_end_idx = np.searchsorted(timestamps, timestamps + time_window, side='right')
+    window_count = window_end_idx - np.arange(len(timestamps))
+
+    # Um novo cluster começa quando a anomalia cai fora da janela da anterior
+    new_cluster = np.ones(len(timestamps), dtype=bool)
+    new_cluster[1:] = np.diff(timestamps) > time_window
+    cluster_ids = np.cumsum(new_cluster) - 1
+
+    anomalies_sorted = anomalies_sorted.assign(cluster_id=cluster_ids, window_count=window_count)
+
+    grouped = anomalies_sorted.groupby('cluster_id')
+    clusters = grouped.agg(
+        window_start=('timestamp', 'min'),
+        window_end=('timestamp', 'max'),
+        n_anomalies=('timestamp', 'size'),
+    )
+    # O fim do cluster é o fim da janela aberta pela última anomalia
+    clusters['window_end'] += time_window
+    clusters['devices'] = grouped['device_id'].unique().apply(frozenset)
+
+    return anomalies_sorted, clusters
+
+def main():
+    sync_telemetry(db_path)
+    if cache_dir is not None:
+        update_cache(db_path, cache_dir)
+
+    # Treino em uma amostra sorteada durante a primeira passada pelos dados
+    sample = reservoir_sample((chunk['voltage'].to_numpy() for chunk in iter_logs(db_path)),
+                              sample_size, random_state)
+    if not len(sample):
+        print("Nenhuma leitura com voltagem e timestamp encontrada; não há dados para treinar o modelo.")
+        return
+    global_model = fit_global_model(sample)
+
+    # Segunda passada: predição em lotes, com os escores gravados no CSV
+    anomalies = score_chunks(global_model, iter_logs(db_path), n_jobs=n_jobs, scores_path=scores_path)
+    print(f"{len(anomalies)} anomalias encontradas (modelo treinado com {len(sample)} leituras).")
+
+    # Agrupar por timestamp para verificar anomalias simultâneas
+    simultaneous_anomalies, clusters = find_simultaneous_anomalies(anomalies, time_window)
+    print(f"{len(clusters)} clusters de anomalias encontrados, "
+          f"{(clusters['devices'].apply(len) > 1).sum()} com mais de um dispositivo.")
+
+    # Só os dispositivos do relatório são consultados, pelo índice (device_id, ts)
+    report_logs = TelemetryArrays.load(db_path, simultaneous_anomalies['device_id'].unique(),
+                                       start=period_start(period_days), fields=('voltage',),
+                                       required=('voltage', 'timestamp'))
+
+    # Visualização das anomalias simultâneas
+    reports = []
+    for device_id, device_anomalies in simultaneous_anomalies.groupby('device_id', sort=False):
+        device_logs = report_logs.device(device_id)
+        reports.append({
+            'device_id': device_id,
+            'title': f'Análise de Anomalias Simultâneas para o Device ID: {device_id}',
+            'panels': [{
+                'x': device_logs['timestamp'], 'y': device_logs['voltage'], 'label': "Voltagem", 'color': 'blue',
+                'anomalies_x': device_anomalies['timestamp'], 'anomalies_y': device_anomalies['voltage'],
+                'anomaly_label': 'Anomalias', 'anomaly_color': 'red',
+                'xlabel': 'Timestamp', 'ylabel': 'Voltagem (V)',
+            }],
+        })
+
+    paths = render_reports(reports, report_dir, fmt=report_format)
+    print(f"Relatório salvo em: {', '.join(paths) or '-'}")
+
+if __name__ == '__main__':
+    main()
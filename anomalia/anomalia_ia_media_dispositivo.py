@@ -1,59 +1,89 @@
-import sqlite3
+import os
+import time
+import numpy as np
 import pandas as pd
-import ast
-import matplotlib.pyplot as plt
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
+from concurrent.futures import ProcessPoolExecutor
 
-# Fechar todos os plots anteriores antes de rodar o script
-plt.close('all')
+from device_model_store import (DeviceModelStore, data_fingerprint, load_artifact, reusable_rows, row_keys,
+                                save_artifact)
+from report import render_reports
+from robust_detector import detect_sorted, group_bounds
+from telemetry_arrays import TelemetryArrays, as_telemetry
+from telemetry_cache import load_telemetry, update_cache
+from telemetry_db import period_start, sync_telemetry
 
-# Conectar ao banco de dados usando contexto para garantir o fechamento da conexão
+# Caminho do banco de dados com os logs dos dispositivos
 db_path = '/Users/novaki/Documents/developer/inteligencia_artificial/device_logs.db'
-with sqlite3.connect(db_path) as conn:
-    # Carregar as tabelas no DataFrame
-    cafeteira_log = pd.read_sql_query("SELECT * FROM CafeteiraLog", conn)
-    geladeira_log = pd.read_sql_query("SELECT * FROM GeladeiraLog", conn)
-    device_log = pd.read_sql_query("SELECT * FROM DeviceLog", conn)
-
-# Função para extrair o valor de cur_voltage do campo 'status' e ajustar a escala
-def extract_voltage(status_str):
-    try:
-        status_list = ast.literal_eval(status_str)
-        voltages = [float(item['value']) / 10 for item in status_list if 'cur_voltage' in item.get('code', '')]
-        return voltages[0] if voltages else None
-    except (ValueError, SyntaxError):
-        return None
-
-# Aplicar a função para extrair a voltagem em cada log
-cafeteira_log['voltage'] = cafeteira_log['status'].apply(extract_voltage)
-geladeira_log['voltage'] = geladeira_log['status'].apply(extract_voltage)
-device_log['voltage'] = device_log['status'].apply(extract_voltage)
-
-# Concatenar as tabelas em um único DataFrame e remover valores nulos de voltagem
-all_logs = pd.concat([cafeteira_log, geladeira_log, device_log])
-all_logs_clean = all_logs.dropna(subset=['voltage'])
 
-# Função para detectar anomalias com base nos limites ajustados para cada dispositivo
-def detect_anomalies_by_device(logs, device_id):
-    device_logs = logs[logs['device_id'] == device_id].copy()
+# Dispositivos analisados (None para todos) e período em dias até agora (None para todo o histórico)
+device_ids = None
+period_days = None
 
-    if len(device_logs) < 10:
-        print(f"Dispositivo {device_id} ignorado (menos de 10 logs).")
-        return pd.DataFrame(), pd.DataFrame()
+# Pasta do cache com a telemetria de cada dispositivo em arquivos mapeados em memória, usado
+# quando o histórico completo é analisado (None consulta sempre a tabela de telemetria)
+cache_dir = '/Users/novaki/Documents/developer/inteligencia_artificial/telemetry_cache'
 
-    # Calcular a média da voltagem e os limites de anomalia para o dispositivo
-    mean_voltage = device_logs['voltage'].mean()
-    lower_limit = mean_voltage * 0.90
-    upper_limit = mean_voltage * 1.10
+# Quantidade de processos usados na detecção (None usa todos os núcleos)
+n_jobs = None
+
+# Modo de detecção: 'isolation_forest' (um modelo por dispositivo), 'fast' (faixa da média e
+# mediana/MAD móveis, todos os dispositivos de uma vez), 'hybrid' (IsolationForest só nos
+# dispositivos marcados pelo modo fast) ou 'compare' (roda os dois e mostra a concordância)
+detection_mode = 'isolation_forest'
+
+# Pasta com os modelos treinados de cada dispositivo, reaproveitados enquanto os dados do
+# dispositivo não mudam (None treina todos a cada execução)
+model_store_dir = 'modelos_dispositivos'
 
+# Pasta e formato ('png', 'svg' ou 'pdf') do relatório de anomalias; PNG e SVG são
+# renderizados em paralelo, o PDF é um único arquivo montado em um só processo
+report_dir = 'relatorio_anomalias_dispositivo'
+report_format = 'png'
+
+def load_logs(db_path, device_ids=device_ids, period_days=period_days, cache_dir=cache_dir):
+    """
+    Atualiza a tabela de telemetria com os logs novos e consulta os dados já interpretados.
+
+    Apenas os logs gravados desde a última execução são interpretados. O histórico
+    completo vem do cache em disco, atualizado só com as linhas novas; a consulta de um
+    dispositivo ou período usa o índice (device_id, ts) e lê só a faixa correspondente.
+    As leituras vão em lotes direto para o container compacto, agrupadas por dispositivo.
+    Como antes, basta a voltagem: leituras sem timestamp entram na análise (no fim das
+    leituras do dispositivo), exceto com period_days, pois não há como situá-las no período.
+
+    :param db_path: Caminho do banco SQLite com os logs
+    :param device_ids: Dispositivos a consultar (None para todos)
+    :param period_days: Quantidade de dias até agora (None para todo o histórico)
+    :param cache_dir: Pasta do cache de telemetria (None para não usar o cache)
+    :return: TelemetryArrays com a voltagem
+    """
+    sync_telemetry(db_path)
+    if cache_dir is not None:
+        update_cache(db_path, cache_dir)
+    return load_telemetry(db_path, cache_dir, device_ids, start=period_start(period_days), fields=('voltage',))
+
+# Função para detectar anomalias com base nos limites ajustados para cada dispositivo
+def detect_anomalies_by_device(logs, device_id):
+    if isinstance(logs, TelemetryArrays):
+        return _detect_device_anomalies(device_id, logs.frame_for(device_id))
+    return _detect_device_anomalies(device_id, logs[logs['device_id'] == device_id])
+
+def _fit_device_model(device_logs):
     # Normalizar os dados para detecção de anomalias
     scaler = StandardScaler()
     scaled_voltages = scaler.fit_transform(device_logs[['voltage']])
 
     # Treinar o modelo de detecção de anomalias
     model = IsolationForest(contamination=0.05, random_state=42)
-    device_logs['anomaly'] = model.fit_predict(scaled_voltages)
+    return scaler, model, model.fit_predict(scaled_voltages)
+
+def _apply_limits(device_logs, labels, mean_voltage):
+    # Calcular os limites de anomalia do dispositivo a partir da média da voltagem
+    lower_limit = mean_voltage * 0.90
+    upper_limit = mean_voltage * 1.10
+    device_logs['anomaly'] = labels
 
     # Identificar anomalias
     anomalies = device_logs[device_logs['anomaly'] == -1]
@@ -67,20 +97,287 @@ def detect_anomalies_by_device(logs, device_id):
 
     return device_logs, anomalies_filtered
 
-# Obter os device_ids únicos e detectar anomalias para cada um
-device_ids = all_logs_clean['device_id'].unique()
-
-for device_id in device_ids:
-    device_logs, anomalies = detect_anomalies_by_device(all_logs_clean, device_id)
-
-    if not anomalies.empty:
-        plt.figure(figsize=(10, 6))
-        plt.plot(device_logs.index, device_logs['voltage'], label="Voltagem", color='blue')
-        plt.axhline(y=device_logs['lower_limit'].iloc[0], color='red', linestyle='--', label=f'Limite Inferior ({device_logs["lower_limit"].iloc[0]:.1f}V)')
-        plt.axhline(y=device_logs['upper_limit'].iloc[0], color='red', linestyle='--', label=f'Limite Superior ({device_logs["upper_limit"].iloc[0]:.1f}V)')
-        plt.scatter(anomalies.index, anomalies['voltage'], color='orange', label='Anomalias')
-        plt.title(f'Análise de Anomalias para o Device ID: {device_id}')
-        plt.xlabel('Índice do Log')
-        plt.ylabel('Voltagem (V)')
-        plt.legend()
-        plt.show()
+def _detect_device_anomalies(device_id, device_logs):
+    device_logs = device_logs.copy()
+
+    if len(device_logs) < 10:
+        print(f"Dispositivo {device_id} ignorado (menos de 10 logs).")
+        return pd.DataFrame(), pd.DataFrame()
+
+    _, _, labels = _fit_device_model(device_logs)
+    return _apply_limits(device_logs, labels, device_logs['voltage'].mean())
+
+def _detect_device_with_store(device_id, device_logs, entry, store_dir, now):
+    """
+    Como _detect_device_anomalies, mas reaproveitando o modelo salvo do dispositivo quando
+    as leituras usadas no treino não mudaram e o modelo não expirou. Nesse caso só as
+    leituras novas passam pelo modelo; as do treino mantêm a marcação salva.
+
+    :return: Tupla (device_logs, anomalias, novo registro do índice ou None se o modelo
+             salvo foi reaproveitado)
+    """
+    device_logs = device_logs.copy()
+
+    if len(device_logs) < 10:
+        print(f"Dispositivo {device_id} ignorado (menos de 10 logs).")
+        return pd.DataFrame(), pd.DataFrame(), None
+
+    keys = row_keys(device_logs)
+    voltage = device_logs['voltage'].to_numpy(dtype=float)
+
+    seen = reusable_rows(entry, keys, voltage, now)
+    if seen is not None:
+        artifact = load_artifact(store_dir, device_id)
+        labels = np.where(np.isin(keys, artifact['flagged']), -1, 1)
+        if not seen.all():
+            new_voltages = device_logs.loc[~seen, ['voltage']]
+            labels[~seen] = artifact['model'].predict(artifact['scaler'].transform(new_voltages))
+        return (*_apply_limits(device_logs, labels, entry['mean_voltage']), None)
+
+    scaler, model, labels = _fit_device_model(device_logs)
+    save_artifact(store_dir, device_id, {'scaler': scaler, 'model': model, 'flagged': keys[labels == -1]})
+    mean_voltage = float(voltage.mean())
+    entry = {
+        'fitted_at': now,
+        'mean_voltage': mean_voltage,
+        'lower_limit': mean_voltage * 0.90,
+        'upper_limit': mean_voltage * 1.10,
+        'fingerprint': data_fingerprint(keys, voltage),
+    }
+    return (*_apply_limits(device_logs, labels, mean_voltage), entry)
+
+def split_by_device(logs):
+    """
+    Separa os logs por dispositivo com uma única ordenação, sem filtrar o DataFrame inteiro
+    para cada dispositivo.
+
+    :param logs: TelemetryArrays (já agrupado por dispositivo) ou DataFrame com a coluna 'device_id'
+    :return: Lista de tuplas (device_id, logs do dispositivo), na ordem de logs['device_id'].unique()
+             ou dos offsets do container
+    """
+    if isinstance(logs, TelemetryArrays):
+        return list(logs.iter_device_frames())
+
+    order, device_ids, bounds = group_bounds(logs['device_id'])
+    sorted_logs = logs.iloc[order]
+
+    return [(device_id, sorted_logs.iloc[bounds[i]:bounds[i + 1]]) for i, device_id in enumerate(device_ids)]
+
+def detect_anomalies_all_devices(logs, n_jobs=None, store_dir=None):
+    """
+    Detecta as anomalias de todos os dispositivos, distribuindo os modelos entre processos.
+
+    Cada dispositivo é treinado com o mesmo random_state do caminho serial, então, sem
+    store_dir, o resultado é idêntico ao de chamar detect_anomalies_by_device para cada um.
+
+    Com store_dir, o modelo de cada dispositivo fica salvo e só é treinado de novo quando
+    as leituras usadas no treino mudam ou o modelo expira (ver device_model_store); nos
+    demais dispositivos apenas as leituras novas passam pelo modelo salvo, e a média e os
+    limites continuam os do treino. Nesse caso o resultado pode diferir do de
+    detect_anomalies_by_device, que recalcula tudo com as leituras atuais.
+
+    :param logs: DataFrame com device_id e voltage (e source e rowid, com store_dir)
+    :param n_jobs: Número de processos (None usa todos os núcleos, 1 roda no processo atual)
+    :param store_dir: Pasta dos modelos salvos por dispositivo (opcional)
+    :return: Lista de tuplas (device_id, device_logs, anomalies), na ordem de logs['device_id'].unique()
+    """
+    device_slices = split_by_device(logs)
+    device_ids = [device_id for device_id, _ in device_slices]
+    device_frames = [device_logs for _, device_logs in device_slices]
+    return _detect_with_isolation_forest(device_ids, device_frames, n_jobs, store_dir)
+
+def _detect_with_isolation_forest(device_ids, device_frames, n_jobs, store_dir=None):
+    if store_dir is None:
+        detect = _detect_device_anomalies
+        args = [device_ids, device_frames]
+    else:
+        store = DeviceModelStore(store_dir)
+        detect = _detect_device_with_store
+        args = [device_ids, device_frames, [store.entry(device_id) for device_id in device_ids],
+                [store_dir] * len(device_ids), [time.time()] * len(device_ids)]
+
+    if n_jobs == 1 or len(device_ids) <= 1:
+        results = list(map(detect, *args))
+    else:
+        # Lotes de dispositivos por tarefa para diluir o custo de comunicação entre processos
+        chunksize = max(1, len(device_ids) // (4 * (n_jobs or os.cpu_count() or 1)))
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(detect, *args, chunksize=chunksize))
+
+    if store_dir is None:
+        return [(device_id, *result) for device_id, result in zip(device_ids, results)]
+
+    refitted = 0
+    for device_id, (_, _, entry) in zip(device_ids, results):
+        if entry is not None:
+            store.update(device_id, entry)
+            refitted += 1
+    store.save()
+    print(f"{refitted} dispositivos treinados, {len(device_ids) - refitted} com o modelo salvo.")
+    return [(device_id, device_logs, anomalies) for device_id, (device_logs, anomalies, _) in zip(device_ids, results)]
+
+def detect_anomalies_fast(logs):
+    """
+    Detecta as anomalias de todos os dispositivos sem treinar modelos.
+
+    Uma leitura é anomalia quando está fora dos limites de ±10% da média do dispositivo
+    (o mesmo filtro aplicado ao IsolationForest) e o escore robusto em relação à mediana e
+    ao MAD móveis passa do limite. Tudo é calculado em uma passada sobre os arrays do
+    container, já ordenados por dispositivo; só os dispositivos com anomalias viram
+    DataFrame, e os demais voltam com DataFrames vazios, como os dispositivos ignorados
+    no modo com IsolationForest.
+
+    :param logs: TelemetryArrays ou DataFrame com device_id e voltage
+    :return: Lista de tuplas (device_id, device_logs, anomalies), na ordem de logs['device_id'].unique()
+             ou dos offsets do container
+    """
+    # O container já está ordenado por dispositivo: os offsets são os limites de cada um
+    telemetry = as_telemetry(logs)
+    bounds = telemetry.offsets
+    anomaly, scores = detect_sorted(telemetry.fields['voltage'].astype(np.float64), bounds)
+
+    # Posições das anomalias, fatiadas por dispositivo pelos offsets
+    positions = np.flatnonzero(anomaly)
+    anomaly_bounds = np.searchsorted(positions, bounds)
+
+    # Um único DataFrame vazio para os dispositivos sem anomalias (criar um por dispositivo
+    # custaria mais que a própria detecção em frotas grandes)
+    empty = pd.DataFrame()
+    results = []
+    for i, device_id in enumerate(telemetry.device_ids):
+        if anomaly_bounds[i] == anomaly_bounds[i + 1]:
+            results.append((device_id, empty, empty))
+            continue
+
+        start, end = bounds[i], bounds[i + 1]
+        device_logs = telemetry.device_frame(i)
+        device_logs['lower_limit'] = scores['lower_limit'][start:end]
+        device_logs['upper_limit'] = scores['upper_limit'][start:end]
+        device_logs['robust_score'] = scores['score'][start:end]
+        anomalies = device_logs.iloc[positions[anomaly_bounds[i]:anomaly_bounds[i + 1]] - start]
+        results.append((device_id, device_logs, anomalies))
+    return results
+
+def detect_anomalies_hybrid(logs, n_jobs=None, store_dir=None):
+    """
+    Triagem com o modo fast e IsolationForest apenas nos dispositivos em que ela encontrou
+    anomalias. Para esses dispositivos o resultado é o mesmo do modo com IsolationForest; os
+    demais voltam sem anomalias.
+
+    :param logs: DataFrame com device_id e voltage
+    :param n_jobs: Número de processos do IsolationForest
+    :param store_dir: Pasta dos modelos salvos por dispositivo (opcional)
+    :return: Lista de tuplas (device_id, device_logs, anomalies), na ordem de logs['device_id'].unique()
+    """
+    results = detect_anomalies_fast(logs)
+    fast_columns = ['lower_limit', 'upper_limit', 'robust_score']
+    flagged = [i for i, (_, _, anomalies) in enumerate(results) if not anomalies.empty]
+
+    forest_results = _detect_with_isolation_forest(
+        [results[i][0] for i in flagged],
+        [results[i][1].drop(columns=fast_columns) for i in flagged],
+        n_jobs,
+        store_dir,
+    )
+    for i, result in zip(flagged, forest_results):
+        results[i] = result
+    return results
+
+def _anomaly_keys(results):
+    return {key for _, _, anomalies in results if not anomalies.empty for key in row_keys(anomalies).tolist()}
+
+def compare_detectors(logs, n_jobs=None):
+    """
+    Roda o modo com IsolationForest e o modo fast nos mesmos dados e mede a concordância.
+
+    A precisão e a cobertura (recall) do modo fast são calculadas em relação ao
+    IsolationForest. 'missed_devices' são os dispositivos com anomalias no IsolationForest
+    que a triagem do modo hybrid não enviaria ao modelo.
+
+    :param logs: DataFrame com source, rowid, device_id e voltage
+    :param n_jobs: Número de processos do IsolationForest
+    :return: Tupla (relatório em um dicionário, resultados do IsolationForest)
+    """
+    started = time.perf_counter()
+    forest_results = detect_anomalies_all_devices(logs, n_jobs=n_jobs)
+    forest_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    fast_results = detect_anomalies_fast(logs)
+    fast_seconds = time.perf_counter() - started
+
+    forest_keys = _anomaly_keys(forest_results)
+    fast_keys = _anomaly_keys(fast_results)
+    both = len(forest_keys & fast_keys)
+
+    forest_devices = {device_id for device_id, _, anomalies in forest_results if not anomalies.empty}
+    fast_devices = {device_id for device_id, _, anomalies in fast_results if not anomalies.empty}
+
+    report = {
+        'readings': len(logs),
+        'devices': len(forest_results),
+        'isolation_forest_anomalies': len(forest_keys),
+        'fast_anomalies': len(fast_keys),
+        'both': both,
+        'only_isolation_forest': len(forest_keys - fast_keys),
+        'only_fast': len(fast_keys - forest_keys),
+        'precision': both / len(fast_keys) if fast_keys else 1.0,
+        'recall': both / len(forest_keys) if forest_keys else 1.0,
+        'isolation_forest_devices': len(forest_devices),
+        'fast_devices': len(fast_devices),
+        'missed_devices': sorted(forest_devices - fast_devices, key=str),
+        'isolation_forest_seconds': forest_seconds,
+        'fast_seconds': fast_seconds,
+    }
+    return report, forest_results
+
+def print_agreement(report):
+    print(f"Leituras: {report['readings']}, dispositivos: {report['devices']}")
+    print(f"Anomalias - IsolationForest: {report['isolation_forest_anomalies']}, fast: {report['fast_anomalies']}, "
+          f"em ambos: {report['both']}, só IsolationForest: {report['only_isolation_forest']}, "
+          f"só fast: {report['only_fast']}")
+    print(f"Precisão do fast: {report['precision']:.1%}, cobertura: {report['recall']:.1%}")
+    print(f"Dispositivos com anomalias - IsolationForest: {report['isolation_forest_devices']}, "
+          f"fast: {report['fast_devices']}, fora da triagem do hybrid: {len(report['missed_devices'])}")
+    print(f"Tempo - IsolationForest: {report['isolation_forest_seconds']:.1f}s, fast: {report['fast_seconds']:.1f}s")
+
+# Modos que treinam IsolationForest; recebem n_jobs e store_dir
+DETECTORS = {
+    'isolation_forest': detect_anomalies_all_devices,
+    'hybrid': detect_anomalies_hybrid,
+}
+
+def main():
+    all_logs_clean = load_logs(db_path)
+
+    if detection_mode == 'compare':
+        report, results = compare_detectors(all_logs_clean, n_jobs=n_jobs)
+        print_agreement(report)
+    elif detection_mode == 'fast':
+        results = detect_anomalies_fast(all_logs_clean)
+    else:
+        results = DETECTORS[detection_mode](all_logs_clean, n_jobs=n_jobs, store_dir=model_store_dir)
+
+    reports = []
+    for device_id, device_logs, anomalies in results:
+        if not anomalies.empty:
+            lower_limit = device_logs['lower_limit'].iloc[0]
+            upper_limit = device_logs['upper_limit'].iloc[0]
+            reports.append({
+                'device_id': device_id,
+                'title': f'Análise de Anomalias para o Device ID: {device_id}',
+                'panels': [{
+                    'x': device_logs['timestamp'], 'y': device_logs['voltage'], 'label': "Voltagem", 'color': 'blue',
+                    'limits': [(lower_limit, f'Limite Inferior ({lower_limit:.1f}V)', 'red'),
+                               (upper_limit, f'Limite Superior ({upper_limit:.1f}V)', 'red')],
+                    'anomalies_x': anomalies['timestamp'], 'anomalies_y': anomalies['voltage'],
+                    'anomaly_label': 'Anomalias', 'anomaly_color': 'orange',
+                    'xlabel': 'Timestamp', 'ylabel': 'Voltagem (V)',
+                }],
+            })
+
+    paths = render_reports(reports, report_dir, fmt=report_format, n_jobs=n_jobs)
+    print(f"{len(reports)} dispositivos com anomalias; relatório salvo em: {', '.join(paths) or '-'}")
+
+if __name__ == '__main__':
+    main()
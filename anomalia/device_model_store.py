@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from log_reader import LOG_TABLES
+
+INDEX_FILE = 'index.json'
+
+# Um modelo salvo é treinado de novo depois desse prazo, em dias
+MAX_AGE_DAYS = 7
+
+# ... ou quando as leituras novas passam dessa fração das leituras usadas no treino, pois a
+# média e os limites do dispositivo já podem ter mudado
+MAX_NEW_FRACTION = 0.5
+
+# O rowid ocupa os 48 bits menos significativos da chave de cada leitura
+_SOURCE_SHIFT = 48
+
+
+def row_keys(logs):
+    """
+    Chave int64 de cada leitura, crescente na ordem de gravação dentro de cada tabela de
+    origem: a posição da tabela em LOG_TABLES nos bits altos e o rowid nos baixos.
+
+    :param logs: DataFrame com as colunas 'source' (nome da tabela ou posição em LOG_TABLES) e 'rowid'
+    :return: Array int64 com as chaves
+    """
+    source = logs['source']
+    if pd.api.types.is_numeric_dtype(source):
+        codes = source.to_numpy(dtype=np.int64)
+    else:
+        codes = pd.Categorical(source, categories=LOG_TABLES).codes.astype(np.int64)
+    return (codes << _SOURCE_SHIFT) | logs['rowid'].to_numpy(dtype=np.int64)
+
+
+def data_fingerprint(keys, voltage):
+    """
+    :param keys: Chaves das leituras (row_keys)
+    :param voltage: Voltagens das mesmas leituras
+    :return: Dicionário com a quantidade de leituras, a maior chave e o sha1 do conteúdo
+    """
+    order = np.argsort(keys, kind='stable')
+    sha1 = hashlib.sha1()
+    sha1.update(np.ascontiguousarray(keys[order], dtype=np.int64).tobytes())
+    sha1.update(np.ascontiguousarray(voltage[order], dtype=np.float64).tobytes())
+    return {'rows': int(len(keys)), 'last_key': int(keys.max()) if len(keys) else -1, 'hash': sha1.hexdigest()}
+
+
+def reusable_rows(entry, keys, voltage, now=None, max_age_days=MAX_AGE_DAYS, max_new_fraction=MAX_NEW_FRACTION):
+    """
+    Verifica se o modelo salvo ainda vale para as leituras atuais do dispositivo.
+
+    As leituras com chave até a última usada no treino precisam ser exatamente as mesmas
+    (quantidade e conteúdo); as demais são leituras novas, pontuadas com o modelo salvo.
+
+    :param entry: Registro do dispositivo no índice (ou None)
+    :param keys: Chaves das leituras atuais
+    :param voltage: Voltagens das leituras atuais
+    :param now: Horário atual em segundos (padrão: time.time())
+    :return: Array booleano marcando as leituras já usadas no treino, ou None se for
+             preciso treinar de novo
+    """
+    if entry is None:
+        return None
+
+    now = time.time() if now is None else now
+    if now - entry['fitted_at'] > max_age_days * 86400:
+        return None
+
+    fingerprint = entry['fingerprint']
+    seen = keys <= fingerprint['last_key']
+    n_seen = int(seen.sum())
+    if n_seen != fingerprint['rows'] or len(keys) - n_seen > max_new_fraction * n_seen:
+        return None
+    if data_fingerprint(keys[seen], voltage[seen])['hash'] != fingerprint['hash']:
+        return None
+    return seen
+
+
+class DeviceModelStore:
+    """
+    Modelos treinados por dispositivo (escalonador, IsolationForest e as leituras marcadas
+    no treino), um arquivo joblib por dispositivo, e um índice JSON com a média, os limites,
+    a data do treino e a impressão digital dos dados usados.
+
+    Os arquivos dos modelos podem ser gravados por vários processos, pois o nome vem do
+    device_id; o índice só é gravado pelo processo principal, em save().
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+
+        self.index = {}
+        path = os.path.join(store_dir, INDEX_FILE)
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.index = json.load(f)
+
+    def entry(self, device_id):
+        return self.index.get(str(device_id))
+
+    def update(self, device_id, entry):
+        self.index[str(device_id)] = entry
+
+    def save(self):
+        path = os.path.join(self.store_dir, INDEX_FILE)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.index, f, indent=4)
+        os.replace(tmp_path, path)
+
+
+def artifact_path(store_dir, device_id):
+    name = hashlib.sha1(str(device_id).encode('utf-8')).hexdigest()[:20]
+    return os.path.join(store_dir, f'{name}.joblib')
+
+
+def save_artifact(store_dir, device_id, artifact):
+    path = artifact_path(store_dir, device_id)
+    tmp_path = f'{path}.tmp'
+    joblib.dump(artifact, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_artifact(store_dir, device_id):
+    return joblib.load(artifact_path(store_dir, device_id))
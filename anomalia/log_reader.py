@@ -0,0 +1,74 @@
+import json
+import os
+import sqlite3
+from contextlib import closing
+
+import numpy as np
+
+# Tabelas de log gravadas pelos dispositivos no banco
+LOG_TABLES = ('CafeteiraLog', 'GeladeiraLog', 'DeviceLog')
+
+# Quantidade máxima de linhas mantidas em memória por lote
+DEFAULT_CHUNK_SIZE = 50000
+
+
+def iter_log_batches(db_path, tables=LOG_TABLES, chunk_size=DEFAULT_CHUNK_SIZE, high_water_marks=None):
+    """
+    Lê as tabelas de log em lotes de tamanho limitado, sem carregar o histórico inteiro.
+
+    Apenas as colunas rowid, device_id e status são selecionadas. As linhas de cada tabela
+    são lidas em ordem de rowid, começando depois da marca informada para a tabela.
+
+    :param db_path: Caminho do banco SQLite com os logs
+    :param tables: Tabelas a serem lidas, na ordem desejada
+    :param chunk_size: Número máximo de linhas por lote
+    :param high_water_marks: Dicionário {tabela: último rowid já processado} (opcional)
+    :return: Gerador de tuplas (tabela, lote), onde o lote é um dicionário com os arrays
+             'rowid' (int64), 'device_id' (object) e 'status' (object)
+    """
+    high_water_marks = high_water_marks or {}
+
+    with closing(sqlite3.connect(db_path)) as conn:
+        for table in tables:
+            cursor = conn.execute(
+                f"SELECT rowid, device_id, status FROM {table} WHERE rowid > ? ORDER BY rowid",
+                (high_water_marks.get(table, 0),)
+            )
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+
+                rowids, device_ids, statuses = zip(*rows)
+                yield table, {
+                    'rowid': np.fromiter(rowids, dtype=np.int64, count=len(rows)),
+                    'device_id': np.array(device_ids, dtype=object),
+                    'status': np.array(statuses, dtype=object),
+                }
+
+
+def load_high_water_marks(path):
+    """
+    Carrega as marcas de rowid salvas por uma execução anterior.
+
+    :param path: Caminho do arquivo JSON com as marcas
+    :return: Dicionário {tabela: último rowid processado} (vazio se o arquivo não existir)
+    """
+    if not os.path.exists(path):
+        return {}
+
+    with open(path, 'r') as f:
+        return {table: int(rowid) for table, rowid in json.load(f).items()}
+
+
+def save_high_water_marks(path, high_water_marks):
+    """
+    Salva as marcas de rowid de forma atômica, para retomar a leitura na próxima execução.
+
+    :param path: Caminho do arquivo JSON com as marcas
+    :param high_water_marks: Dicionário {tabela: último rowid processado}
+    """
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({table: int(rowid) for table, rowid in high_water_marks.items()}, f, indent=4)
+    os.replace(tmp_path, path)
@@ -0,0 +1,134 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # Renderização sem janela, funciona em servidores sem tela
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+
+# Formatos aceitos para o relatório
+REPORT_FORMATS = ('png', 'svg', 'pdf')
+
+
+def decimate_minmax(x, y, n_buckets):
+    """
+    Reduz uma série à resolução da tela mantendo o mínimo e o máximo de cada faixa de pixels.
+
+    Os picos continuam visíveis no gráfico, mas no máximo 2 * n_buckets pontos são desenhados.
+
+    :param x: Array com o eixo x (crescente)
+    :param y: Array com os valores
+    :param n_buckets: Quantidade de faixas (normalmente a largura do gráfico em pixels)
+    :return: Tupla (x, y) reduzida
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    if len(y) <= 2 * n_buckets:
+        return x, y
+
+    # Limites das faixas com (quase) a mesma quantidade de pontos
+    starts = np.linspace(0, len(y), n_buckets + 1).astype(np.int64)[:-1]
+    bucket_ids = np.repeat(np.arange(n_buckets), np.diff(np.append(starts, len(y))))
+
+    # Posição do mínimo e do máximo em cada faixa, em ordem dentro da faixa
+    order = np.lexsort((y, bucket_ids))
+    ends = np.append(starts[1:], len(y))
+    min_idx = order[starts]
+    max_idx = order[ends - 1]
+
+    idx = np.sort(np.unique(np.concatenate([min_idx, max_idx])))
+    return x[idx], y[idx]
+
+
+def _safe_name(device_id):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', str(device_id))
+
+
+def _draw_report(fig, axes, report, n_buckets):
+    for ax, panel in zip(axes, report['panels']):
+        ax.clear()
+
+        x, y = decimate_minmax(panel['x'], panel['y'], n_buckets)
+        ax.plot(x, y, label=panel['label'], color=panel['color'])
+        for value, label, color in panel.get('limits', []):
+            ax.axhline(y=value, color=color, linestyle='--', label=label)
+        if len(panel.get('anomalies_x', [])):
+            ax.scatter(panel['anomalies_x'], panel['anomalies_y'],
+                       color=panel['anomaly_color'], label=panel['anomaly_label'])
+
+        ax.set_xlabel(panel['xlabel'])
+        ax.set_ylabel(panel['ylabel'])
+        ax.legend()
+
+    axes[0].set_title(report['title'])
+    fig.tight_layout()
+
+
+def _render_files(reports, output_dir, fmt, figsize, dpi):
+    # Uma única figura por processo, reaproveitada para todos os dispositivos
+    fig, axes = plt.subplots(len(reports[0]['panels']), 1, figsize=figsize, dpi=dpi, squeeze=False)
+    axes = axes[:, 0]
+    n_buckets = int(figsize[0] * dpi)
+
+    paths = []
+    for report in reports:
+        _draw_report(fig, axes, report, n_buckets)
+        path = os.path.join(output_dir, f"device_{_safe_name(report['device_id'])}.{fmt}")
+        fig.savefig(path)
+        paths.append(path)
+
+    plt.close(fig)
+    return paths
+
+
+def render_reports(reports, output_dir, fmt='png', n_jobs=None, figsize=(12, 6), dpi=100):
+    """
+    Gera as imagens do relatório de anomalias sem abrir janelas.
+
+    Cada relatório é um dicionário com 'device_id', 'title' e 'panels'. Cada painel tem
+    'x', 'y', 'label', 'color', 'xlabel', 'ylabel' e, opcionalmente, 'limits' (lista de
+    tuplas (valor, rótulo, cor)) e as anomalias ('anomalies_x', 'anomalies_y',
+    'anomaly_label', 'anomaly_color'). Todos os relatórios devem ter o mesmo número de painéis.
+
+    PNG e SVG geram um arquivo por dispositivo, renderizados em paralelo por vários
+    processos. PDF gera um único arquivo com uma página por dispositivo; como o arquivo é
+    único, ele é montado em um só processo.
+
+    :param reports: Lista de relatórios
+    :param output_dir: Pasta onde os arquivos serão salvos
+    :param fmt: 'png', 'svg' ou 'pdf'
+    :param n_jobs: Número de processos para PNG/SVG (None usa todos os núcleos)
+    :param figsize: Tamanho da figura em polegadas
+    :param dpi: Resolução da figura
+    :return: Lista com os caminhos dos arquivos gerados
+    """
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f'Formato de relatório inválido: {fmt}')
+    if not reports:
+        return []
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    if fmt == 'pdf':
+        path = os.path.join(output_dir, 'relatorio_anomalias.pdf')
+        fig, axes = plt.subplots(len(reports[0]['panels']), 1, figsize=figsize, dpi=dpi, squeeze=False)
+        axes = axes[:, 0]
+        with PdfPages(path) as pdf:
+            for report in reports:
+                _draw_report(fig, axes, report, int(figsize[0] * dpi))
+                pdf.savefig(fig)
+        plt.close(fig)
+        return [path]
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    if n_jobs == 1 or len(reports) == 1:
+        return _render_files(reports, output_dir, fmt, figsize, dpi)
+
+    # Cada processo recebe um bloco contíguo de dispositivos e reaproveita sua figura
+    chunk_size = -(-len(reports) // n_jobs)
+    chunks = [reports[i:i + chunk_size] for i in range(0, len(reports), chunk_size)]
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        futures = [executor.submit(_render_files, chunk, output_dir, fmt, figsize, dpi) for chunk in chunks]
+        return [path for future in futures for path in future.result()]
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+# Dispositivos com menos leituras são ignorados, como no modo com IsolationForest
+MIN_READINGS = 10
+
+# Limites de ±10% em torno da média da voltagem do dispositivo
+BAND = 0.10
+
+# Janela (em leituras, centrada) da mediana e do MAD móveis
+WINDOW = 61
+
+# Escore robusto mínimo para uma leitura ser anomalia (|x - mediana| / (1.4826 * MAD))
+THRESHOLD = 3.5
+
+# Fator que torna o MAD comparável ao desvio padrão em dados normais
+_MAD_SCALE = 1.4826
+
+
+def group_bounds(device_ids):
+    """
+    Ordena as leituras por dispositivo (ordenação estável, mantendo a ordem original dentro
+    de cada dispositivo) e calcula onde começa cada um.
+
+    :param device_ids: Array ou Series com o device_id de cada leitura
+    :return: Tupla (ordem das leituras, device_ids únicos na ordem de aparição,
+             limites: as leituras do dispositivo i são order[bounds[i]:bounds[i + 1]])
+    """
+    codes, uniques = pd.factorize(device_ids)
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    return order, uniques, bounds
+
+
+def _padded_positions(bounds, window):
+    # Posição de cada leitura em um array com window // 2 posições vazias antes de cada
+    # dispositivo e depois do último: uma janela centrada nunca alcança outro dispositivo
+    counts = np.diff(bounds)
+    gap = window // 2
+    segments = np.repeat(np.arange(len(counts)), counts)
+    return np.arange(bounds[-1]) + gap * (segments + 1), bounds[-1] + gap * (len(counts) + 1)
+
+
+def _rolling_median(values, positions, size, window):
+    # Uma única janela móvel sobre todos os dispositivos: as posições vazias (NaN) não
+    # entram na mediana, então nas pontas de cada dispositivo a janela fica truncada, como
+    # em um rolling por dispositivo com min_periods=1
+    padded = np.full(size, np.nan)
+    padded[positions] = values
+    rolling = pd.Series(padded).rolling(window, center=True, min_periods=1)
+    return rolling.median().to_numpy()[positions]
+
+
+def score_sorted(voltage, bounds, window=WINDOW, band=BAND):
+    """
+    Calcula os limites da faixa e o escore robusto de todas as leituras de uma vez.
+
+    :param voltage: Voltagens já ordenadas por dispositivo (float64)
+    :param bounds: Limites de cada dispositivo no array, como os de group_bounds
+    :param window: Janela da mediana e do MAD móveis
+    :param band: Largura relativa da faixa em torno da média
+    :return: Dicionário com os arrays 'lower_limit', 'upper_limit', 'median' e 'score'
+    """
+    counts = np.diff(bounds)
+
+    # Média por dispositivo sem percorrer os dispositivos em Python
+    means = np.add.reduceat(voltage, bounds[:-1]) / counts if len(voltage) else np.empty(0)
+    mean_per_reading = np.repeat(means, counts)
+
+    positions, size = _padded_positions(bounds, window)
+    median = _rolling_median(voltage, positions, size, window)
+    deviation = np.abs(voltage - median)
+    mad = _rolling_median(deviation, positions, size, window) * _MAD_SCALE
+
+    # Janela constante (MAD zero): qualquer desvio conta como infinito
+    with np.errstate(divide='ignore', invalid='ignore'):
+        score = np.where(mad > 0, deviation / mad, np.where(deviation > 0, np.inf, 0.0))
+
+    return {
+        'lower_limit': mean_per_reading * (1 - band),
+        'upper_limit': mean_per_reading * (1 + band),
+        'median': median,
+        'score': score,
+    }
+
+
+def detect_sorted(voltage, bounds, window=WINDOW, threshold=THRESHOLD, band=BAND, min_readings=MIN_READINGS):
+    """
+    Marca como anomalia as leituras fora da faixa da média e com escore robusto acima do
+    limite, em dispositivos com pelo menos min_readings leituras.
+
+    :param voltage: Voltagens já ordenadas por dispositivo (float64)
+    :param bounds: Limites de cada dispositivo no array, como os de group_bounds
+    :return: Tupla (array booleano de anomalias, dicionário de score_sorted)
+    """
+    scores = score_sorted(voltage, bounds, window, band)
+    outside = (voltage < scores['lower_limit']) | (voltage > scores['upper_limit'])
+    enough = np.repeat(np.diff(bounds) >= min_readings, np.diff(bounds))
+    return outside & (scores['score'] > threshold) & enough, scores
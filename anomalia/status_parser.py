@@ -0,0 +1,151 @@
+import ast
+import json
+import re
+
+import numpy as np
+
+# Campos extraídos do status no formato Tuya e o código correspondente de cada um
+STATUS_CODES = {
+    'voltage': 'cur_voltage',
+    'current': 'cur_current',
+    'power': 'cur_power',
+}
+
+# Os valores de voltagem, corrente e potência são enviados multiplicados por 10
+VALUE_SCALE = 10
+
+# Gramática de uma lista de dicionários simples (strings sem aspas internas ou escapes,
+# números, True/False/None). Qualquer texto que case com ela é ao mesmo tempo um literal
+# Python válido e um JSON válido após trocar as aspas simples e as constantes.
+_STRING = r"'[^'\"\\\x00-\x1f]*'|\"[^'\"\\\x00-\x1f]*\""
+_NUMBER = r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?"
+_SCALAR = rf"(?:{_STRING}|{_NUMBER}|True|False|None)"
+_PAIR = rf"\s*(?:{_STRING})\s*:\s*{_SCALAR}\s*"
+_DICT = rf"\{{(?:{_PAIR}(?:,{_PAIR})*)?\}}"
+_SIMPLE_PAYLOAD_RE = re.compile(rf"\[\s*(?:{_DICT}\s*(?:,\s*{_DICT}\s*)*)?\]")
+
+_STRING_RE = re.compile(r"'[^']*'|\"[^\"]*\"")
+_JSON_TOKEN_RE = re.compile(r"'([^']*)'|(\"[^\"]*\")|\b(True|False|None)\b")
+_JSON_CONSTANTS = {'True': 'true', 'False': 'false', 'None': 'null'}
+
+
+def _to_json_token(match):
+    single_quoted, double_quoted, constant = match.groups()
+    if single_quoted is not None:
+        return f'"{single_quoted}"'
+    if double_quoted is not None:
+        return double_quoted
+    return _JSON_CONSTANTS[constant]
+
+
+def _to_json(status_str):
+    strings = ''.join(_STRING_RE.findall(status_str))
+    if 'True' in strings or 'False' in strings or 'None' in strings:
+        # Alguma string contém o nome de uma constante: troca token a token
+        return _JSON_TOKEN_RE.sub(_to_json_token, status_str)
+
+    # Caso comum: nenhuma string tem aspas internas nem constantes, basta trocar o texto
+    return (status_str.replace("'", '"')
+            .replace('True', 'true')
+            .replace('False', 'false')
+            .replace('None', 'null'))
+
+
+def _load_status(status_str):
+    # Caminho rápido: payloads simples são convertidos para JSON e lidos pelo parser em C
+    if _SIMPLE_PAYLOAD_RE.fullmatch(status_str):
+        try:
+            return json.loads(_to_json(status_str))
+        except ValueError:
+            pass
+
+    # Caminho seguro para qualquer outro literal Python
+    return ast.literal_eval(status_str)
+
+
+def _to_timestamp(timestamp):
+    try:
+        return float(timestamp) if timestamp is not None else None
+    except (ValueError, TypeError):
+        return None
+
+
+def _extract_field(status_list, code):
+    # Retorna (valor, t) do primeiro item do código. Todos os itens do código são
+    # convertidos, como na versão anterior, e um valor inválido anula apenas este campo;
+    # um 't' inválido anula apenas o timestamp
+    try:
+        matches = [(float(item['value']) / VALUE_SCALE, item.get('t'))
+                   for item in status_list if code in item.get('code', '')]
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return None, None
+
+    if not matches:
+        return None, None
+    value, timestamp = matches[0]
+    return value, _to_timestamp(timestamp)
+
+
+def _extract_fields(status_str, codes):
+    # Retorna [valor, t, valor, t, ...] na ordem dos códigos, ou None se o status for inválido
+    if not isinstance(status_str, str):
+        return None
+
+    try:
+        status_list = _load_status(status_str)
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        return None
+
+    values = []
+    for code in codes:
+        values.extend(_extract_field(status_list, code))
+    return values
+
+
+def _column_names(fields):
+    names = []
+    for field in fields:
+        names.append(field)
+        names.append(f'{field}_t')
+    return names
+
+
+def parse_status(status_str, fields=tuple(STATUS_CODES)):
+    """
+    Extrai os valores e os timestamps 't' dos códigos pedidos de um único campo 'status'.
+
+    Assim como antes, o primeiro item cujo código contém o código procurado é usado e o
+    valor é dividido por 10. Se o status estiver malformado, todos os campos são None; um
+    valor inválido deixa None apenas no próprio campo.
+
+    :param status_str: Texto do campo 'status' (lista de dicionários no formato Tuya)
+    :param fields: Campos a extrair, entre 'voltage', 'current' e 'power'
+    :return: Dicionário {campo: valor, campo_t: timestamp} para cada campo pedido
+    """
+    names = _column_names(fields)
+    values = _extract_fields(status_str, [STATUS_CODES[field] for field in fields])
+    if values is None:
+        return dict.fromkeys(names)
+    return dict(zip(names, values))
+
+
+def parse_status_column(statuses, fields=tuple(STATUS_CODES)):
+    """
+    Interpreta uma coluna inteira de 'status' de uma vez.
+
+    :param statuses: Sequência (lista, array ou Series) com os textos de 'status'
+    :param fields: Campos a extrair, entre 'voltage', 'current' e 'power'
+    :return: Dicionário {campo: array float64} com os valores e os timestamps ('campo_t'),
+             usando NaN onde o valor não existe ou o status está malformado
+    """
+    names = _column_names(fields)
+    codes = [STATUS_CODES[field] for field in fields]
+    invalid = [None] * len(names)
+
+    rows = [_extract_fields(status_str, codes) or invalid for status_str in statuses]
+    if not rows:
+        return {name: np.empty(0) for name in names}
+
+    # None vira NaN na conversão para float64
+    matrix = np.array(rows, dtype=float).reshape(len(rows), len(names))
+    return {name: matrix[:, i].copy() for i, name in enumerate(names)}
@@ -0,0 +1,226 @@
+import numpy as np
+import pandas as pd
+
+from log_reader import DEFAULT_CHUNK_SIZE, LOG_TABLES
+from telemetry_db import TELEMETRY_FIELDS, iter_telemetry_chunks
+
+
+class TelemetryArrays:
+    """
+    Telemetria em arrays compactos, ordenada por dispositivo, com um índice de offsets no
+    formato CSR: as leituras do dispositivo i ocupam as posições offsets[i]:offsets[i + 1].
+
+    Cada leitura ocupa o código da tabela de origem (int8), o rowid (int64), o timestamp em
+    ms (float64, NaN quando o status não traz o 't') e os campos em float32, sem o device_id repetido em cada linha. As fatias de um
+    dispositivo são views dos arrays, sem cópia, e o acesso pelo device_id é O(1).
+    """
+
+    def __init__(self, device_ids, offsets, source, rowid, timestamp, fields):
+        """
+        :param device_ids: Array com o device_id de cada dispositivo, na ordem dos offsets
+        :param offsets: Array int64 com len(device_ids) + 1 posições
+        :param source: Posição da tabela de origem em LOG_TABLES (int8)
+        :param rowid: rowid da leitura na tabela de origem (int64)
+        :param timestamp: Timestamp em ms (float64, NaN se ausente)
+        :param fields: Dicionário {campo: array float32}
+        """
+        self.device_ids = device_ids
+        self.offsets = offsets
+        self.source = source
+        self.rowid = rowid
+        self.timestamp = timestamp
+        self.fields = fields
+        self._positions = {device_id: i for i, device_id in enumerate(device_ids.tolist())}
+
+    @classmethod
+    def _build(cls, codes, device_ids, source, rowid, timestamp, fields, order):
+        counts = np.bincount(codes, minlength=len(device_ids))
+        offsets = np.zeros(len(device_ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return cls(device_ids, offsets, source[order], rowid[order], timestamp[order],
+                   {field: values[order] for field, values in fields.items()})
+
+    @classmethod
+    def from_chunks(cls, chunks, fields=TELEMETRY_FIELDS, required=None):
+        """
+        Monta o container a partir de lotes de telemetria, convertendo cada lote para os
+        tipos compactos antes de ler o próximo.
+
+        Os dispositivos ficam na ordem em que aparecem e as leituras de cada um em ordem
+        de timestamp (empates na ordem de leitura, leituras sem timestamp no fim).
+
+        :param chunks: Iterável de DataFrames com source, rowid, device_id, timestamp e os campos
+        :param fields: Campos guardados
+        :param required: Colunas que precisam ter valor, entre os campos e 'timestamp'; as
+                         leituras sem elas são descartadas (padrão: todos os campos)
+        :return: TelemetryArrays
+        """
+        required = list(fields if required is None else required)
+        positions = {}
+        parts = {'code': [], 'source': [], 'rowid': [], 'timestamp': [], **{field: [] for field in fields}}
+
+        for chunk in chunks:
+            chunk = chunk.dropna(subset=required)
+            if chunk.empty:
+                continue
+
+            chunk_codes, uniques = pd.factorize(chunk['device_id'])
+            mapping = np.array([positions.setdefault(device_id, len(positions)) for device_id in uniques.tolist()],
+                               dtype=np.int64)
+            parts['code'].append(mapping[chunk_codes])
+            parts['source'].append(_source_codes(chunk['source']))
+            parts['rowid'].append(chunk['rowid'].to_numpy(dtype=np.int64))
+            parts['timestamp'].append(chunk['timestamp'].to_numpy(dtype=np.float64))
+            for field in fields:
+                parts[field].append(chunk[field].to_numpy(dtype=np.float32))
+
+        columns = {name: np.concatenate(values) if values else np.empty(0) for name, values in parts.items()}
+        codes = columns['code'].astype(np.int64)
+        order = np.lexsort((columns['timestamp'], codes))
+        device_ids = np.empty(len(positions), dtype=object)
+        device_ids[:] = list(positions)
+
+        return cls._build(codes, device_ids, columns['source'].astype(np.int8), columns['rowid'].astype(np.int64),
+                          columns['timestamp'].astype(np.float64),
+                          {field: columns[field].astype(np.float32) for field in fields}, order)
+
+    @classmethod
+    def load(cls, db_path, device_ids=None, start=None, end=None, fields=TELEMETRY_FIELDS, required=None,
+             chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Lê a tabela de telemetria em lotes direto para o container, sem montar um DataFrame
+        com o período inteiro. Os filtros são os de query_telemetry.
+
+        :return: TelemetryArrays
+        """
+        chunks = iter_telemetry_chunks(db_path, chunk_size, device_ids, start=start, end=end, fields=fields)
+        return cls.from_chunks(chunks, fields, required)
+
+    @classmethod
+    def from_frame(cls, logs, fields=('voltage',), required=None):
+        """
+        Converte um DataFrame de logs, mantendo a ordem das leituras de cada dispositivo e
+        os dispositivos na ordem de logs['device_id'].unique().
+
+        :param logs: DataFrame com device_id, os campos e, se houver, source, rowid e timestamp
+        :param fields: Campos guardados
+        :param required: Colunas que precisam ter valor, como em from_chunks (padrão: os campos)
+        :return: TelemetryArrays
+        """
+        required = [column for column in (fields if required is None else required) if column in logs]
+        if required:
+            logs = logs.dropna(subset=required)
+
+        codes, device_ids = pd.factorize(logs['device_id'])
+        order = np.argsort(codes, kind='stable')
+        n_rows = len(logs)
+
+        source = _source_codes(logs['source']) if 'source' in logs else np.zeros(n_rows, dtype=np.int8)
+        rowid = logs['rowid'].to_numpy(dtype=np.int64) if 'rowid' in logs else np.arange(n_rows, dtype=np.int64)
+        timestamp = (logs['timestamp'].to_numpy(dtype=np.float64) if 'timestamp' in logs
+                     else np.full(n_rows, np.nan))
+        device_ids = np.asarray(device_ids, dtype=object)
+
+        return cls._build(codes.astype(np.int64), device_ids, source, rowid, timestamp,
+                          {field: logs[field].to_numpy(dtype=np.float32) for field in fields}, order)
+
+    def __len__(self):
+        return len(self.rowid)
+
+    @property
+    def n_devices(self):
+        return len(self.device_ids)
+
+    @property
+    def nbytes(self):
+        arrays = [self.offsets, self.source, self.rowid, self.timestamp, *self.fields.values()]
+        return sum(array.nbytes for array in arrays)
+
+    def position(self, device_id):
+        """
+        :return: Posição do dispositivo nos offsets, ou None se ele não estiver no container
+        """
+        return self._positions.get(device_id)
+
+    def device(self, device_id):
+        """
+        :param device_id: Identificador do dispositivo
+        :return: Dicionário {coluna: view} com source, rowid, timestamp e os campos, ou None
+        """
+        i = self.position(device_id)
+        return None if i is None else self.device_at(i)
+
+    def device_at(self, i):
+        start, end = self.offsets[i], self.offsets[i + 1]
+        columns = {'source': self.source[start:end], 'rowid': self.rowid[start:end],
+                   'timestamp': self.timestamp[start:end]}
+        columns.update({field: values[start:end] for field, values in self.fields.items()})
+        return columns
+
+    def _frame(self, start, end, device_id):
+        frame = {
+            'source': pd.Categorical.from_codes(self.source[start:end], categories=LOG_TABLES),
+            'rowid': self.rowid[start:end],
+            'device_id': device_id,
+        }
+        frame.update({field: values[start:end].astype(np.float64) for field, values in self.fields.items()})
+        frame['timestamp'] = self.timestamp[start:end]
+        # Índice posicional: o mesmo rowid pode aparecer em mais de uma tabela de origem
+        return pd.DataFrame(frame, index=pd.RangeIndex(end - start))
+
+    def device_frame(self, i):
+        """
+        DataFrame de um dispositivo, no formato esperado pelos detectores: os campos em
+        float64, a origem com o nome da tabela e um índice posicional.
+
+        :param i: Posição do dispositivo nos offsets
+        :return: DataFrame com source, rowid, device_id, os campos e timestamp
+        """
+        return self._frame(self.offsets[i], self.offsets[i + 1], self.device_ids[i])
+
+    def frame_for(self, device_id):
+        """
+        :param device_id: Identificador do dispositivo
+        :return: DataFrame do dispositivo como o de device_frame, ou um DataFrame vazio com
+                 as mesmas colunas se ele não estiver no container
+        """
+        i = self.position(device_id)
+        if i is None:
+            return self._frame(0, 0, device_id)
+        return self.device_frame(i)
+
+    def to_frame(self):
+        """
+        DataFrame com todas as leituras, na ordem do container, com o device_id categórico.
+        Fatiar as linhas offsets[i]:offsets[i + 1] dá o mesmo que device_frame(i).
+
+        :return: DataFrame com source, rowid, device_id, os campos e timestamp
+        """
+        codes = np.repeat(np.arange(self.n_devices), np.diff(self.offsets))
+        device_id = pd.Categorical.from_codes(codes, categories=pd.Index(self.device_ids, dtype=object))
+        return self._frame(0, len(self), device_id)
+
+    def iter_device_frames(self):
+        """
+        :return: Gerador de tuplas (device_id, DataFrame do dispositivo), na ordem dos offsets
+        """
+        for i, device_id in enumerate(self.device_ids):
+            yield device_id, self.device_frame(i)
+
+
+def as_telemetry(logs, fields=('voltage',)):
+    """
+    :param logs: TelemetryArrays ou DataFrame de logs
+    :param fields: Campos guardados ao converter um DataFrame
+    :return: TelemetryArrays
+    """
+    if isinstance(logs, TelemetryArrays):
+        return logs
+    return TelemetryArrays.from_frame(logs, fields)
+
+
+def _source_codes(source):
+    # Nome da tabela de origem (ou a posição já codificada) para a posição em LOG_TABLES
+    if pd.api.types.is_numeric_dtype(source):
+        return source.to_numpy(dtype=np.int8)
+    return pd.Categorical(source, categories=LOG_TABLES).codes.astype(np.int8)
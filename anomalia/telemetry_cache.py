@@ -0,0 +1,255 @@
+import json
+import os
+import shutil
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from log_reader import DEFAULT_CHUNK_SIZE, LOG_TABLES
+from telemetry_arrays import TelemetryArrays
+from telemetry_db import TELEMETRY_FIELDS, connect, iter_telemetry_chunks
+
+# Colunas guardadas para cada dispositivo e o tipo de cada uma no disco (os mesmos do
+# TelemetryArrays, então a carga não converte nada)
+CACHE_COLUMNS = {
+    'source': np.int8,  # Posição da tabela de origem em LOG_TABLES
+    'rowid': np.int64,
+    'timestamp': np.float64,  # NaN quando a leitura não tem timestamp
+    **{field: np.float32 for field in TELEMETRY_FIELDS},
+}
+
+META_FILE = 'meta.json'
+
+
+def _empty_meta():
+    return {'last_rowid': 0, 'last_key': None, 'rows': 0, 'devices': []}
+
+
+def _load_meta(cache_dir):
+    path = os.path.join(cache_dir, META_FILE)
+    if not os.path.exists(path):
+        return _empty_meta()
+
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _save_meta(cache_dir, meta):
+    path = os.path.join(cache_dir, META_FILE)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f, indent=4)
+    os.replace(tmp_path, path)
+
+
+def _device_dir(cache_dir, device):
+    return os.path.join(cache_dir, 'devices', device['dir'])
+
+
+def _column_path(cache_dir, device, column):
+    return os.path.join(_device_dir(cache_dir, device), f'{column}.bin')
+
+
+def _truncate_to_meta(cache_dir, meta):
+    # Descarta linhas gravadas por uma execução interrompida antes de salvar o meta.json
+    for device in meta['devices']:
+        for column, dtype in CACHE_COLUMNS.items():
+            path = _column_path(cache_dir, device, column)
+            size = device['rows'] * np.dtype(dtype).itemsize
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+
+def _append_device_rows(cache_dir, device, columns, rows):
+    for column, dtype in CACHE_COLUMNS.items():
+        with open(_column_path(cache_dir, device, column), 'ab') as f:
+            f.write(np.ascontiguousarray(columns[column][rows], dtype=dtype).tobytes())
+    device['rows'] += len(rows)
+
+
+def _matches_table(conn, meta):
+    # A telemetria só recebe linhas novas; se a última linha copiada mudou ou as linhas até
+    # ela não são as que o cache contou, a tabela foi refeita (migração com --rebuild)
+    last = conn.execute('SELECT source, source_rowid FROM telemetry WHERE rowid = ?',
+                        (meta['last_rowid'],)).fetchone()
+    count, = conn.execute('SELECT count(*) FROM telemetry WHERE rowid <= ?', (meta['last_rowid'],)).fetchone()
+    return last is not None and list(last) == meta['last_key'] and count == meta['rows']
+
+
+def update_cache(db_path, cache_dir, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Acrescenta ao cache apenas as linhas da tabela telemetry gravadas desde a última
+    atualização (ver telemetry_db.sync_telemetry).
+
+    Cada dispositivo tem um arquivo binário por coluna, lido depois como np.memmap. O
+    meta.json guarda o último rowid da telemetria já copiado e a quantidade de linhas de
+    cada dispositivo. Se a telemetria foi refeita, o cache é refeito do zero.
+
+    :param db_path: Caminho do banco SQLite com os logs
+    :param cache_dir: Pasta do cache
+    :param chunk_size: Número máximo de linhas lidas do banco por vez
+    :return: Quantidade de linhas novas adicionadas ao cache
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    meta = _load_meta(cache_dir)
+    added = 0
+
+    with closing(connect(db_path)) as conn:
+        if meta['rows'] and not _matches_table(conn, meta):
+            shutil.rmtree(os.path.join(cache_dir, 'devices'), ignore_errors=True)
+            meta = _empty_meta()
+        _truncate_to_meta(cache_dir, meta)
+        devices = {device['device_id']: device for device in meta['devices']}
+
+        cursor = conn.execute(
+            f"SELECT rowid, source, source_rowid, device_id, ts, {', '.join(TELEMETRY_FIELDS)} "
+            'FROM telemetry WHERE rowid > ? ORDER BY rowid',
+            (meta['last_rowid'],)
+        )
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+
+            chunk = pd.DataFrame.from_records(rows, columns=['telemetry_rowid', 'source', 'rowid', 'device_id',
+                                                             'timestamp', *TELEMETRY_FIELDS])
+            columns = {
+                'source': pd.Categorical(chunk['source'], categories=LOG_TABLES).codes,
+                'rowid': chunk['rowid'].to_numpy(dtype=np.int64),
+                'timestamp': chunk['timestamp'].to_numpy(dtype=np.float64),
+                **{field: chunk[field].to_numpy(dtype=np.float64) for field in TELEMETRY_FIELDS},
+            }
+
+            # Agrupar as linhas do lote por dispositivo mantendo a ordem da telemetria
+            codes, uniques = pd.factorize(chunk['device_id'])
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+
+            for code, device_id in enumerate(uniques.tolist()):
+                device = devices.get(device_id)
+                if device is None:
+                    device = {'device_id': device_id, 'dir': f'{len(devices):06d}', 'rows': 0}
+                    devices[device_id] = device
+                    meta['devices'].append(device)
+                    # A pasta pode ter sobrado de uma execução interrompida antes de salvar
+                    # o meta.json, com arquivos de outro dispositivo
+                    shutil.rmtree(_device_dir(cache_dir, device), ignore_errors=True)
+                    os.makedirs(_device_dir(cache_dir, device))
+                _append_device_rows(cache_dir, device, columns, order[bounds[code]:bounds[code + 1]])
+
+            added += len(rows)
+            meta['rows'] += len(rows)
+            meta['last_rowid'] = int(rows[-1][0])
+            meta['last_key'] = [rows[-1][1], int(rows[-1][2])]
+            _save_meta(cache_dir, meta)
+
+    return added
+
+
+def _open_columns(cache_dir, device):
+    columns = {}
+    for column, dtype in CACHE_COLUMNS.items():
+        if device['rows'] == 0:
+            columns[column] = np.empty(0, dtype=dtype)
+        else:
+            columns[column] = np.memmap(_column_path(cache_dir, device, column), dtype=dtype,
+                                        mode='r', shape=(device['rows'],))
+    return columns
+
+
+def open_device(cache_dir, device_id):
+    """
+    Abre as colunas de um dispositivo como arrays mapeados em memória (somente leitura).
+
+    :param cache_dir: Pasta do cache
+    :param device_id: Identificador do dispositivo
+    :return: Dicionário {coluna: array}, ou None se o dispositivo não estiver no cache
+    """
+    for device in _load_meta(cache_dir)['devices']:
+        if device['device_id'] == device_id:
+            return _open_columns(cache_dir, device)
+    return None
+
+
+def iter_cache_chunks(cache_dir, chunk_size=DEFAULT_CHUNK_SIZE, device_ids=None, start=None, end=None,
+                      fields=TELEMETRY_FIELDS):
+    """
+    Lê o cache em lotes no mesmo formato de telemetry_db.iter_telemetry_chunks, com os
+    mesmos filtros. Um lote junta dispositivos inteiros até chunk_size linhas.
+
+    :param cache_dir: Pasta do cache
+    :param chunk_size: Número aproximado de linhas por lote
+    :return: Gerador de DataFrames com source, rowid, device_id, os campos pedidos e timestamp
+    """
+    devices = _load_meta(cache_dir)['devices']
+    if device_ids is not None:
+        device_ids = set(device_ids)
+        devices = [device for device in devices if device['device_id'] in device_ids]
+
+    frames = []
+    buffered = 0
+    for device in devices:
+        columns = _open_columns(cache_dir, device)
+        keep = None
+        if start is not None:
+            keep = columns['timestamp'] >= start
+        if end is not None:
+            keep = columns['timestamp'] < end if keep is None else keep & (columns['timestamp'] < end)
+
+        frame = pd.DataFrame({
+            'source': pd.Categorical.from_codes(columns['source'], categories=LOG_TABLES),
+            'rowid': columns['rowid'],
+            'device_id': device['device_id'],
+            **{field: columns[field] for field in fields},
+            'timestamp': columns['timestamp'],
+        })
+        if keep is not None:
+            frame = frame[keep]
+        frames.append(frame)
+        buffered += len(frame)
+
+        if buffered >= chunk_size:
+            yield pd.concat(frames, ignore_index=True)
+            frames, buffered = [], 0
+
+    if buffered:
+        yield pd.concat(frames, ignore_index=True)
+
+
+def load_cache(cache_dir, device_ids=None, start=None, end=None, fields=TELEMETRY_FIELDS, required=None,
+               chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Monta o container compacto direto do cache, sem consultar o banco.
+
+    :return: TelemetryArrays (ver TelemetryArrays.from_chunks)
+    """
+    chunks = iter_cache_chunks(cache_dir, chunk_size, device_ids, start=start, end=end, fields=fields)
+    return TelemetryArrays.from_chunks(chunks, fields, required)
+
+
+def iter_telemetry(db_path, cache_dir, chunk_size=DEFAULT_CHUNK_SIZE, device_ids=None, start=None,
+                   fields=TELEMETRY_FIELDS):
+    """
+    Lotes de telemetria para os scripts: o histórico completo vem do cache, já atualizado
+    com update_cache; uma consulta por dispositivo ou período usa o índice (device_id, ts)
+    da tabela, que lê só a faixa pedida.
+
+    :param db_path: Caminho do banco SQLite com os logs
+    :param cache_dir: Pasta do cache (None consulta sempre a tabela)
+    :return: Gerador de DataFrames com source, rowid, device_id, os campos pedidos e timestamp
+    """
+    if cache_dir is not None and device_ids is None and start is None:
+        return iter_cache_chunks(cache_dir, chunk_size, fields=fields)
+    return iter_telemetry_chunks(db_path, chunk_size, device_ids, start=start, fields=fields)
+
+
+def load_telemetry(db_path, cache_dir, device_ids=None, start=None, fields=TELEMETRY_FIELDS, required=None,
+                   chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Como iter_telemetry, mas montando o container compacto.
+
+    :return: TelemetryArrays
+    """
+    chunks = iter_telemetry(db_path, cache_dir, chunk_size, device_ids, start=start, fields=fields)
+    return TelemetryArrays.from_chunks(chunks, fields, required)
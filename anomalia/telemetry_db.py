@@ -0,0 +1,325 @@
+import argparse
+import sqlite3
+import time
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from log_reader import DEFAULT_CHUNK_SIZE, LOG_TABLES, iter_log_batches
+from status_parser import STATUS_CODES, VALUE_SCALE, parse_status_column
+
+# Caminho do banco de dados com os logs dos dispositivos
+db_path = '/Users/novaki/Documents/developer/inteligencia_artificial/device_logs.db'
+
+# Campos de telemetria extraídos do 'status'
+TELEMETRY_FIELDS = tuple(STATUS_CODES)
+
+# Quantidade máxima de device_id por consulta (limite de parâmetros das versões antigas do SQLite)
+MAX_QUERY_PARAMS = 900
+
+# A tabela telemetry fica no próprio banco dos logs. device_id não tem tipo declarado para
+# manter o tipo gravado nas tabelas de origem; ts é o 't' (ms) do item de voltagem.
+# telemetry_sync guarda o último rowid de cada tabela de origem já copiado. O índice único
+# (source, source_rowid) impede que uma leitura copiada pelo gatilho e pela sincronização
+# apareça duas vezes.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS telemetry (
+    device_id NOT NULL,
+    ts INTEGER,
+    voltage REAL,
+    current REAL,
+    power REAL,
+    source TEXT NOT NULL,
+    source_rowid INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS telemetry_sync (
+    source TEXT PRIMARY KEY,
+    last_rowid INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS telemetry_source_rowid ON telemetry (source, source_rowid);
+"""
+
+_INDEX = 'CREATE INDEX IF NOT EXISTS telemetry_device_ts ON telemetry (device_id, ts)'
+
+
+def _status_json(column):
+    # O status é um literal Python; sem aspas duplas nem barras invertidas, trocar as aspas
+    # e as constantes o torna um JSON equivalente (os códigos procurados não contêm as
+    # palavras trocadas, então o resultado da busca não muda)
+    return (f"replace(replace(replace(replace({column}, '''', '\"'), 'True', 'true'), "
+            f"'False', 'false'), 'None', 'null')")
+
+
+def _trigger_sql(table):
+    """
+    Gatilho que copia para a telemetria cada log inserido na tabela, no mesmo formato de
+    append_telemetry, e avança a marca da tabela se o log for o seguinte ao último copiado.
+
+    O gatilho só trata os status que interpreta exatamente como parse_status: JSON
+    equivalente, uma lista de objetos com 'code' em texto e, nos itens dos campos, valor e
+    't' numéricos. Os demais ficam para sync_telemetry, que os interpreta em Python; como a
+    marca não avança, a sincronização retoma a partir deles.
+    """
+    js = _status_json('NEW.status')
+    codes_match = ' OR '.join(f"instr(json_extract(value, '$.code'), '{code}') > 0" for code in STATUS_CODES.values())
+    valid = (
+        f"typeof(NEW.status) = 'text' AND instr(NEW.status, '\"') = 0 AND instr(NEW.status, char(92)) = 0 "
+        f"AND json_valid({js}) AND json_type({js}) = 'array' "
+        f"AND NOT EXISTS (SELECT 1 FROM json_each({js}) WHERE type <> 'object' "
+        f"OR coalesce(json_type(value, '$.code'), 'text') <> 'text' "
+        f"OR (({codes_match}) AND (coalesce(json_type(value, '$.value'), '') NOT IN ('integer', 'real') "
+        f"OR coalesce(json_type(value, '$.t'), 'null') NOT IN ('integer', 'real', 'null'))))"
+    )
+
+    def first(code, key):
+        return (f"(SELECT json_extract(value, '$.{key}') FROM json_each(s.js) "
+                f"WHERE instr(json_extract(value, '$.code'), '{code}') > 0 ORDER BY key LIMIT 1)")
+
+    columns = ', '.join(f"{first(code, 'value')} AS {field}, {first(code, 't')} AS {field}_t"
+                        for field, code in STATUS_CODES.items())
+    return f"""
+CREATE TRIGGER IF NOT EXISTS telemetry_ingest_{table} AFTER INSERT ON {table}
+WHEN {valid}
+BEGIN
+    INSERT OR IGNORE INTO telemetry (device_id, ts, voltage, current, power, source, source_rowid)
+    SELECT NEW.device_id, CAST(coalesce(voltage_t, current_t, power_t) AS INTEGER),
+           voltage / {VALUE_SCALE}.0, current / {VALUE_SCALE}.0, power / {VALUE_SCALE}.0, '{table}', NEW.rowid
+    FROM (SELECT {columns} FROM (SELECT {js} AS js) AS s)
+    WHERE NEW.device_id IS NOT NULL AND coalesce(voltage, current, power) IS NOT NULL;
+    UPDATE telemetry_sync SET last_rowid = NEW.rowid WHERE source = '{table}' AND last_rowid = NEW.rowid - 1;
+END;
+"""
+
+
+def connect(db_path):
+    """
+    Abre o banco para consultas, sem alterar o esquema (ver ensure_schema).
+
+    :param db_path: Caminho do banco SQLite com os logs
+    :return: Conexão sqlite3
+    """
+    return sqlite3.connect(db_path)
+
+
+def ensure_schema(conn):
+    """
+    Passa o banco para o modo WAL e cria as tabelas de telemetria e os gatilhos de
+    ingestão nas tabelas de log existentes, se ainda não existirem. Só é chamado por quem
+    grava (sync_telemetry e a migração); o modo WAL fica gravado no arquivo, então as
+    consultas não precisam repeti-lo.
+
+    No modo WAL a leitura das tabelas de log e a gravação da telemetria podem ocorrer ao
+    mesmo tempo, e as consultas dos scripts não bloqueiam quem grava os logs. Com os
+    gatilhos, cada log inserido já entra na telemetria na transação de quem o gravou.
+
+    :param conn: Conexão aberta com connect()
+    """
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript(_SCHEMA)
+
+    existing = {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table in LOG_TABLES:
+        if table in existing:
+            conn.executescript(_trigger_sql(table))
+
+
+def _nullable(values, dtype=None):
+    # Converte NaN em None para o SQLite gravar NULL
+    missing = np.isnan(values)
+    if dtype is not None:
+        values = np.where(missing, 0, values).astype(dtype)
+    column = values.astype(object)
+    column[missing] = None
+    return column
+
+
+def append_telemetry(conn, table, batch):
+    """
+    Grava na telemetria um lote de logs de uma tabela e avança a marca dessa tabela, na
+    mesma transação. Leituras já copiadas pelo gatilho de ingestão são ignoradas.
+
+    Logs sem device_id ou sem nenhum dos campos ficam de fora.
+
+    :param conn: Conexão aberta com connect(), com o esquema criado por ensure_schema()
+    :param table: Tabela de origem (uma de LOG_TABLES)
+    :param batch: Dicionário com os arrays 'rowid', 'device_id' e 'status', como os de iter_log_batches
+    :return: Quantidade de linhas gravadas na telemetria
+    """
+    if len(batch['rowid']) == 0:
+        return 0
+
+    # Um valor inválido de um campo não descarta os outros (ver parse_status)
+    parsed = parse_status_column(batch['status'], fields=TELEMETRY_FIELDS)
+    values = {field: parsed[field] for field in TELEMETRY_FIELDS}
+    ts = np.full(len(batch['rowid']), np.nan)
+    for field in TELEMETRY_FIELDS:
+        # O timestamp é o da voltagem; sem ela, o do primeiro campo que tiver 't'
+        ts = np.where(np.isnan(ts), parsed[f'{field}_t'], ts)
+
+    keep = ~np.all([np.isnan(column) for column in values.values()], axis=0)
+    keep &= np.array([device_id is not None for device_id in batch['device_id']], dtype=bool)
+    rows = np.flatnonzero(keep)
+
+    if len(rows):
+        columns = [batch['device_id'][rows], _nullable(ts[rows], np.int64)]
+        columns += [_nullable(values[field][rows]) for field in TELEMETRY_FIELDS]
+        columns += [np.full(len(rows), table, dtype=object), batch['rowid'][rows].astype(object)]
+        inserted = conn.executemany(
+            'INSERT OR IGNORE INTO telemetry (device_id, ts, voltage, current, power, source, source_rowid) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            zip(*columns)
+        ).rowcount
+    else:
+        inserted = 0
+
+    conn.execute(
+        'INSERT INTO telemetry_sync (source, last_rowid) VALUES (?, ?) '
+        'ON CONFLICT (source) DO UPDATE SET last_rowid = excluded.last_rowid',
+        (table, int(batch['rowid'][-1]))
+    )
+    return inserted
+
+
+def sync_telemetry(db_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Copia para a tabela telemetry os logs gravados desde a última sincronização e ainda
+    não copiados pelos gatilhos de ingestão (os status que os gatilhos não tratam, ou todo
+    o histórico anterior à criação deles).
+
+    Na primeira execução é a migração completa do histórico: o índice (device_id, ts) é
+    criado só depois da carga, o que é bem mais rápido do que mantê-lo a cada lote. Cada
+    lote é gravado junto com a marca de rowid, então uma execução interrompida retoma do
+    último lote confirmado sem duplicar linhas.
+
+    :param db_path: Caminho do banco SQLite com os logs
+    :param chunk_size: Número máximo de linhas lidas do banco por vez
+    :return: Quantidade de linhas novas na telemetria
+    """
+    with closing(connect(db_path)) as conn:
+        ensure_schema(conn)
+        high_water_marks = dict(conn.execute('SELECT source, last_rowid FROM telemetry_sync'))
+        if not high_water_marks:
+            conn.execute('DROP INDEX IF EXISTS telemetry_device_ts')
+
+        added = 0
+        for table, batch in iter_log_batches(db_path, chunk_size=chunk_size, high_water_marks=high_water_marks):
+            with conn:
+                added += append_telemetry(conn, table, batch)
+
+        conn.execute(_INDEX)
+        if added:
+            conn.execute('PRAGMA optimize')
+
+    return added
+
+
+def period_start(days):
+    """
+    :param days: Quantidade de dias até agora (None para todo o histórico)
+    :return: Timestamp em ms do início do período, ou None
+    """
+    if days is None:
+        return None
+    return int((time.time() - days * 86400) * 1000)
+
+
+def _select_queries(device_ids, start, end, fields, ordered):
+    # Uma consulta por grupo de até MAX_QUERY_PARAMS dispositivos
+    columns = ['source', 'source_rowid AS rowid', 'device_id', *fields, 'ts AS timestamp']
+    conditions = []
+    params = []
+    if start is not None:
+        conditions.append('ts >= ?')
+        params.append(int(start))
+    if end is not None:
+        conditions.append('ts < ?')
+        params.append(int(end))
+
+    if device_ids is None:
+        groups = [None]
+    else:
+        device_ids = list(device_ids)
+        groups = [device_ids[i:i + MAX_QUERY_PARAMS] for i in range(0, len(device_ids), MAX_QUERY_PARAMS)]
+
+    for group in groups:
+        where = list(conditions)
+        group_params = list(params)
+        if group is not None:
+            where.insert(0, f"device_id IN ({', '.join('?' * len(group))})")
+            group_params = list(group) + group_params
+        sql = f"SELECT {', '.join(columns)} FROM telemetry"
+        if where:
+            sql += f" WHERE {' AND '.join(where)}"
+        if ordered:
+            sql += ' ORDER BY device_id, ts'
+        yield sql, group_params
+
+
+def query_telemetry(db_path, device_ids=None, start=None, end=None, fields=TELEMETRY_FIELDS):
+    """
+    Consulta a telemetria por dispositivo e intervalo de tempo.
+
+    Com device_ids, cada dispositivo é uma leitura de faixa no índice (device_id, ts); o
+    intervalo de tempo restringe a faixa dentro do dispositivo.
+
+    :param db_path: Caminho do banco SQLite com os logs
+    :param device_ids: Dispositivos a consultar (None para todos)
+    :param start: Timestamp inicial em ms, inclusivo (opcional)
+    :param end: Timestamp final em ms, exclusivo (opcional)
+    :param fields: Campos a retornar, entre 'voltage', 'current' e 'power'
+    :return: DataFrame com source, rowid, device_id, os campos pedidos e timestamp,
+             ordenado por dispositivo e timestamp
+    """
+    with closing(connect(db_path)) as conn:
+        frames = [pd.read_sql_query(sql, conn, params=params)
+                  for sql, params in _select_queries(device_ids, start, end, fields, ordered=True)]
+
+    # Índice posicional: o mesmo rowid pode aparecer em mais de uma tabela de origem
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+def iter_telemetry_chunks(db_path, chunk_size=DEFAULT_CHUNK_SIZE, device_ids=None, start=None, end=None,
+                          fields=TELEMETRY_FIELDS):
+    """
+    Lê a telemetria em lotes de tamanho limitado, para percorrer o histórico inteiro sem
+    carregá-lo na memória. Os filtros são os mesmos de query_telemetry; a ordem das linhas
+    não é garantida (sem filtros, é a ordem de gravação).
+
+    :param db_path: Caminho do banco SQLite com os logs
+    :param chunk_size: Número máximo de linhas por lote
+    :return: Gerador de DataFrames com source, rowid, device_id, os campos pedidos e timestamp
+    """
+    names = ['source', 'rowid', 'device_id', *fields, 'timestamp']
+    with closing(connect(db_path)) as conn:
+        for sql, params in _select_queries(device_ids, start, end, fields, ordered=False):
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield pd.DataFrame.from_records(rows, columns=names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migra os logs para a tabela telemetry e a mantém atualizada.')
+    parser.add_argument('db_path', nargs='?', default=db_path, help='Banco SQLite com os logs')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='Linhas lidas do banco por vez')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Apaga a telemetria e refaz a migração desde o início')
+    args = parser.parse_args()
+
+    if args.rebuild:
+        with closing(connect(args.db_path)) as conn, conn:
+            ensure_schema(conn)
+            conn.execute('DELETE FROM telemetry')
+            conn.execute('DELETE FROM telemetry_sync')
+
+    started = time.perf_counter()
+    added = sync_telemetry(args.db_path, chunk_size=args.chunk_size)
+    print(f"{added} linhas novas na telemetria em {time.perf_counter() - started:.1f}s.")
+
+
+if __name__ == '__main__':
+    main()
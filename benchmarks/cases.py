@@ -0,0 +1,177 @@
+"""
+Casos de benchmark. Cada caso gera seus dados sintéticos em setup(size), com semente fixa,
+e run(estado) executa uma vez o trecho medido, retornando a quantidade de itens processados.
+"""
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from harness import MODULE_DIRS
+
+
+class Case:
+    def __init__(self, unit, sizes, setup, run, teardown=None):
+        """
+        :param unit: Unidade dos itens processados (para a vazão)
+        :param sizes: Tamanhos dos conjuntos de dados, em ordem crescente
+        :param setup: Função size -> estado
+        :param run: Função estado -> itens processados
+        :param teardown: Função estado -> None, chamada ao final (opcional)
+        """
+        self.unit = unit
+        self.sizes = sizes
+        self.setup = setup
+        self.run = run
+        self.teardown = teardown
+
+
+def _lamp_logs(n_logs, seed=0):
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2024-01-01T00:00:00', 's')
+    times = start + np.cumsum(rng.integers(60, 4 * 3600, n_logs)).astype('timedelta64[s]')
+    time_strs = np.char.replace(np.datetime_as_string(times, unit='s'), 'T', ' ')
+    values = np.where(np.arange(n_logs) % 2 == 0, 'true', 'false')
+    return [{'timestamp': int(t.astype(np.int64)) * 1000, 'value': v, 'timeStr': s}
+            for t, v, s in zip(times, values, time_strs)]
+
+
+def _flask_setup(size):
+    # O modelo é lido da pasta consumo, como no serviço
+    os.chdir(MODULE_DIRS['consumo'])
+    import consumo_flask
+    return {'module': consumo_flask, 'client': consumo_flask.app.test_client(),
+            'payload': {'device_power': 60, 'logs': _lamp_logs(size)}}
+
+
+def _calculate_lamp(state):
+    response = state['client'].post('/calculateLamp', json=state['payload'])
+    assert response.status_code == 200, response.get_json()
+    return 1
+
+
+def _predict_lamp(state):
+    # Cache novo a cada chamada, para medir a predição e não o acerto de cache
+    module = state['module']
+    module.prediction_cache = module.PredictionCache(max_size=10000, ttl=3600)
+    response = state['client'].post('/predictLamp', json=state['payload'])
+    assert response.status_code == 200, response.get_json()
+    return 1
+
+
+def _parse_setup(size):
+    import simulated_data
+    n_devices = -(-size // 1440)
+    block = next(simulated_data.simulate_blocks(n_devices, days=1, anomaly_rate=0.01, block_readings=size + 1440))
+    return {'statuses': simulated_data.status_rows(block)['status'].to_numpy()[:size]}
+
+
+def _parse_status(state):
+    from status_parser import parse_status_column
+    parse_status_column(state['statuses'], ('voltage',))
+    return len(state['statuses'])
+
+
+def _simultaneous_setup(size):
+    rng = np.random.default_rng(0)
+    anomalies = pd.DataFrame({
+        'timestamp': rng.integers(0, size * 20000, size).astype(float),
+        'device_id': rng.integers(0, 50, size).astype(str),
+        'voltage': rng.normal(220, 20, size),
+    })
+    return {'anomalies': anomalies}
+
+
+def _find_simultaneous(state):
+    from anomalia_ia import find_simultaneous_anomalies
+    find_simultaneous_anomalies(state['anomalies'], 60000)
+    return len(state['anomalies'])
+
+
+def _device_logs_setup(size):
+    rng = np.random.default_rng(0)
+    n_devices = max(1, size // 500)
+    voltage = rng.normal(220, 2, size)
+    spikes = rng.random(size) < 0.01
+    voltage[spikes] *= 1.2
+    logs = pd.DataFrame({
+        'source': np.zeros(size, dtype=np.int8),
+        'rowid': np.arange(size, dtype=np.int64),
+        'device_id': (np.arange(size) % n_devices).astype(str),
+        'voltage': voltage,
+    })
+    return {'logs': logs}
+
+
+def _detect_by_device(state):
+    from anomalia_ia_media_dispositivo import detect_anomalies_all_devices
+    detect_anomalies_all_devices(state['logs'], n_jobs=1)
+    return len(state['logs'])
+
+
+def _detect_fast(state):
+    from anomalia_ia_media_dispositivo import detect_anomalies_fast
+    detect_anomalies_fast(state['logs'])
+    return len(state['logs'])
+
+
+_PLANILHA_COLUMNS = ['App Name', 'User Account', 'Mobile', 'Email', 'Nick Name',
+                     'Registration time', 'Is bound equipment']
+
+
+def _planilha_frame(rng, first, n_rows):
+    ids = np.arange(first, first + n_rows)
+    mobile = np.char.add('55119', np.char.zfill(ids.astype(str), 8)).astype(object)
+    mobile[rng.random(n_rows) < 0.3] = None
+    return pd.DataFrame({
+        'App Name': 'Smart Life',
+        'User Account': np.char.add('user', ids.astype(str)),
+        'Mobile': mobile,
+        'Email': np.char.add(np.char.add('user', ids.astype(str)), '@example.com'),
+        'Nick Name': np.char.add('nick', ids.astype(str)),
+        'Registration time': '2024-09-18 10:00:00',
+        'Is bound equipment': rng.random(n_rows) < 0.5,
+    }, columns=_PLANILHA_COLUMNS)
+
+
+def _planilha_setup(size, n_files=10):
+    from base_telefones import BaseTelefones
+    rng = np.random.default_rng(0)
+    folder = tempfile.mkdtemp(prefix='bench_planilha_')
+    rows_per_file = max(1, size // n_files)
+    for i in range(n_files):
+        # Exportações consecutivas se sobrepõem pela metade, como os downloads acumulados
+        first = i * rows_per_file // 2
+        _planilha_frame(rng, first, rows_per_file).to_excel(os.path.join(folder, f'export_{i:03d}.xlsx'), index=False)
+
+    # Base já com uma exportação anterior; a cada chamada o lote é incluído em uma cópia dela
+    base_path = os.path.join(folder, 'base.db')
+    BaseTelefones(base_path).adicionar(_planilha_frame(rng, 0, rows_per_file))
+    return {'folder': folder, 'base_path': base_path}
+
+
+def _planilha_merge(state):
+    from base_telefones import BaseTelefones
+    from planilha_export import ler_planilhas
+    novos_dados_filtrados, total_base = ler_planilhas(state['folder'])
+    run_path = os.path.join(state['folder'], 'run.db')
+    shutil.copyfile(state['base_path'], run_path)
+    BaseTelefones(run_path).adicionar(pd.concat(novos_dados_filtrados, ignore_index=True))
+    return total_base
+
+
+def _planilha_teardown(state):
+    shutil.rmtree(state['folder'], ignore_errors=True)
+
+
+CASES = {
+    'consumo.calculateLamp': Case('requests', [100, 1000, 10000], _flask_setup, _calculate_lamp),
+    'consumo.predictLamp': Case('requests', [100, 1000, 10000], _flask_setup, _predict_lamp),
+    'anomalia.parse_status': Case('rows', [10000, 100000, 300000], _parse_setup, _parse_status),
+    'anomalia.find_simultaneous': Case('rows', [10000, 100000, 1000000], _simultaneous_setup, _find_simultaneous),
+    'anomalia.detect_by_device': Case('rows', [2000, 10000, 40000], _device_logs_setup, _detect_by_device),
+    'anomalia.detect_fast': Case('rows', [10000, 100000, 1000000], _device_logs_setup, _detect_fast),
+    'planilha.merge': Case('rows', [1000, 10000, 50000], _planilha_setup, _planilha_merge, _planilha_teardown),
+}
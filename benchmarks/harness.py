@@ -0,0 +1,182 @@
+"""
+Funções de medição dos benchmarks: tempo por chamada, vazão, pico de memória e comparação
+com uma execução de referência (baseline).
+
+Cada caso é medido em um processo novo, para que o pico de memória (ru_maxrss) seja só dele.
+"""
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+# Diretórios dos módulos medidos; os scripts usam imports planos a partir da própria pasta
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULE_DIRS = {name: os.path.join(ROOT_DIR, name) for name in ('consumo', 'anomalia', 'planilha')}
+
+# Aumento máximo aceito da mediana em relação ao baseline (0.25 = 25% mais lento)
+DEFAULT_THRESHOLD = 0.25
+
+
+def add_module_paths():
+    for path in MODULE_DIRS.values():
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+def _peak_rss_mb():
+    # No Linux ru_maxrss vem em KB, no macOS em bytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def measure(case, size, min_repeats=5, max_repeats=50, min_time=1.0):
+    """
+    Mede um caso em um tamanho de dado, no processo atual.
+
+    :param case: Caso de cases.py (setup, run e teardown opcional)
+    :param size: Tamanho do conjunto de dados sintético
+    :param min_repeats: Quantidade mínima de chamadas medidas
+    :param max_repeats: Quantidade máxima de chamadas medidas
+    :param min_time: Tempo mínimo de medição em segundos (respeitando max_repeats)
+    :return: Dicionário com as métricas
+    """
+    add_module_paths()
+    state = case.setup(size)
+
+    samples = []
+    items = 0
+    try:
+        case.run(state)  # Aquecimento: imports, caches e alocações da primeira chamada
+        started = time.perf_counter()
+        while len(samples) < max_repeats and (len(samples) < min_repeats or time.perf_counter() - started < min_time):
+            t0 = time.perf_counter()
+            items += case.run(state)
+            samples.append(time.perf_counter() - t0)
+    finally:
+        if case.teardown is not None:
+            case.teardown(state)
+
+    samples = np.array(samples)
+    return {
+        'repeats': len(samples),
+        'p50_ms': float(np.percentile(samples, 50) * 1000),
+        'p99_ms': float(np.percentile(samples, 99) * 1000),
+        'mean_ms': float(samples.mean() * 1000),
+        'throughput': float(items / samples.sum()),
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+    }
+
+
+def _measure_in_child(cases_module, case_name, size, options):
+    import importlib
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    case = importlib.import_module(cases_module).CASES[case_name]
+    return measure(case, size, **options)
+
+
+def scaling_exponent(sizes, times):
+    """
+    Inclinação da reta log(tempo) x log(tamanho): ~1 é linear, ~2 é quadrático.
+    """
+    if len(sizes) < 2:
+        return None
+    return float(np.polyfit(np.log(sizes), np.log(times), 1)[0])
+
+
+def run_cases(cases, cases_module, selected=None, sizes_scale=1.0, options=None):
+    """
+    Executa os casos, cada tamanho em um processo novo.
+
+    :param cases: Dicionário nome -> caso (com o atributo sizes)
+    :param cases_module: Nome do módulo que define CASES, importado nos processos filhos
+    :param selected: Nomes (ou prefixos) dos casos a executar; None executa todos
+    :param sizes_scale: Fator aplicado aos tamanhos (ex.: 0.1 para uma execução rápida)
+    :param options: Opções repassadas para measure()
+    :return: Dicionário com 'meta' e 'results'
+    """
+    options = options or {}
+    results = {}
+    context = get_context('spawn')
+
+    for name, case in cases.items():
+        if selected and not any(name == s or name.startswith(s) for s in selected):
+            continue
+
+        results[name] = {'unit': case.unit, 'sizes': {}}
+        for size in case.sizes:
+            size = max(1, int(size * sizes_scale))
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                metrics = executor.submit(_measure_in_child, cases_module, name, size, options).result()
+            results[name]['sizes'][str(size)] = metrics
+            print(f"{name:32s} {size:>9d} p50={metrics['p50_ms']:10.2f}ms p99={metrics['p99_ms']:10.2f}ms "
+                  f"{metrics['throughput']:12.1f} {case.unit}/s rss={metrics['peak_rss_mb']:.0f}MB", flush=True)
+
+        sizes = [int(size) for size in results[name]['sizes']]
+        times = [metrics['p50_ms'] for metrics in results[name]['sizes'].values()]
+        results[name]['scaling_exponent'] = scaling_exponent(sizes, times)
+
+    return {'meta': run_metadata(), 'results': results}
+
+
+def run_metadata():
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                                  capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        revision = None
+
+    return {
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'git_revision': revision,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def save_results(results, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=4)
+
+
+def load_results(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compara a mediana de cada caso/tamanho presente nas duas execuções.
+
+    :param current: Resultado da execução atual
+    :param baseline: Resultado salvo como referência
+    :param threshold: Aumento relativo máximo aceito da mediana
+    :return: Lista de dicionários (case, size, baseline_ms, current_ms, ratio, regression)
+    """
+    rows = []
+    for name, case in current['results'].items():
+        base_case = baseline['results'].get(name)
+        if base_case is None:
+            continue
+        for size, metrics in case['sizes'].items():
+            base = base_case['sizes'].get(size)
+            if base is None:
+                continue
+            ratio = metrics['p50_ms'] / base['p50_ms'] if base['p50_ms'] else float('inf')
+            rows.append({
+                'case': name,
+                'size': int(size),
+                'baseline_ms': base['p50_ms'],
+                'current_ms': metrics['p50_ms'],
+                'ratio': ratio,
+                'regression': ratio > 1 + threshold,
+            })
+    return rows
@@ -0,0 +1,69 @@
+"""
+Executa os benchmarks de consumo, anomalia e planilha com dados sintéticos, sem acesso à rede.
+
+    python run_benchmarks.py                      # todos os casos
+    python run_benchmarks.py --quick anomalia     # tamanhos reduzidos, só os casos de anomalia
+    python run_benchmarks.py --save-baseline      # grava o resultado como baseline.json
+    python run_benchmarks.py --compare            # falha (código 1) se houver regressão
+
+Os resultados de cada execução vão para results/<data>.json.
+"""
+import argparse
+import os
+import sys
+import time
+
+from cases import CASES
+from harness import DEFAULT_THRESHOLD, compare, load_results, run_cases, save_results
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks de consumo, anomalia e planilha')
+    parser.add_argument('cases', nargs='*', help='Casos (ou prefixos, ex.: anomalia) a executar')
+    parser.add_argument('--quick', action='store_true', help='Executa com 10%% dos tamanhos')
+    parser.add_argument('--min-time', type=float, default=1.0, help='Tempo mínimo de medição por tamanho (s)')
+    parser.add_argument('--save-baseline', action='store_true', help='Grava o resultado como baseline')
+    parser.add_argument('--compare', action='store_true', help='Compara com o baseline e falha se houver regressão')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Arquivo de baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Aumento relativo máximo aceito da mediana (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    results = run_cases(CASES, 'cases', selected=args.cases, sizes_scale=0.1 if args.quick else 1.0,
+                        options={'min_time': args.min_time})
+
+    path = os.path.join(RESULTS_DIR, time.strftime('%Y-%m-%d_%H%M%S') + '.json')
+    save_results(results, path)
+    print(f'Resultados salvos em {path}')
+
+    for name, case in results['results'].items():
+        exponent = case['scaling_exponent']
+        if exponent is not None:
+            print(f'{name:32s} escala ~ n^{exponent:.2f}')
+
+    if args.save_baseline:
+        save_results(results, args.baseline)
+        print(f'Baseline salvo em {args.baseline}')
+
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f'Baseline {args.baseline} não encontrado; use --save-baseline primeiro.')
+            return 2
+
+        rows = compare(results, load_results(args.baseline), args.threshold)
+        for row in rows:
+            flag = 'REGRESSÃO' if row['regression'] else 'ok'
+            print(f"{row['case']:32s} {row['size']:>9d} {row['baseline_ms']:10.2f}ms -> "
+                  f"{row['current_ms']:10.2f}ms ({row['ratio']:.2f}x) {flag}")
+        if any(row['regression'] for row in rows):
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""
+Versão assíncrona das rotas de consumo (lâmpada e tomada), para picos de tráfego.
+
+O trabalho de CPU (agregação dos logs e predição) roda em um executor limitado, fora do
+event loop. Requisições de predição idênticas que chegam enquanto outra igual ainda está
+em andamento aguardam o mesmo resultado, e quando a fila passa de MAX_QUEUE_DEPTH a
+resposta é 429 em vez de acumular trabalho. Para servir:
+
+    hypercorn consumo_async:app --bind 0.0.0.0:5003
+"""
+import asyncio
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from quart import Quart, request, jsonify
+
+import consumo_flask
+import consumo_flask_plug
+
+# Threads do executor de CPU e tamanho máximo da fila de trabalho
+MAX_WORKERS = int(os.environ.get('CONSUMO_ASYNC_WORKERS', os.cpu_count() or 4))
+MAX_QUEUE_DEPTH = int(os.environ.get('CONSUMO_ASYNC_QUEUE_DEPTH', 256))
+
+CO2_EMISSION_RATE = consumo_flask.CO2_EMISSION_RATE
+
+
+class Overloaded(Exception):
+    pass
+
+
+class CpuOffloader:
+    """Executor limitado com controle de fila e junção de requisições idênticas."""
+
+    def __init__(self, max_workers=MAX_WORKERS, max_queue_depth=MAX_QUEUE_DEPTH):
+        self.max_queue_depth = max_queue_depth
+        self.depth = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='consumo-cpu')
+        self._in_flight = {}
+
+    async def run(self, fn, *args):
+        # Tudo roda no mesmo event loop, então o contador não precisa de trava
+        if self.depth >= self.max_queue_depth:
+            self.rejected += 1
+            raise Overloaded()
+
+        self.depth += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.depth -= 1
+
+    async def coalesce(self, key, fn, *args):
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.run(fn, *args))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+
+        # shield: se um cliente desistir, os outros que aguardam o mesmo resultado continuam
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {
+            'queue_depth': self.depth,
+            'in_flight': len(self._in_flight),
+            'coalesced': self.coalesced,
+            'rejected': self.rejected,
+        }
+
+
+app = Quart(__name__)
+offloader = CpuOffloader()
+
+
+def _overloaded():
+    return jsonify({'error': 'Server is busy, try again later'}), 429, {'Retry-After': '1'}
+
+
+async def _request_key():
+    # Corpos idênticos na mesma rota resultam na mesma predição
+    body = await request.get_data()
+    return request.path, hashlib.sha1(body).hexdigest()
+
+
+def _predict_lamp(device_power_watts, logs):
+    usage_hours = consumo_flask.total_usage_hours(logs)
+    predicted_energy_kwh = consumo_flask.predict_energy([(device_power_watts, usage_hours)])[0]
+    return {
+        'predicted_monthly_energy': predicted_energy_kwh,
+        'predicted_carbon_footprint': predicted_energy_kwh * CO2_EMISSION_RATE
+    }
+
+
+def _predict_plug(total_consumption):
+    predicted_energy_kwh = float(consumo_flask_plug.model.predict([[total_consumption]])[0])
+    return {
+        'predicted_monthly_energy': predicted_energy_kwh,
+        'predicted_carbon_footprint': predicted_energy_kwh * CO2_EMISSION_RATE
+    }
+
+
+@app.route('/calculateLamp', methods=['POST'])
+async def calculate_lamp():
+    try:
+        data = await request.get_json()
+        device_power_watts = data.get('device_power', 0)  # Em watts
+        logs = data.get('logs', [])
+
+        if device_power_watts <= 0:
+            return jsonify({'error': 'Device power must be greater than zero'}), 400
+
+        result = await offloader.run(consumo_flask.calculate_lamp_consumption,
+                                     device_power_watts, logs, data.get('device_id'))
+        return jsonify(result)
+
+    except Overloaded:
+        return _overloaded()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/predictLamp', methods=['POST'])
+async def predict_lamp():
+    try:
+        data = await request.get_json()
+        device_power_watts = data.get('device_power', 0)
+        logs = data.get('logs', [])
+
+        if device_power_watts <= 0:
+            return jsonify({'error': 'Device power must be greater than zero'}), 400
+
+        result = await offloader.coalesce(await _request_key(), _predict_lamp, device_power_watts, logs)
+        return jsonify(result)
+
+    except Overloaded:
+        return _overloaded()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/calculatePlug', methods=['POST'])
+async def calculate_plug():
+    try:
+        data = await request.get_json()
+
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+
+        total_consumption = float(data.get('total', 0))
+
+        if total_consumption <= 0:
+            return jsonify({'error': 'Total consumption must be greater than zero'}), 400
+
+        # Cálculo trivial, feito direto no event loop
+        return jsonify({
+            'total_energy': total_consumption,
+            'carbon_footprint': total_consumption * CO2_EMISSION_RATE
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/predictPlug', methods=['POST'])
+async def predict_plug():
+    try:
+        data = await request.get_json()
+
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+
+        total_consumption = float(data.get('total', 0))
+
+        if total_consumption <= 0:
+            return jsonify({'error': 'Total consumption must be greater than zero'}), 400
+
+        result = await offloader.coalesce(await _request_key(), _predict_plug, total_consumption)
+        return jsonify(result)
+
+    except Overloaded:
+        return _overloaded()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/health', methods=['GET'])
+async def health():
+    return jsonify({'status': 'ok', **offloader.stats()})
+
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5003)
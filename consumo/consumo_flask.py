@@ -1,17 +1,73 @@
-from flask import Flask, request, jsonify
-from datetime import datetime
-import joblib
+from flask import Blueprint, Flask, request, jsonify
+import threading
+
 import numpy as np
 
-app = Flask(__name__)
+from energy_ledger import DEFAULT_LEDGER_PATH, EnergyLedger
+from lamp_aggregation import aggregate_usage, total_usage_hours
+from model_artifact import LazyModel
+from prediction_cache import PredictionCache
 
 # Taxa de emissão de CO₂ em kg/kWh
 CO2_EMISSION_RATE = 0.233  # Ajuste conforme necessário
 
-# Carregar o modelo de IA treinado
-model = joblib.load('energy_consumption_model.pkl')
-
-@app.route('/calculateLamp', methods=['POST'])
+# Modelo de IA treinado, carregado na primeira predição
+model = LazyModel('energy_consumption_model.pkl')
+
+# Rotas registradas tanto no app deste módulo quanto no app unificado (wsgi.py)
+lamp_routes = Blueprint('lamp', __name__)
+
+# Totais de consumo acumulados por dispositivo, criados na primeira chamada com device_id
+ledger = None
+_ledger_lock = threading.Lock()
+
+def get_ledger():
+    global ledger
+    if ledger is None:
+        # Duas requisições simultâneas criariam dois EnergyLedger, cada um com sua trava
+        with _ledger_lock:
+            if ledger is None:
+                ledger = EnergyLedger(DEFAULT_LEDGER_PATH)
+    return ledger
+
+def calculate_lamp_consumption(device_power_watts, logs, device_id=None):
+    """
+    Calcula o consumo e a pegada de carbono de uma lâmpada a partir dos logs de liga/desliga.
+
+    :param device_power_watts: Potência do dispositivo em watts
+    :param logs: Logs no formato do aplicativo
+    :param device_id: Se informado, os logs são somados ao histórico salvo do dispositivo
+    :return: Dicionário com a resposta de /calculateLamp
+    """
+    energy_per_hour = device_power_watts / 1000  # Convertendo watts para kWh
+
+    if device_id is not None:
+        # Com device_id, só os logs a partir do cursor são enviados e os totais vêm do
+        # histórico salvo, lidos na mesma transação que grava os logs novos
+        usage = get_ledger().record(str(device_id), logs, energy_per_hour)
+    else:
+        # Agregar o consumo total e por dia, semana e mês em uma única passagem
+        usage = aggregate_usage(logs, energy_per_hour)
+    total_energy = usage['total']
+
+    # Calcula a pegada de carbono
+    carbon_footprint = total_energy * CO2_EMISSION_RATE
+
+    # Retornar os valores de consumo e pegada de carbono para o Flutter
+    response = {
+        'daily_energy': usage['daily'],
+        'weekly_energy': usage['weekly'],
+        'monthly_energy': usage['monthly'],
+        'total_energy': total_energy,
+        'carbon_footprint': carbon_footprint
+    }
+    if device_id is not None:
+        # Horário do último log processado: o aplicativo envia apenas os logs a partir dele
+        # (inclusive); os do mesmo segundo já contados são reconhecidos e ignorados
+        response['cursor'] = usage['cursor']
+    return response
+
+@lamp_routes.route('/calculateLamp', methods=['POST'])
 def calculate():
     try:
         # Receber o consumo do dispositivo em watts
@@ -21,81 +77,38 @@ def calculate():
         if device_power_watts <= 0:
             return jsonify({'error': 'Device power must be greater than zero'}), 400
 
-        # Ordenar os logs pela data
-        logs = sorted(logs, key=lambda x: datetime.strptime(x.get('timeStr'), "%Y-%m-%d %H:%M:%S"))
-
-        energy_per_hour = device_power_watts / 1000  # Convertendo watts para kWh
-
-        daily_energy = {}
-        weekly_energy = {}
-        monthly_energy = {}
-
-        previous_time = None
-        total_energy = 0
-
-        # Iterar sobre os logs para calcular o tempo em que o dispositivo ficou ligado
-        for log in logs:
-            timestamp = log.get('timeStamp')
-            value = log.get('value')
-            time_str = log.get('timeStr')
-
-            log_time = datetime.strptime(time_str, "%Y-%m-%d %H:%M:%S")
-
-            if previous_time is not None:
-                # Calcular a diferença de tempo entre os logs de ligar/desligar
-                time_diff = (log_time - previous_time).total_seconds() / 3600.0  # Em horas
-
-                if value == "false":  # Se o valor for "false", o dispositivo estava desligado
-                    energy_consumed = time_diff * energy_per_hour
-
-                    # Atualizar a energia total
-                    total_energy += energy_consumed
+        return jsonify(calculate_lamp_consumption(device_power_watts, logs, request.json.get('device_id')))
 
-                    # Atualizar o consumo por dia, semana e mês
-                    day = log_time.date()
-                    week = log_time.isocalendar()[1]
-                    month = log_time.month
-
-                    # Consumo diário
-                    if day not in daily_energy:
-                        daily_energy[day] = 0
-                    daily_energy[day] += energy_consumed
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-                    # Consumo semanal
-                    if week not in weekly_energy:
-                        weekly_energy[week] = 0
-                    weekly_energy[week] += energy_consumed
+# Cache das predições, compartilhado entre as rotas /predictLamp e /predictLamp/batch
+prediction_cache = PredictionCache(max_size=10000, ttl=3600)
 
-                    # Consumo mensal
-                    if month not in monthly_energy:
-                        monthly_energy[month] = 0
-                    monthly_energy[month] += energy_consumed
+def predict_energy(features):
+    """
+    Prevê o consumo mensal de vários dispositivos com uma única chamada ao modelo.
 
-            # Atualizar o tempo anterior somente se o valor for "true" (ligado)
-            if value == "true":
-                previous_time = log_time
+    As predições já calculadas são reaproveitadas do cache; apenas os pares
+    (potência, horas de uso) ausentes vão para o modelo, todos juntos. As horas
+    arredondadas servem só como chave do cache: o modelo recebe os valores exatos.
 
-        # Calcula a pegada de carbono
-        carbon_footprint = total_energy * CO2_EMISSION_RATE
+    :param features: Lista de pares (device_power_watts, total_usage_hours)
+    :return: Lista com o consumo mensal previsto (kWh) de cada dispositivo
+    """
+    keys = [prediction_cache.key(power, hours) for power, hours in features]
+    predictions = [prediction_cache.get(key) for key in keys]
 
-        # Convertendo as chaves dos dicionários de datetime.date para strings
-        daily_energy_str = {str(day): value for day, value in daily_energy.items()}
-        weekly_energy_str = {str(week): value for week, value in weekly_energy.items()}
-        monthly_energy_str = {str(month): value for month, value in monthly_energy.items()}
+    missing = [i for i, prediction in enumerate(predictions) if prediction is None]
+    if missing:
+        X = np.array([features[i] for i in missing], dtype=float)
+        for i, prediction in zip(missing, model.predict(X)):
+            predictions[i] = float(prediction)
+            prediction_cache.put(keys[i], predictions[i])
 
-        # Retornar os valores de consumo e pegada de carbono para o Flutter
-        return jsonify({
-            'daily_energy': daily_energy_str,
-            'weekly_energy': weekly_energy_str,
-            'monthly_energy': monthly_energy_str,
-            'total_energy': total_energy,
-            'carbon_footprint': carbon_footprint
-        })
+    return predictions
 
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/predictLamp', methods=['POST'])
+@lamp_routes.route('/predictLamp', methods=['POST'])
 def predict():
     try:
 
@@ -108,37 +121,11 @@ def predict():
         if device_power_watts <= 0:
             return jsonify({'error': 'Device power must be greater than zero'}), 400
 
-        # Ordenar os logs pela data
-
-        logs = sorted(logs, key=lambda x: datetime.strptime(x.get('timeStr'), "%Y-%m-%d %H:%M:%S"))
-
-        previous_time = None
-
-        total_usage_hours = 0
-
-        # Iterar sobre os logs para calcular o tempo total de uso
-
-        for log in logs:
-
-            time_str = log.get('timeStr')
-
-            value = log.get('value')
-
-            log_time = datetime.strptime(time_str, "%Y-%m-%d %H:%M:%S")
-
-            if previous_time is not None:
-
-                time_diff = (log_time - previous_time).total_seconds() / 3600.0  # Em horas
-
-                if value == "false":
-                    total_usage_hours += time_diff
-
-            if value == "true":
-                previous_time = log_time
+        usage_hours = total_usage_hours(logs)
 
         # Fazer a predição do consumo mensal usando o modelo treinado
 
-        predicted_energy_kwh = model.predict([[device_power_watts, total_usage_hours]])[0]
+        predicted_energy_kwh = predict_energy([(device_power_watts, usage_hours)])[0]
 
         # Calcular a pegada de carbono prevista
 
@@ -159,6 +146,46 @@ def predict():
 
         return jsonify({'error': str(e)}), 500
 
+@lamp_routes.route('/predictLamp/batch', methods=['POST'])
+def predict_batch():
+    try:
+        # Receber a lista de dispositivos, cada um com a potência e os logs
+        devices = request.json.get('devices', [])
+
+        if not devices:
+            return jsonify({'error': 'No devices provided'}), 400
+
+        results = [None] * len(devices)
+        features = []
+        valid = []
+
+        for i, device in enumerate(devices):
+            device_power_watts = device.get('device_power', 0)
+            if device_power_watts <= 0:
+                results[i] = {'error': 'Device power must be greater than zero'}
+                continue
+            features.append((device_power_watts, total_usage_hours(device.get('logs', []))))
+            valid.append(i)
+
+        # Uma única predição vetorizada para todos os dispositivos válidos
+        for i, predicted_energy_kwh in zip(valid, predict_energy(features)):
+            results[i] = {
+                'predicted_monthly_energy': predicted_energy_kwh,
+                'predicted_carbon_footprint': predicted_energy_kwh * CO2_EMISSION_RATE
+            }
+
+        return jsonify({'predictions': results})
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@lamp_routes.route('/predictLamp/cacheStats', methods=['GET'])
+def cache_stats():
+    return jsonify(prediction_cache.stats())
+
+
+app = Flask(__name__)
+app.register_blueprint(lamp_routes)
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5001)
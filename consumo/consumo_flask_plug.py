@@ -1,17 +1,19 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, request, jsonify
 from datetime import datetime
-import joblib
 import numpy as np
 
-app = Flask(__name__)
+from model_artifact import LazyModel
 
 # Taxa de emissão de CO₂ em kg/kWh
 CO2_EMISSION_RATE = 0.233  # Ajuste conforme necessário
 
-# Carregar o modelo de IA treinado
-model = joblib.load('energy_consumption_model_plug.pkl')
+# Modelo de IA treinado, carregado na primeira predição
+model = LazyModel('energy_consumption_model_plug.pkl')
+
+# Rotas registradas tanto no app deste módulo quanto no app unificado (wsgi.py)
+plug_routes = Blueprint('plug', __name__)
 
-@app.route('/calculatePlug', methods=['POST'])
+@plug_routes.route('/calculatePlug', methods=['POST'])
 def calculate():
     try:
         # Receber os dados do dispositivo
@@ -40,7 +42,7 @@ def calculate():
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/predictPlug', methods=['POST'])
+@plug_routes.route('/predictPlug', methods=['POST'])
 def predict():
     try:
         # Receber os dados do dispositivo
@@ -71,5 +73,8 @@ def predict():
         return jsonify({'error': str(e)}), 500
 
 
+app = Flask(__name__)
+app.register_blueprint(plug_routes)
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5001)
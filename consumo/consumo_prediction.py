@@ -1,21 +1,27 @@
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LinearRegression
 import joblib
 import json
 import os
-from datetime import datetime, timedelta
-import random
+from datetime import datetime
+
+from model_artifact import artifact_path, save_linear_artifact
 
 
 # Função para gerar dados simulados com base em um intervalo de datas
-def generate_simulated_data(start_date='2023-01-01', end_date='2024-01-01', num_records=12):
+def generate_simulated_data(start_date='2023-01-01', end_date='2024-01-01', num_records=12, seed=None):
     """
     Gera um conjunto de dados simulados de consumo mensal.
 
+    Para volumes de teste de carga (milhares de dispositivos, logs por minuto) use o
+    simulated_data.py.
+
     :param start_date: Data inicial no formato 'YYYY-MM-DD'
     :param end_date: Data final no formato 'YYYY-MM-DD'
     :param num_records: Número de registros a serem gerados (padrão é 12 meses)
+    :param seed: Semente do gerador; a mesma semente gera os mesmos dados
     :return: Lista de dicionários com as informações simuladas
     """
     start = datetime.strptime(start_date, "%Y-%m-%d")
@@ -24,24 +30,12 @@ def generate_simulated_data(start_date='2023-01-01', end_date='2024-01-01', num_
     # Calcula a quantidade de meses entre as datas
     delta_months = (end.year - start.year) * 12 + end.month - start.month
 
-    # Gerar consumo mensal de forma consistente
-    data = []
-    current_date = start
-
-    for _ in range(min(delta_months, num_records)):
-        # Simula um consumo aleatório para cada mês (por exemplo, entre 5 kWh e 15 kWh)
-        total_coust = round(random.uniform(5.0, 15.0), 2)
+    # Um registro por mês a partir da data inicial, com consumo entre 5 kWh e 15 kWh
+    dates = pd.date_range(start, periods=max(0, min(delta_months, num_records)), freq=pd.DateOffset(months=1))
+    total_coust = np.round(np.random.default_rng(seed).uniform(5.0, 15.0, len(dates)), 2)
 
-        # Formata a data para o formato 'YYYY-MM-DD'
-        data.append({
-            "date": current_date.strftime('%Y-%m-%d %H:%M:%S.000'),
-            "totalCoust": total_coust
-        })
-
-        # Avança para o próximo mês
-        next_month = current_date.month % 12 + 1
-        next_year = current_date.year + (1 if current_date.month == 12 else 0)
-        current_date = current_date.replace(month=next_month, year=next_year)
+    data = [{"date": date, "totalCoust": float(value)}
+            for date, value in zip(dates.strftime('%Y-%m-%d %H:%M:%S.000'), total_coust)]
 
     # Salvando os dados simulados em um arquivo JSON
     with open('plug_data.json', 'w') as f:
@@ -49,6 +43,8 @@ def generate_simulated_data(start_date='2023-01-01', end_date='2024-01-01', num_
 
     print(f'{len(data)} registros gerados e salvos no arquivo plug_data.json.')
 
+    return data
+
 
 # Função para carregar os dados no novo formato do plug
 def load_training_data(json_file='plug_data.json'):
@@ -87,6 +83,10 @@ def train_model():
     model.fit(X_train, y_train)
 
     joblib.dump(model, 'energy_consumption_model_plug.pkl')
+
+    # Coeficientes em JSON, usados pelos serviços sem precisar abrir o pickle
+    save_linear_artifact(model, artifact_path('energy_consumption_model_plug.pkl'),
+                         source_path='energy_consumption_model_plug.pkl')
     print("Modelo de IA treinado e salvo com sucesso!")
 
 
@@ -5,6 +5,8 @@ import joblib
 import json
 import os
 
+from model_artifact import artifact_path, save_linear_artifact
+
 
 # Função para carregar os dados no novo formato do plug
 def load_training_data(json_file='plug_data.json'):
@@ -43,6 +45,10 @@ def train_model():
     model.fit(X_train, y_train)
 
     joblib.dump(model, 'energy_consumption_model_plug.pkl')
+
+    # Coeficientes em JSON, usados pelos serviços sem precisar abrir o pickle
+    save_linear_artifact(model, artifact_path('energy_consumption_model_plug.pkl'),
+                         source_path='energy_consumption_model_plug.pkl')
     print("Modelo de IA treinado e salvo com sucesso!")
 
 
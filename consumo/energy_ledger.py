@@ -0,0 +1,162 @@
+import sqlite3
+import threading
+from contextlib import closing
+
+import numpy as np
+
+from lamp_aggregation import aggregate_parsed_usage, parse_log_times
+
+# Banco local com o estado e os totais de cada dispositivo
+DEFAULT_LEDGER_PATH = 'energy_ledger.db'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger_state (
+    device_id TEXT PRIMARY KEY,
+    cursor TEXT,           -- timeStr do último log processado
+    cursor_count INTEGER NOT NULL DEFAULT 0,  -- logs já processados com o timeStr do cursor (-1: todos)
+    open_since TEXT,       -- timeStr do último log "true" (intervalo ainda aberto)
+    total_energy REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS ledger_rollup (
+    device_id TEXT NOT NULL,
+    period TEXT NOT NULL,  -- 'daily', 'weekly' ou 'monthly'
+    bucket TEXT NOT NULL,
+    energy REAL NOT NULL,
+    PRIMARY KEY (device_id, period, bucket)
+);
+"""
+
+PERIODS = ('daily', 'weekly', 'monthly')
+
+
+class EnergyLedger:
+    """
+    Guarda, por dispositivo, os totais de consumo já calculados e o estado necessário para
+    continuar o cálculo, de modo que cada chamada processe apenas os logs novos.
+
+    O cursor é o timeStr do último log processado, com a quantidade de logs daquele mesmo
+    segundo já processados. O aplicativo envia os logs a partir do cursor (inclusive):
+    logs anteriores a ele são ignorados e, dos logs no segundo do cursor, os primeiros
+    cursor_count são os já contados. Assim um segundo log no mesmo segundo não se perde.
+    O horário do último "true" fica salvo em open_since, então um intervalo que começou em
+    uma chamada e terminou na seguinte é contado normalmente.
+    """
+
+    def __init__(self, path=DEFAULT_LEDGER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+            # Bancos criados antes da coluna cursor_count: naquela versão todos os logs do
+            # segundo do cursor já tinham sido contados
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(ledger_state)')}
+            if 'cursor_count' not in columns:
+                conn.execute('ALTER TABLE ledger_state ADD COLUMN cursor_count INTEGER NOT NULL DEFAULT 0')
+                conn.execute('UPDATE ledger_state SET cursor_count = -1 WHERE cursor IS NOT NULL')
+
+    def _connect(self):
+        # Transações controladas manualmente (BEGIN IMMEDIATE) em record()
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def record(self, device_id, logs, energy_per_hour):
+        """
+        Processa os logs novos de um dispositivo e atualiza os totais.
+
+        O resumo é lido na mesma transação da escrita, então reflete exatamente os logs
+        desta chamada, mesmo com outra requisição do mesmo dispositivo em seguida.
+
+        :param device_id: Identificador do dispositivo
+        :param logs: Logs no formato do aplicativo; os já processados são ignorados
+        :param energy_per_hour: Consumo do dispositivo ligado, em kWh por hora
+        :return: Dicionário de summary() com os totais atualizados e 'processed', a
+                 quantidade de logs novos processados
+        """
+        with self._lock, closing(self._connect()) as conn:
+            # Trava de escrita desde a leitura do cursor, para que dois processos não
+            # contem os mesmos logs
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                processed = self._record(conn, device_id, logs, energy_per_hour)
+                result = self._summary(conn, device_id)
+                conn.execute('COMMIT')
+                result['processed'] = processed
+                return result
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def _record(self, conn, device_id, logs, energy_per_hour):
+        row = conn.execute('SELECT cursor, cursor_count, open_since FROM ledger_state WHERE device_id = ?',
+                           (device_id,)).fetchone()
+        cursor, cursor_count, open_since = row if row else (None, 0, None)
+
+        # Apenas os logs a partir do cursor (o formato de timeStr ordena como texto), sem
+        # os primeiros cursor_count do segundo do cursor, que já foram contados; logs sem
+        # timeStr válido seguem adiante para serem rejeitados na conversão
+        new_logs = []
+        skip = cursor_count
+        for log in logs:
+            time_str = log.get('timeStr')
+            if cursor is not None and isinstance(time_str, str):
+                if time_str < cursor:
+                    continue
+                if time_str == cursor and (cursor_count < 0 or skip):
+                    skip -= 1
+                    continue
+            new_logs.append(log)
+        processed = len(new_logs)
+        if not processed:
+            return 0
+        time_strs = [log.get('timeStr') for log in new_logs]
+
+        # O último "true" já processado abre o intervalo que pode ser fechado agora
+        if open_since is not None:
+            new_logs = [{'timeStr': open_since, 'value': 'true'}] + new_logs
+
+        times, values = parse_log_times(new_logs)
+        usage = aggregate_parsed_usage(times, values, energy_per_hour)
+
+        true_times = times[values == 'true']
+        if len(true_times):
+            open_since = np.datetime_as_string(true_times[-1], unit='s').replace('T', ' ')
+        new_cursor = np.datetime_as_string(times[-1], unit='s').replace('T', ' ')
+        # Logs deste lote no segundo do novo cursor, somados aos já contados se o cursor não mudou
+        new_count = sum(time_str == new_cursor for time_str in time_strs)
+        if new_cursor == cursor:
+            new_count = -1 if cursor_count < 0 else new_count + cursor_count
+
+        conn.execute(
+            'INSERT INTO ledger_state (device_id, cursor, cursor_count, open_since, total_energy) '
+            'VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT(device_id) DO UPDATE SET cursor = excluded.cursor, cursor_count = excluded.cursor_count, '
+            'open_since = excluded.open_since, total_energy = total_energy + excluded.total_energy',
+            (device_id, new_cursor, new_count, open_since, usage['total'])
+        )
+        conn.executemany(
+            'INSERT INTO ledger_rollup (device_id, period, bucket, energy) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT(device_id, period, bucket) DO UPDATE SET energy = energy + excluded.energy',
+            [(device_id, period, bucket, energy)
+             for period in PERIODS for bucket, energy in usage[period].items()]
+        )
+        return processed
+
+    def summary(self, device_id):
+        """
+        :param device_id: Identificador do dispositivo
+        :return: Dicionário com total, totais por dia, semana e mês e o cursor atual
+        """
+        with closing(self._connect()) as conn:
+            return self._summary(conn, device_id)
+
+    def _summary(self, conn, device_id):
+        row = conn.execute('SELECT cursor, total_energy FROM ledger_state WHERE device_id = ?',
+                           (device_id,)).fetchone()
+        result = {'cursor': row[0] if row else None, 'total': row[1] if row else 0.0}
+        for period in PERIODS:
+            result[period] = dict(conn.execute(
+                'SELECT bucket, energy FROM ledger_rollup WHERE device_id = ? AND period = ? ORDER BY bucket',
+                (device_id, period)
+            ).fetchall())
+        return result
@@ -0,0 +1,25 @@
+# Configuração do gunicorn para o wsgi.py (gunicorn -c gunicorn.conf.py wsgi:app)
+import multiprocessing
+import os
+
+# Endereço e porta do serviço
+bind = os.environ.get('CONSUMO_BIND', '0.0.0.0:5001')
+
+# Processos e threads por processo; as rotas passam a maior parte do tempo em numpy,
+# então algumas threads por worker absorvem picos sem multiplicar a memória
+workers = int(os.environ.get('CONSUMO_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('CONSUMO_THREADS', 4))
+worker_class = 'gthread'
+
+# Carrega o app (e os modelos) antes do fork, compartilhando a memória entre os workers
+preload_app = True
+
+# Conexões HTTP mantidas abertas pelos aplicativos e limite de tempo por requisição
+keepalive = int(os.environ.get('CONSUMO_KEEPALIVE', 5))
+timeout = int(os.environ.get('CONSUMO_TIMEOUT', 30))
+
+# Reinicia os workers periodicamente para evitar crescimento de memória
+max_requests = int(os.environ.get('CONSUMO_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('CONSUMO_MAX_REQUESTS_JITTER', 1000))
+
+accesslog = '-'
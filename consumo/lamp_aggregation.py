@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+# Formato do campo 'timeStr' enviado pelo aplicativo
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _bucket_sums(keys, weights):
+    # Soma os pesos por chave com um único bincount, na ordem crescente das chaves
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    return unique_keys, np.bincount(inverse, weights=weights, minlength=len(unique_keys))
+
+
+def parse_log_times(logs):
+    """
+    Converte os campos 'timeStr' e 'value' dos logs em arrays, ordenados pelo horário.
+
+    :param logs: Lista de logs no formato do aplicativo ({'timeStr', 'value', ...})
+    :return: Tupla (horários datetime64[s], valores) em ordem cronológica
+    """
+    times = pd.to_datetime(pd.Series([log.get('timeStr') for log in logs], dtype=object),
+                           format=TIME_FORMAT).to_numpy(dtype='datetime64[s]')
+    if np.isnat(times).any():
+        raise ValueError("Every log must have a valid 'timeStr'")
+    values = np.array([log.get('value') for log in logs], dtype=object)
+
+    # Ordenação estável, como o sorted() usado antes
+    order = np.argsort(times, kind='stable')
+    return times[order], values[order]
+
+
+def pair_usage_intervals(times, values):
+    """
+    Associa cada log "false" ao último log "true" anterior a ele.
+
+    Mantém a regra original: o horário de referência só muda em um log "true", então
+    vários "false" seguidos são medidos a partir do mesmo "true".
+
+    :param times: Horários em ordem cronológica (datetime64)
+    :param values: Valores 'true'/'false' na mesma ordem
+    :return: Tupla (horários dos logs "false" pareados, duração de cada intervalo em horas)
+    """
+    is_true = values == "true"
+    is_false = values == "false"
+
+    positions = np.arange(len(times))
+    last_true = np.maximum.accumulate(np.where(is_true, positions, -1)) if len(times) else positions
+    paired = is_false & (last_true >= 0)
+
+    off_times = times[paired]
+    hours = (off_times - times[last_true[paired]]) / np.timedelta64(1, 'h')
+    return off_times, hours
+
+
+def total_usage_hours(logs):
+    """
+    :param logs: Lista de logs no formato do aplicativo ({'timeStr', 'value', ...})
+    :return: Tempo total em que o dispositivo ficou ligado, em horas
+    """
+    if not logs:
+        return 0.0
+    _, hours = pair_usage_intervals(*parse_log_times(logs))
+    return float(hours.sum())
+
+
+def aggregate_usage(logs, energy_per_hour=1.0):
+    """
+    Calcula o consumo total e por dia, semana ISO e mês em uma única passagem vetorizada.
+
+    Com energy_per_hour=1.0 os valores são horas de uso; com a potência em kW, são kWh.
+    As chaves de semana ('2024-W05') e de mês ('2024-05') incluem o ano.
+
+    :param logs: Lista de logs no formato do aplicativo ({'timeStr', 'value', ...})
+    :param energy_per_hour: Fator aplicado a cada hora de uso
+    :return: Dicionário com 'total', 'daily', 'weekly' e 'monthly'
+    """
+    if not logs:
+        return {'total': 0.0, 'daily': {}, 'weekly': {}, 'monthly': {}}
+    return aggregate_parsed_usage(*parse_log_times(logs), energy_per_hour=energy_per_hour)
+
+
+def aggregate_parsed_usage(times, values, energy_per_hour=1.0):
+    """
+    Mesmo cálculo de aggregate_usage, para logs já convertidos por parse_log_times.
+
+    :param times: Horários em ordem cronológica (datetime64)
+    :param values: Valores 'true'/'false' na mesma ordem
+    :param energy_per_hour: Fator aplicado a cada hora de uso
+    :return: Dicionário com 'total', 'daily', 'weekly' e 'monthly'
+    """
+    result = {'total': 0.0, 'daily': {}, 'weekly': {}, 'monthly': {}}
+    off_times, hours = pair_usage_intervals(times, values)
+    if not len(off_times):
+        return result
+
+    energy = hours * energy_per_hour
+    result['total'] = float(energy.sum())
+
+    # O consumo é atribuído ao dia do log "false", como antes
+    days, daily = _bucket_sums(off_times.astype('datetime64[D]'), energy)
+    result['daily'] = {str(day): float(value) for day, value in zip(days, daily)}
+
+    # Semana e mês são calculados só para os dias distintos
+    iso = pd.DatetimeIndex(days).isocalendar()
+    week_keys = [f'{year}-W{week:02d}' for year, week in zip(iso['year'], iso['week'])]
+    weeks, weekly = _bucket_sums(np.array(week_keys), daily)
+    result['weekly'] = {str(week): float(value) for week, value in zip(weeks, weekly)}
+
+    months, monthly = _bucket_sums(days.astype('datetime64[M]'), daily)
+    result['monthly'] = {str(month): float(value) for month, value in zip(months, monthly)}
+
+    return result
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+# Versão do formato do arquivo de coeficientes
+ARTIFACT_VERSION = 1
+
+
+def artifact_path(model_path):
+    """
+    :param model_path: Caminho do modelo em pickle (.pkl)
+    :return: Caminho do arquivo de coeficientes correspondente (.json)
+    """
+    return os.path.splitext(model_path)[0] + '.json'
+
+
+def file_sha256(path):
+    """
+    :param path: Caminho do arquivo
+    :return: sha256 do conteúdo do arquivo, em hexadecimal
+    """
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def save_linear_artifact(model, path, source_path=None):
+    """
+    Salva apenas os coeficientes de um modelo linear (LinearRegression e similares) em JSON.
+
+    :param model: Modelo treinado com coef_ e intercept_
+    :param path: Caminho do arquivo .json
+    :param source_path: Pickle já gravado do mesmo modelo; o sha256 dele vai no JSON para
+                        LazyModel conferir se os dois arquivos correspondem (opcional)
+    """
+    coef = np.atleast_1d(np.asarray(model.coef_, dtype=float))
+    data = {
+        'version': ARTIFACT_VERSION,
+        'model': type(model).__name__,
+        'features': [str(name) for name in getattr(model, 'feature_names_in_', [])],
+        'coef': coef.tolist(),
+        'intercept': np.asarray(model.intercept_, dtype=float).tolist(),
+    }
+    if source_path is not None:
+        data['source_sha256'] = file_sha256(source_path)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, path)
+
+
+class LinearArtifact:
+    """Modelo linear carregado do JSON de coeficientes; a predição é um produto escalar."""
+
+    def __init__(self, coef, intercept, features=()):
+        self.coef = np.asarray(coef, dtype=float)
+        self.intercept = np.asarray(intercept, dtype=float)
+        self.features = list(features)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data.get('version') != ARTIFACT_VERSION:
+            raise ValueError(f"Versão de artefato não suportada em {path}: {data.get('version')}")
+        return cls(data['coef'], data['intercept'], data.get('features', []))
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=float)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.coef.shape[-1]:
+            raise ValueError(f'Esperadas {self.coef.shape[-1]} features, recebidas {X.shape[1]}')
+        return X @ self.coef.T + self.intercept
+
+
+class LazyModel:
+    """
+    Carrega o modelo apenas na primeira predição.
+
+    Se existir o JSON de coeficientes gerado a partir do pickle atual (o sha256 gravado no
+    JSON confere com o do pickle), a predição usa só NumPy; caso contrário o pickle do
+    sklearn é aberto. O conteúdo é comparado, e não a data dos arquivos, que o git não
+    preserva. A falta dos dois arquivos não impede a importação do serviço: o erro aparece
+    na predição.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: Caminho do modelo em pickle (.pkl)
+        """
+        self.path = path
+        self.artifact_path = artifact_path(path)
+
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _use_artifact(self):
+        if not os.path.exists(self.artifact_path):
+            return False
+        if not os.path.exists(self.path):
+            return True
+        with open(self.artifact_path, 'r') as f:
+            source_sha256 = json.load(f).get('source_sha256')
+        # Sem o hash não há como saber se o JSON é do pickle atual
+        return source_sha256 is not None and source_sha256 == file_sha256(self.path)
+
+    def load(self):
+        """
+        :return: O modelo carregado (LinearArtifact ou o objeto do sklearn)
+        """
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    if self._use_artifact():
+                        self._model = LinearArtifact.load(self.artifact_path)
+                    elif os.path.exists(self.path):
+                        import joblib  # Só quando o modelo não tem JSON de coeficientes
+                        self._model = joblib.load(self.path)
+                    else:
+                        raise FileNotFoundError(f'O modelo {self.path} não foi encontrado.')
+        return self._model
+
+    def try_load(self):
+        """
+        Carrega o modelo se os arquivos existirem, sem lançar exceção.
+
+        :return: True se o modelo está carregado
+        """
+        try:
+            self.load()
+        except Exception:
+            # Arquivo ausente ou corrompido: o erro volta a aparecer na predição
+            pass
+        return self.is_loaded()
+
+    def is_loaded(self):
+        return self._model is not None
+
+    def predict(self, X):
+        return self.load().predict(X)
@@ -0,0 +1,61 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    Cache LRU com expiração (TTL) para as predições do modelo.
+
+    As chaves são tuplas (potência, horas de uso arredondadas), então dispositivos com o
+    mesmo perfil de uso reaproveitam a mesma predição. Os contadores de acertos e falhas
+    ficam disponíveis em stats().
+    """
+
+    def __init__(self, max_size=10000, ttl=3600, hours_precision=2):
+        """
+        :param max_size: Quantidade máxima de predições guardadas
+        :param ttl: Tempo de vida de cada predição, em segundos
+        :param hours_precision: Casas decimais usadas para arredondar as horas de uso na chave
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hours_precision = hours_precision
+        self.hits = 0
+        self.misses = 0
+
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, device_power, usage_hours):
+        return float(device_power), round(float(usage_hours), self.hours_precision)
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[1] < time.monotonic():
+                if item is not None:
+                    del self._items[key]
+                self.misses += 1
+                return None
+
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + self.ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._items),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,340 @@
+"""
+Gerador de dados simulados em grande escala, para testes de carga.
+
+Simula o uso minuto a minuto (liga/desliga, potência, voltagem e corrente) de milhares de
+dispositivos com NumPy vetorizado e semente fixa: a mesma semente gera sempre os mesmos
+dados. Os dispositivos são processados em blocos, então o volume gerado não depende da
+memória disponível. As saídas possíveis são:
+
+- readings: uma leitura por dispositivo por intervalo, em NDJSON ou Parquet (requer pyarrow);
+- lamp: um payload de /calculateLamp por dispositivo ({'device_power', 'logs'}), em NDJSON;
+- status: banco SQLite com as tabelas CafeteiraLog, GeladeiraLog e DeviceLog e os status no
+  formato lido pelos scripts de anomalia;
+- history: histórico mensal ('device_id', 'device_class', 'date', 'totalCoust') em NDJSON,
+  no formato do training_pipeline.py.
+"""
+import json
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+# Perfil de cada classe: tabela de log, faixa de potência (W) e duração média ligado/desligado (min)
+DEVICE_PROFILES = {
+    'cafeteira': {'table': 'CafeteiraLog', 'power': (800, 1400), 'mean_on': 15, 'mean_off': 240},
+    'geladeira': {'table': 'GeladeiraLog', 'power': (90, 250), 'mean_on': 25, 'mean_off': 35},
+    'lampada': {'table': 'DeviceLog', 'power': (5, 60), 'mean_on': 180, 'mean_off': 420},
+}
+
+# Voltagem, corrente e potência vão no status multiplicadas por 10, como nos dispositivos
+STATUS_SCALE = 10
+
+OUTPUTS = ('readings', 'lamp', 'status', 'history')
+
+# Quantidade aproximada de leituras mantidas em memória por bloco de dispositivos
+DEFAULT_BLOCK_READINGS = 2000000
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Status no formato enviado pelos dispositivos (literal Python de uma lista de dicionários)
+_STATUS_TEMPLATE = ("[{'code': 'switch_1', 'value': %s, 't': %d}, {'code': 'cur_current', 'value': %d, 't': %d}, "
+                    "{'code': 'cur_power', 'value': %d, 't': %d}, {'code': 'cur_voltage', 'value': %d, 't': %d}]")
+
+
+def _time_strings(timestamps_ms):
+    # datetime_as_string é vetorizado; o resultado segue o TIME_FORMAT
+    return np.char.replace(np.datetime_as_string(timestamps_ms.astype('datetime64[ms]'), unit='s'), 'T', ' ')
+
+
+def _simulate_states(rng, n_devices, minutes, mean_on, mean_off):
+    """
+    Sorteia os períodos ligado/desligado de cada dispositivo (cadeia de Markov de dois estados).
+
+    :return: Tupla (estado inicial, matriz com os minutos em que o estado de cada dispositivo troca)
+    """
+    initial_on = rng.random(n_devices) < mean_on / (mean_on + mean_off)
+    mean_run = np.where(initial_on[:, None], [[mean_on, mean_off]], [[mean_off, mean_on]])
+
+    # Durações alternadas (colunas pares e ímpares); mais colunas são sorteadas até todos
+    # os dispositivos cobrirem o período
+    means = np.tile(mean_run, (1, int(minutes / (mean_on + mean_off)) + 4))
+    durations = rng.geometric(1 / means)
+    while durations.sum(axis=1).min() < minutes:
+        durations = np.hstack([durations, rng.geometric(1 / means)])
+
+    toggles = np.cumsum(durations, axis=1)
+    return initial_on, toggles
+
+
+def simulate_blocks(n_devices, days=30, start='2024-01-01', interval_minutes=1, anomaly_rate=0.001,
+                    seed=0, block_readings=DEFAULT_BLOCK_READINGS):
+    """
+    Simula o uso dos dispositivos, um bloco de dispositivos por vez.
+
+    Cada bloco é um dicionário com:
+    - 'device_id', 'device_class', 'device_power' (W): um item por dispositivo;
+    - 'event_device', 'event_ms', 'event_on': trocas de estado (índice do dispositivo no bloco);
+    - 'reading_device', 'reading_ms', 'on', 'power', 'voltage', 'current': leituras a cada
+      interval_minutes, com potência em W, voltagem em V e corrente em A.
+
+    :param n_devices: Quantidade de dispositivos
+    :param days: Dias simulados
+    :param start: Data inicial ('YYYY-MM-DD')
+    :param interval_minutes: Intervalo entre leituras
+    :param anomaly_rate: Fração das leituras com pico ou queda de voltagem
+    :param seed: Semente do gerador
+    :param block_readings: Leituras aproximadas por bloco (limita a memória usada)
+    :return: Gerador de blocos
+    """
+    rng = np.random.default_rng(seed)
+    minutes = days * 24 * 60
+    start_ms = np.datetime64(start, 'ms').astype(np.int64)
+    reading_minutes = np.arange(0, minutes, interval_minutes)
+    block_size = max(1, block_readings // len(reading_minutes))
+
+    classes = np.array(list(DEVICE_PROFILES))
+    device_classes = classes[rng.integers(0, len(classes), n_devices)]
+
+    for first in range(0, n_devices, block_size):
+        block_classes = device_classes[first:first + block_size]
+        n = len(block_classes)
+        device_ids = np.char.add('dev', np.char.zfill(np.arange(first, first + n).astype(str), 6))
+
+        power = np.empty(n)
+        on = np.empty((n, len(reading_minutes)), dtype=bool)
+        event_device, event_minute, event_on = [], [], []
+        for name in np.unique(block_classes):
+            profile = DEVICE_PROFILES[name]
+            idx = np.flatnonzero(block_classes == name)
+            power[idx] = np.round(rng.uniform(*profile['power'], len(idx)))
+
+            initial_on, toggles = _simulate_states(rng, len(idx), minutes, profile['mean_on'], profile['mean_off'])
+            inside = toggles < minutes
+            rows, cols = np.nonzero(inside)
+            event_device.append(idx[rows])
+            event_minute.append(toggles[rows, cols])
+            # Depois da k-ésima troca o estado é o inicial invertido k vezes
+            event_on.append(initial_on[rows] ^ (cols % 2 == 0))
+
+            # Estado em cada leitura: quantidade de trocas até o minuto da leitura, em paridade
+            n_toggles = np.stack([np.searchsorted(row, reading_minutes, side='right') for row in toggles])
+            on[idx] = initial_on[:, None] ^ (n_toggles % 2 == 1)
+
+        event_device = np.concatenate(event_device)
+        order = np.lexsort((np.concatenate(event_minute), event_device))
+        event_device = event_device[order]
+        # Segundos aleatórios dentro do minuto, para horários realistas
+        event_ms = (start_ms + np.concatenate(event_minute)[order] * 60000
+                    + rng.integers(0, 60, len(order)) * 1000)
+
+        voltage = rng.normal(220.0, 2.0, on.shape)
+        anomalies = rng.random(on.shape) < anomaly_rate
+        voltage[anomalies] *= rng.choice([0.75, 1.25], anomalies.sum()) * rng.uniform(0.95, 1.05, anomalies.sum())
+        reading_power = np.where(on, power[:, None] * rng.normal(1.0, 0.03, on.shape), 0.0)
+
+        yield {
+            'device_id': device_ids,
+            'device_class': block_classes,
+            'device_power': power,
+            'event_device': event_device,
+            'event_ms': event_ms,
+            'event_on': np.concatenate(event_on)[order],
+            'reading_device': np.repeat(np.arange(n), len(reading_minutes)),
+            'reading_ms': np.tile(start_ms + reading_minutes * 60000, n),
+            'on': on.ravel(),
+            'power': np.round(reading_power, 1).ravel(),
+            'voltage': np.round(voltage, 1).ravel(),
+            'current': np.round(reading_power / voltage, 3).ravel(),
+        }
+
+
+def readings_frame(block):
+    """
+    :param block: Bloco de simulate_blocks
+    :return: DataFrame com uma leitura por linha
+    """
+    devices = block['reading_device']
+    return pd.DataFrame({
+        'device_id': block['device_id'][devices],
+        'device_class': block['device_class'][devices],
+        'timestamp': block['reading_ms'],
+        'on': block['on'],
+        'power': block['power'],
+        'voltage': block['voltage'],
+        'current': block['current'],
+    })
+
+
+def lamp_payloads(block):
+    """
+    :param block: Bloco de simulate_blocks
+    :return: Gerador de payloads de /calculateLamp, um por dispositivo, com o device_id
+    """
+    time_strs = _time_strings(block['event_ms'])
+    values = np.where(block['event_on'], 'true', 'false')
+    bounds = np.searchsorted(block['event_device'], np.arange(len(block['device_id']) + 1))
+    for i, device_id in enumerate(block['device_id']):
+        s = slice(bounds[i], bounds[i + 1])
+        yield {
+            'device_id': str(device_id),
+            'device_power': float(block['device_power'][i]),
+            'logs': [{'timestamp': int(ms), 'value': value, 'timeStr': time_str}
+                     for ms, value, time_str in zip(block['event_ms'][s], values[s], time_strs[s])],
+        }
+
+
+def status_rows(block):
+    """
+    Monta os status no formato enviado pelos dispositivos.
+
+    :param block: Bloco de simulate_blocks
+    :return: DataFrame com 'table', 'device_id' e 'status'
+    """
+    devices = block['reading_device']
+    # Um único % por linha sobre listas Python é bem mais rápido que concatenar Series de texto
+    scaled = [np.round(block[name] * STATUS_SCALE).astype(np.int64).tolist() for name in ('current', 'power', 'voltage')]
+    status = [_STATUS_TEMPLATE % (switch, t, current, t, power, t, voltage, t)
+              for switch, t, current, power, voltage
+              in zip(block['on'].tolist(), block['reading_ms'].tolist(), *scaled)]
+
+    tables = np.array([DEVICE_PROFILES[name]['table'] for name in block['device_class']])
+    return pd.DataFrame({
+        'table': tables[devices],
+        'device_id': block['device_id'][devices],
+        'status': status,
+    })
+
+
+def monthly_history(n_devices, months=36, start='2021-01-01', seed=0):
+    """
+    Gera o histórico de consumo mensal (kWh) com sazonalidade anual e ruído.
+
+    :param n_devices: Quantidade de dispositivos
+    :param months: Meses de histórico por dispositivo
+    :param start: Primeiro mês ('YYYY-MM-DD')
+    :param seed: Semente do gerador
+    :return: DataFrame em ordem cronológica, no formato do training_pipeline.py
+    """
+    rng = np.random.default_rng(seed)
+    classes = np.array(list(DEVICE_PROFILES))
+    device_classes = classes[rng.integers(0, len(classes), n_devices)]
+    base = rng.uniform(5.0, 60.0, n_devices)
+    phase = rng.uniform(0, 2 * np.pi, n_devices)
+
+    dates = pd.date_range(start, periods=months, freq='MS')
+    angle = 2 * np.pi * dates.month.to_numpy() / 12
+    total = (base[None, :] * (1 + 0.25 * np.sin(angle[:, None] + phase[None, :]))
+             * rng.normal(1.0, 0.05, (months, n_devices)))
+
+    return pd.DataFrame({
+        'device_id': np.tile(np.char.add('dev', np.char.zfill(np.arange(n_devices).astype(str), 6)), months),
+        'device_class': np.tile(device_classes, months),
+        'date': np.repeat(dates.strftime('%Y-%m-%d %H:%M:%S.000'), n_devices),
+        'totalCoust': np.round(total.ravel(), 2),
+    })
+
+
+def _write_ndjson(f, frame):
+    f.write(frame.to_json(orient='records', lines=True))
+    if len(frame):
+        f.write('\n')
+
+
+def _open_status_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    for profile in DEVICE_PROFILES.values():
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {profile['table']} (device_id TEXT, status TEXT)")
+    return conn
+
+
+def generate_load_test_data(output_dir, n_devices=1000, days=30, outputs=OUTPUTS, readings_format='ndjson',
+                            start='2024-01-01', interval_minutes=1, anomaly_rate=0.001, history_months=36,
+                            seed=0, block_readings=DEFAULT_BLOCK_READINGS):
+    """
+    Gera os arquivos de teste de carga em output_dir, simulando cada bloco uma única vez.
+
+    :param output_dir: Pasta de saída
+    :param n_devices: Quantidade de dispositivos
+    :param days: Dias simulados
+    :param outputs: Saídas desejadas, entre 'readings', 'lamp', 'status' e 'history'
+    :param readings_format: 'ndjson' ou 'parquet' para as leituras
+    :param start: Data inicial ('YYYY-MM-DD')
+    :param interval_minutes: Intervalo entre leituras
+    :param anomaly_rate: Fração das leituras com anomalia de voltagem
+    :param history_months: Meses do histórico mensal
+    :param seed: Semente do gerador
+    :param block_readings: Leituras aproximadas por bloco
+    :return: Dicionário saída -> caminho do arquivo gerado
+    """
+    unknown = set(outputs) - set(OUTPUTS)
+    if unknown:
+        raise ValueError(f'Saídas inválidas: {sorted(unknown)}')
+    if readings_format not in ('ndjson', 'parquet'):
+        raise ValueError(f'Formato de leituras inválido: {readings_format}')
+
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {}
+
+    if 'history' in outputs:
+        paths['history'] = os.path.join(output_dir, 'plug_history.ndjson')
+        with open(paths['history'], 'w') as f:
+            _write_ndjson(f, monthly_history(n_devices, history_months, seed=seed))
+
+    if not {'readings', 'lamp', 'status'} & set(outputs):
+        return paths
+
+    readings_file = lamp_file = status_db = parquet_writer = None
+    try:
+        if 'readings' in outputs:
+            paths['readings'] = os.path.join(output_dir, f'readings.{readings_format}')
+            if readings_format == 'ndjson':
+                readings_file = open(paths['readings'], 'w')
+            else:
+                import pyarrow  # Dependência opcional, só para a saída em Parquet
+                import pyarrow.parquet
+        if 'lamp' in outputs:
+            paths['lamp'] = os.path.join(output_dir, 'lamp_payloads.ndjson')
+            lamp_file = open(paths['lamp'], 'w')
+        if 'status' in outputs:
+            paths['status'] = os.path.join(output_dir, 'device_logs.db')
+            status_db = _open_status_db(paths['status'])
+
+        for block in simulate_blocks(n_devices, days, start, interval_minutes, anomaly_rate, seed, block_readings):
+            if 'readings' in outputs:
+                frame = readings_frame(block)
+                if readings_file is not None:
+                    _write_ndjson(readings_file, frame)
+                else:
+                    table = pyarrow.Table.from_pandas(frame, preserve_index=False)
+                    if parquet_writer is None:
+                        parquet_writer = pyarrow.parquet.ParquetWriter(paths['readings'], table.schema)
+                    parquet_writer.write_table(table)
+
+            if lamp_file is not None:
+                for payload in lamp_payloads(block):
+                    lamp_file.write(json.dumps(payload) + '\n')
+
+            if status_db is not None:
+                rows = status_rows(block)
+                with status_db:
+                    for table, group in rows.groupby('table', sort=False):
+                        status_db.executemany(f'INSERT INTO {table} (device_id, status) VALUES (?, ?)',
+                                              zip(group['device_id'], group['status']))
+    finally:
+        for resource in (readings_file, lamp_file, status_db, parquet_writer):
+            if resource is not None:
+                resource.close()
+
+    return paths
+
+
+def main():
+    paths = generate_load_test_data('dados_simulados', n_devices=1000, days=30)
+    for output, path in paths.items():
+        print(f'{output}: {path} ({os.path.getsize(path) / 1e6:.1f} MB)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,468 @@
+"""
+Treinamento do modelo de consumo mensal para toda a frota de dispositivos.
+
+O histórico é lido em blocos, de um arquivo NDJSON (um registro JSON por linha) ou de uma
+tabela SQLite, sem carregar tudo em memória. Cada registro tem 'device_id', 'date',
+'totalCoust' e, opcionalmente, 'device_class'. O alvo é o consumo do mês e as features são
+os consumos dos meses anteriores (lags), a média deles e o mês do ano (sazonalidade).
+
+Os modelos (um por dispositivo, por classe de dispositivo ou um global) são regressores
+SGD treinados com partial_fit, divididos entre processos. O resultado vai para um registro
+versionado: registry/v0001/, registry/v0002/, ... com o arquivo LATEST apontando para a
+versão mais recente.
+"""
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+import zlib
+from contextlib import closing
+from itertools import islice
+from queue import Empty, Full
+
+import numpy as np
+import pandas as pd
+from sklearn import config_context
+from sklearn.linear_model import SGDRegressor
+from sklearn.preprocessing import StandardScaler
+
+# Arquivos e parâmetros padrão do treinamento
+history_path = 'plug_history.ndjson'
+registry_dir = 'model_registry'
+history_table = 'plug_history'
+
+DEFAULT_CHUNK_SIZE = 100000
+DEFAULT_N_LAGS = 3
+GROUP_BY_OPTIONS = ('device', 'class', 'global')
+
+# Intervalo, em segundos, entre as verificações de que os processos de treinamento seguem vivos
+_POLL_SECONDS = 1.0
+
+
+def feature_names(n_lags=DEFAULT_N_LAGS):
+    return [f'lag_{k}' for k in range(1, n_lags + 1)] + ['lag_mean', 'month_sin', 'month_cos']
+
+
+def _iter_ndjson_chunks(path, chunk_size):
+    with open(path, 'r') as f:
+        while True:
+            lines = [line for line in islice(f, chunk_size) if line.strip()]
+            if not lines:
+                break
+            yield pd.DataFrame([json.loads(line) for line in lines])
+
+
+def _iter_sqlite_chunks(path, table, chunk_size):
+    with closing(sqlite3.connect(path)) as conn:
+        columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+        selected = ['device_id', 'date', 'totalCoust'] + (['device_class'] if 'device_class' in columns else [])
+        # Ordem cronológica: o histórico de cada dispositivo chega do mais antigo ao mais novo
+        query = f'SELECT {", ".join(selected)} FROM {table} ORDER BY date'
+        yield from pd.read_sql_query(query, conn, chunksize=chunk_size)
+
+
+def iter_history_chunks(source, chunk_size=DEFAULT_CHUNK_SIZE, table=history_table):
+    """
+    Lê o histórico mensal em blocos.
+
+    Arquivos .db/.sqlite são lidos da tabela informada; os demais como NDJSON. No NDJSON os
+    registros de cada dispositivo devem estar em ordem cronológica (a ordem de exportação);
+    no SQLite a consulta já os ordena.
+
+    :param source: Caminho do arquivo NDJSON ou do banco SQLite
+    :param chunk_size: Quantidade de registros por bloco
+    :param table: Tabela do histórico no SQLite
+    :return: Gerador de DataFrames com device_id, device_class, month (ano * 12 + mês) e totalCoust
+    """
+    if os.path.splitext(source)[1] in ('.db', '.sqlite', '.sqlite3'):
+        chunks = _iter_sqlite_chunks(source, table, chunk_size)
+    else:
+        chunks = _iter_ndjson_chunks(source, chunk_size)
+
+    for chunk in chunks:
+        dates = chunk['date'].astype(str)
+        month = dates.str[:4].astype(np.int32) * 12 + dates.str[5:7].astype(np.int32) - 1
+        yield pd.DataFrame({
+            'device_id': chunk['device_id'].astype(str),
+            'device_class': (chunk['device_class'].fillna('default').astype(str)
+                             if 'device_class' in chunk else 'default'),
+            'month': month.to_numpy(),
+            'totalCoust': chunk['totalCoust'].astype(float).to_numpy(),
+        })
+
+
+class FeatureBuilder:
+    """
+    Monta as features de lag bloco a bloco.
+
+    Guarda, por dispositivo, apenas os últimos n_lags meses vistos, então um lag cujo mês
+    anterior ficou em outro bloco é calculado normalmente. Um lag só é válido se o mês
+    anterior correspondente existir (meses faltando descartam a linha).
+    """
+
+    def __init__(self, n_lags=DEFAULT_N_LAGS):
+        self.n_lags = n_lags
+        self._codes = {}
+        self._tail_month = np.full((0, n_lags), -1, dtype=np.int64)
+        self._tail_value = np.zeros((0, n_lags))
+
+    def _encode(self, device_ids):
+        codes = pd.Series(device_ids).map(self._codes)
+        new = pd.unique(device_ids[codes.isna().to_numpy()])
+        if len(new):
+            start = len(self._codes)
+            self._codes.update(zip(new, range(start, start + len(new))))
+            grow = len(new)
+            self._tail_month = np.vstack([self._tail_month, np.full((grow, self.n_lags), -1, dtype=np.int64)])
+            self._tail_value = np.vstack([self._tail_value, np.zeros((grow, self.n_lags))])
+            codes = pd.Series(device_ids).map(self._codes)
+        return codes.to_numpy(dtype=np.int64)
+
+    def transform(self, chunk):
+        """
+        :param chunk: DataFrame de iter_history_chunks
+        :return: Tupla (índices das linhas usadas no bloco, X, y)
+        """
+        L = self.n_lags
+        codes = self._encode(chunk['device_id'].to_numpy(dtype=object))
+        months = chunk['month'].to_numpy(dtype=np.int64)
+        values = chunk['totalCoust'].to_numpy(dtype=float)
+
+        # Os últimos meses já vistos entram antes das linhas do bloco
+        chunk_codes = np.unique(codes)
+        tail_m = self._tail_month[chunk_codes].ravel()
+        tail_v = self._tail_value[chunk_codes].ravel()
+        tail_c = np.repeat(chunk_codes, L)
+        has_tail = tail_m >= 0
+
+        all_c = np.concatenate([tail_c[has_tail], codes])
+        all_m = np.concatenate([tail_m[has_tail], months])
+        all_v = np.concatenate([tail_v[has_tail], values])
+        row_idx = np.concatenate([np.full(has_tail.sum(), -1), np.arange(len(codes))])
+
+        order = np.lexsort((all_m, all_c))
+        all_c, all_m, all_v, row_idx = all_c[order], all_m[order], all_v[order], row_idx[order]
+
+        n = len(all_c)
+        lags = np.full((n, L), np.nan)
+        for k in range(1, L + 1):
+            prev = np.arange(n) - k
+            ok = prev >= 0
+            ok[ok] &= (all_c[prev[ok]] == all_c[ok]) & (all_m[ok] - all_m[prev[ok]] == k)
+            lags[ok, k - 1] = all_v[prev[ok]]
+
+        # Atualiza o estado com os últimos L meses de cada dispositivo
+        group_end = np.flatnonzero(np.append(all_c[1:] != all_c[:-1], True))
+        group_start = np.concatenate([[0], group_end[:-1] + 1])
+        group_code = all_c[group_end]
+        for j in range(L):
+            pos = group_end - j
+            ok = pos >= group_start
+            self._tail_month[group_code, L - 1 - j] = np.where(ok, all_m[np.maximum(pos, 0)], -1)
+            self._tail_value[group_code, L - 1 - j] = np.where(ok, all_v[np.maximum(pos, 0)], 0.0)
+
+        use = (row_idx >= 0) & ~np.isnan(lags).any(axis=1)
+        lags = lags[use]
+        angle = 2 * np.pi * (all_m[use] % 12) / 12
+        X = np.column_stack([lags, lags.mean(axis=1), np.sin(angle), np.cos(angle)])
+        return row_idx[use], X, all_v[use]
+
+
+class _ShardTrainer:
+    """
+    Modelos de uma parte das chaves; cada chave tem seu StandardScaler e seu SGDRegressor.
+
+    O escalonador é ajustado no primeiro lote da chave (min_batch linhas) e fica fixo: o
+    SGD aprende sempre na mesma escala, e finish converte os coeficientes de volta para a
+    escala original com essa mesma média e desvio.
+    """
+
+    def __init__(self, min_batch, epochs, random_state):
+        self.min_batch = min_batch
+        self.epochs = epochs
+        self.random_state = random_state
+        self.models = {}
+
+    def add(self, keys, X, y):
+        codes, uniques = pd.factorize(keys)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+        for i, key in enumerate(uniques):
+            idx = order[bounds[i]:bounds[i + 1]]
+            state = self.models.get(key)
+            if state is None:
+                state = self.models[key] = {
+                    'scaler': None,
+                    'model': SGDRegressor(random_state=self.random_state),
+                    'X': [], 'y': [], 'buffered': 0,
+                    'rows': 0, 'abs_error': 0.0, 'scored': 0,
+                }
+            state['X'].append(X[idx])
+            state['y'].append(y[idx])
+            state['buffered'] += len(idx)
+            if state['buffered'] >= self.min_batch:
+                self._fit(state)
+
+    def _fit(self, state):
+        X = np.concatenate(state['X'])
+        y = np.concatenate(state['y'])
+        state['X'], state['y'], state['buffered'] = [], [], 0
+
+        if state['scaler'] is None:
+            state['scaler'] = StandardScaler().fit(X)
+        scaler, model = state['scaler'], state['model']
+        # As features já chegam sem NaN (ver FeatureBuilder), então a checagem de valores
+        # finitos do sklearn a cada chamada é dispensada
+        with config_context(assume_finite=True):
+            Xs = scaler.transform(X)
+            if state['rows']:
+                # Erro medido antes de o modelo ver o lote (validação progressiva)
+                state['abs_error'] += np.abs(model.predict(Xs) - y).sum()
+                state['scored'] += len(y)
+
+            # Uma chamada por passada, sem copiar o lote (o SGD o embaralha a cada chamada)
+            for _ in range(self.epochs):
+                model.partial_fit(Xs, y)
+        state['rows'] += len(y)
+
+    def finish(self):
+        """
+        :return: Dicionário chave -> (coeficientes, intercepto, linhas, erro médio absoluto)
+        """
+        result = {}
+        for key, state in self.models.items():
+            if state['buffered']:
+                self._fit(state)
+            scaler, model = state['scaler'], state['model']
+            # Coeficientes na escala original das features: a predição é X @ coef + intercept
+            coef = model.coef_ / scaler.scale_
+            intercept = float(model.intercept_[0] - np.sum(model.coef_ * scaler.mean_ / scaler.scale_))
+            mae = state['abs_error'] / state['scored'] if state['scored'] else float('nan')
+            result[key] = (coef, intercept, state['rows'], mae)
+        return result
+
+
+def _shard_worker(tasks, results, min_batch, epochs, random_state):
+    trainer = _ShardTrainer(min_batch, epochs, random_state)
+    for keys, X, y in iter(tasks.get, None):
+        trainer.add(keys, X, y)
+    results.put(trainer.finish())
+
+
+def _check_workers(workers):
+    for worker in workers:
+        if worker.exitcode not in (None, 0):
+            raise RuntimeError(f'O processo de treinamento {worker.name} terminou com o código {worker.exitcode}')
+
+
+def _put(queue, item, workers):
+    # Uma fila cheia de um processo que morreu bloquearia a leitura para sempre
+    while True:
+        try:
+            queue.put(item, timeout=_POLL_SECONDS)
+            return
+        except Full:
+            _check_workers(workers)
+
+
+def _collect(results, workers):
+    models = {}
+    pending = len(workers)
+    while pending:
+        try:
+            models.update(results.get(timeout=_POLL_SECONDS))
+            pending -= 1
+        except Empty:
+            _check_workers(workers)
+            if all(worker.exitcode is not None for worker in workers):
+                raise RuntimeError('Os processos de treinamento terminaram sem devolver todos os modelos')
+    return models
+
+
+def _shard_of(keys, n_shards):
+    uniques, inverse = np.unique(keys, return_inverse=True)
+    shard = np.array([zlib.crc32(key.encode()) % n_shards for key in uniques], dtype=np.int64)
+    return shard[inverse]
+
+
+def train_fleet(source, registry=registry_dir, group_by='device', n_lags=DEFAULT_N_LAGS,
+                chunk_size=DEFAULT_CHUNK_SIZE, n_jobs=None, min_batch=64, epochs=50,
+                random_state=42, table=history_table):
+    """
+    Treina os modelos de consumo mensal da frota e grava uma nova versão no registro.
+
+    O processo principal lê os blocos e monta as features; as chaves são divididas entre
+    n_jobs processos por hash, e cada processo mantém e treina apenas os seus modelos.
+
+    :param source: Histórico em NDJSON ou SQLite (ver iter_history_chunks)
+    :param registry: Pasta do registro de modelos
+    :param group_by: 'device' (um modelo por dispositivo), 'class' (por device_class) ou 'global'
+    :param n_lags: Quantidade de meses anteriores usados como features
+    :param chunk_size: Registros lidos por bloco
+    :param n_jobs: Processos de treinamento (None usa todos os núcleos, 1 treina no próprio processo)
+    :param min_batch: Linhas acumuladas por modelo antes de cada partial_fit
+    :param epochs: Passadas do partial_fit sobre cada lote
+    :param random_state: Semente dos regressores
+    :param table: Tabela do histórico no SQLite
+    :return: Caminho da versão gravada
+    """
+    if group_by not in GROUP_BY_OPTIONS:
+        raise ValueError(f'group_by inválido: {group_by}')
+
+    started = time.time()
+    n_jobs = n_jobs or os.cpu_count() or 1
+    builder = FeatureBuilder(n_lags)
+
+    workers = []
+    if n_jobs == 1:
+        trainer = _ShardTrainer(min_batch, epochs, random_state)
+    else:
+        context = multiprocessing.get_context()
+        results = context.Queue()
+        # Filas limitadas: a leitura espera se os processos de treinamento ficarem para trás
+        queues = [context.Queue(maxsize=4) for _ in range(n_jobs)]
+        workers = [context.Process(target=_shard_worker, args=(queue, results, min_batch, epochs, random_state))
+                   for queue in queues]
+
+    models = None
+    n_records = n_rows = 0
+    try:
+        for worker in workers:
+            worker.start()
+
+        for chunk in iter_history_chunks(source, chunk_size, table):
+            n_records += len(chunk)
+            rows, X, y = builder.transform(chunk)
+            if not len(rows):
+                continue
+            n_rows += len(rows)
+
+            if group_by == 'device':
+                keys = chunk['device_id'].to_numpy(dtype=object)[rows]
+            elif group_by == 'class':
+                keys = chunk['device_class'].to_numpy(dtype=object)[rows]
+            else:
+                keys = np.full(len(rows), 'global', dtype=object)
+
+            if n_jobs == 1:
+                trainer.add(keys, X, y)
+                continue
+            shards = _shard_of(keys.astype(str), n_jobs)
+            for shard, queue in enumerate(queues):
+                mask = shards == shard
+                if mask.any():
+                    _put(queue, (keys[mask], X[mask], y[mask]), workers)
+
+        if n_jobs == 1:
+            models = trainer.finish()
+        else:
+            for queue in queues:
+                _put(queue, None, workers)
+            models = _collect(results, workers)
+    finally:
+        # Em caso de erro (na leitura ou em um processo) os processos restantes são
+        # encerrados e as filas descartadas, para o programa não travar na saída
+        if workers and models is None:
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+            for queue in queues:
+                queue.cancel_join_thread()
+        for worker in workers:
+            worker.join()
+
+    return save_registry_version(registry, models, {
+        'source': os.path.abspath(source),
+        'group_by': group_by,
+        'n_lags': n_lags,
+        'features': feature_names(n_lags),
+        'records_read': n_records,
+        'training_rows': n_rows,
+        'training_seconds': round(time.time() - started, 3),
+    })
+
+
+def save_registry_version(registry, models, info):
+    """
+    Grava os modelos em uma nova versão do registro e atualiza o LATEST.
+
+    :param registry: Pasta do registro
+    :param models: Dicionário chave -> (coeficientes, intercepto, linhas, erro médio absoluto)
+    :param info: Metadados gravados no manifest.json
+    :return: Caminho da versão gravada
+    """
+    os.makedirs(registry, exist_ok=True)
+    versions = [int(name[1:]) for name in os.listdir(registry) if name.startswith('v') and name[1:].isdigit()]
+    version = f'v{max(versions, default=0) + 1:04d}'
+    path = os.path.join(registry, version)
+    os.makedirs(path)
+
+    keys = sorted(models)
+    n_features = len(info['features'])
+    np.savez(
+        os.path.join(path, 'models.npz'),
+        keys=np.array(keys, dtype=str),
+        coef=np.array([models[key][0] for key in keys]).reshape(len(keys), n_features),
+        intercept=np.array([models[key][1] for key in keys], dtype=float),
+        rows=np.array([models[key][2] for key in keys], dtype=np.int64),
+        mae=np.array([models[key][3] for key in keys], dtype=float),
+    )
+
+    maes = np.array([models[key][3] for key in keys], dtype=float)
+    manifest = dict(info, version=version, created_at=time.strftime('%Y-%m-%d %H:%M:%S'),
+                    n_models=len(keys),
+                    mean_mae=float(np.nanmean(maes)) if np.isfinite(maes).any() else None)
+    with open(os.path.join(path, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=4)
+
+    # O LATEST só muda depois que a versão está completa
+    tmp_path = os.path.join(registry, 'LATEST.tmp')
+    with open(tmp_path, 'w') as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(registry, 'LATEST'))
+    return path
+
+
+class ModelRegistry:
+    """Modelos de uma versão do registro; a predição é um produto escalar com NumPy."""
+
+    def __init__(self, registry=registry_dir, version=None):
+        """
+        :param registry: Pasta do registro
+        :param version: Versão ('v0003'); None usa a indicada em LATEST
+        """
+        if version is None:
+            with open(os.path.join(registry, 'LATEST'), 'r') as f:
+                version = f.read().strip()
+        path = os.path.join(registry, version)
+
+        with open(os.path.join(path, 'manifest.json'), 'r') as f:
+            self.manifest = json.load(f)
+        with np.load(os.path.join(path, 'models.npz')) as data:
+            self.keys = data['keys']
+            self.coef = data['coef']
+            self.intercept = data['intercept']
+        self.version = version
+        self._index = {key: i for i, key in enumerate(self.keys.tolist())}
+
+    def predict(self, key, X):
+        """
+        :param key: device_id, device_class ou 'global', conforme o group_by do treinamento
+        :param X: Features na ordem de manifest['features']
+        :return: Consumo previsto para cada linha de X
+        """
+        i = self._index[str(key)]
+        return np.atleast_2d(np.asarray(X, dtype=float)) @ self.coef[i] + self.intercept[i]
+
+
+def main():
+    path = train_fleet(history_path, registry_dir)
+    with open(os.path.join(path, 'manifest.json'), 'r') as f:
+        manifest = json.load(f)
+    print(f"Versão {manifest['version']}: {manifest['n_models']} modelos, "
+          f"{manifest['training_rows']} linhas em {manifest['training_seconds']}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Ponto de entrada de produção dos serviços de consumo.
+
+Junta as rotas de lâmpada (consumo_flask.py) e de tomada (consumo_flask_plug.py) em um
+único app, servido pelo gunicorn a partir desta pasta:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Os modelos são carregados em create_app(); com preload_app ativo no gunicorn.conf.py,
+isso acontece uma única vez no processo principal e os workers os recebem prontos após o fork.
+"""
+from flask import Flask, jsonify
+
+import consumo_flask
+import consumo_flask_plug
+
+
+def create_app():
+    # Carrega os modelos agora, para que a primeira requisição não pague por isso
+    consumo_flask.model.try_load()
+    consumo_flask_plug.model.try_load()
+
+    app = Flask(__name__)
+    app.register_blueprint(consumo_flask.lamp_routes)
+    app.register_blueprint(consumo_flask_plug.plug_routes)
+
+    @app.route('/health', methods=['GET'])
+    def health():
+        # O processo está de pé e respondendo
+        return jsonify({'status': 'ok'})
+
+    @app.route('/ready', methods=['GET'])
+    def ready():
+        # Pronto para receber tráfego quando os dois modelos estão carregados
+        models = {
+            'lamp': consumo_flask.model.try_load(),
+            'plug': consumo_flask_plug.model.try_load(),
+        }
+        status = 200 if all(models.values()) else 503
+        return jsonify({'status': 'ready' if status == 200 else 'loading', 'models': models}), status
+
+    return app
+
+
+app = create_app()
+
+if __name__ == '__main__':
+    # Apenas para desenvolvimento; em produção use o gunicorn
+    app.run(host='0.0.0.0', port=5001)
@@ -0,0 +1,143 @@
+import io
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+
+# Banco com todos os registros com telefone, sem repetição de número
+arquivo_base = 'dados_filtrados.db'
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS registros (
+    id INTEGER PRIMARY KEY,
+    mobile_normalizado TEXT NOT NULL,
+    dados TEXT NOT NULL,         -- linha original da planilha, em JSON
+    incluido_em TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS registros_mobile ON registros (mobile_normalizado);
+CREATE TABLE IF NOT EXISTS metadados (
+    chave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+
+def normalizar_mobile(mobile):
+    """
+    Deixa só os dígitos do número, para que '+55 (11) 91234-5678', '5511912345678' e o
+    mesmo número lido pelo Excel como 5511912345678.0 sejam iguais.
+
+    :param mobile: Series com a coluna 'Mobile'
+    :return: Series de texto, com None onde não há número
+    """
+    texto = mobile.astype('string').str.replace(r'\.0$', '', regex=True).str.replace(r'\D', '', regex=True)
+    preenchido = (texto.str.len() > 0).fillna(False).astype(bool)
+    return texto.astype(object).where(preenchido, None)
+
+
+class BaseTelefones:
+    """
+    Base de registros com telefone em SQLite, com índice único no número normalizado.
+
+    Incluir um lote custa proporcionalmente ao tamanho do lote, e não ao da base: os
+    números já existentes são descartados pelo próprio índice. A planilha completa passa a
+    ser só uma exportação, gerada quando pedida.
+    """
+
+    def __init__(self, caminho=arquivo_base):
+        self.caminho = caminho
+        with closing(self._conectar()) as conn:
+            conn.executescript(_ESQUEMA)
+
+    def _conectar(self):
+        conn = sqlite3.connect(self.caminho)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def adicionar(self, novos_dados):
+        """
+        Inclui os registros cujo número ainda não está na base.
+
+        :param novos_dados: DataFrame com a coluna 'Mobile' (e as demais colunas da planilha)
+        :return: DataFrame com os registros efetivamente incluídos, nas colunas originais
+        """
+        mobile = normalizar_mobile(novos_dados['Mobile'])
+        validos = novos_dados[mobile.notna()]
+        mobile = mobile[mobile.notna()]
+
+        # Números repetidos dentro do próprio lote: fica a primeira ocorrência
+        primeiro = ~mobile.duplicated()
+        validos, mobile = validos[primeiro], mobile[primeiro]
+        if validos.empty:
+            return validos
+
+        linhas_json = validos.to_json(orient='records', lines=True, date_format='iso').splitlines()
+        agora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        with closing(self._conectar()) as conn, conn:
+            # O lote vai para uma tabela temporária e entra na base em um único INSERT
+            conn.execute('CREATE TEMP TABLE novos (ordem INTEGER, mobile_normalizado TEXT, dados TEXT)')
+            conn.executemany('INSERT INTO novos VALUES (?, ?, ?)',
+                             zip(range(len(mobile)), mobile.tolist(), linhas_json))
+
+            ultimo_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM registros').fetchone()[0]
+            conn.execute(
+                'INSERT OR IGNORE INTO registros (mobile_normalizado, dados, incluido_em) '
+                'SELECT mobile_normalizado, dados, ? FROM novos ORDER BY ordem',
+                (agora,)
+            )
+            incluidos = {linha[0] for linha in conn.execute(
+                'SELECT mobile_normalizado FROM registros WHERE id > ?', (ultimo_id,))}
+            conn.execute('DROP TABLE novos')
+
+        return validos[mobile.isin(incluidos).to_numpy()]
+
+    def total(self):
+        with closing(self._conectar()) as conn:
+            return conn.execute('SELECT COUNT(*) FROM registros').fetchone()[0]
+
+    def carregar(self):
+        """
+        :return: DataFrame com todos os registros, na ordem de inclusão
+        """
+        with closing(self._conectar()) as conn:
+            linhas = [linha[0] for linha in conn.execute('SELECT dados FROM registros ORDER BY id')]
+        if not linhas:
+            return pd.DataFrame()
+        return pd.read_json(io.StringIO('\n'.join(linhas)), lines=True, dtype=False)
+
+    def exportar_excel(self, caminho_arquivo):
+        """
+        Gera a planilha completa (o antigo dados_filtrados.xlsx) a partir da base.
+
+        :param caminho_arquivo: Caminho do .xlsx a ser gerado
+        :return: Quantidade de registros exportados
+        """
+        dados = self.carregar()
+        dados.to_excel(caminho_arquivo, index=False)
+        return len(dados)
+
+    def importar_excel(self, caminho_arquivo):
+        """
+        Importa uma vez a planilha completa gerada pelas versões anteriores do script.
+
+        :param caminho_arquivo: Caminho do dados_filtrados.xlsx existente
+        :return: Quantidade de registros incluídos (0 se já importada ou inexistente)
+        """
+        if not os.path.exists(caminho_arquivo):
+            return 0
+
+        chave = f'importado:{os.path.abspath(caminho_arquivo)}'
+        with closing(self._conectar()) as conn:
+            if conn.execute('SELECT 1 FROM metadados WHERE chave = ?', (chave,)).fetchone():
+                return 0
+
+        dados = pd.read_excel(caminho_arquivo)
+        incluidos = len(self.adicionar(dados)) if 'Mobile' in dados.columns else 0
+
+        with closing(self._conectar()) as conn, conn:
+            conn.execute('INSERT INTO metadados (chave, valor) VALUES (?, ?)',
+                         (chave, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        return incluidos
@@ -0,0 +1,130 @@
+import hashlib
+import importlib.util
+import json
+import os
+
+import pandas as pd
+
+# Arquivo com o registro das planilhas já processadas
+arquivo_manifesto = 'manifesto_planilhas.json'
+
+# Dependência opcional: o calamine (pip install python-calamine) lê xlsx bem mais rápido;
+# sem ele instalado o pandas usa o openpyxl em modo somente leitura, com o mesmo resultado
+MOTOR_EXCEL = 'calamine' if importlib.util.find_spec('python_calamine') else 'openpyxl'
+
+
+def ler_excel(caminho_arquivo, colunas=None):
+    """
+    :param caminho_arquivo: Caminho do arquivo .xlsx
+    :param colunas: Colunas a serem lidas (None lê todas)
+    :return: DataFrame com o conteúdo da primeira aba
+    """
+    return pd.read_excel(caminho_arquivo, engine=MOTOR_EXCEL, usecols=colunas)
+
+
+def hash_arquivo(caminho_arquivo, tamanho_bloco=1 << 20):
+    sha256 = hashlib.sha256()
+    with open(caminho_arquivo, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+            sha256.update(bloco)
+    return sha256.hexdigest()
+
+
+class ManifestoPlanilhas:
+    """
+    Registro das planilhas já processadas (caminho, tamanho, data de modificação, sha256 e
+    quantidade de linhas), para que os arquivos sem alteração não sejam lidos de novo.
+
+    Um arquivo é considerado igual ao registrado quando o tamanho e a data de modificação
+    batem. Se só a data mudou (arquivo copiado ou baixado de novo), o sha256 decide.
+    Também guarda as contagens de registros com telefone de arquivos de saída, como os
+    'dados_filtrados_YYYY-MM-DD.xlsx', com a mesma regra.
+
+    As alterações ficam em memória até salvar(), que deve ser chamado depois que os dados
+    lidos já foram gravados.
+    """
+
+    def __init__(self, caminho=arquivo_manifesto):
+        self.caminho = caminho
+        self.planilhas = {}
+        self.contagens = {}
+
+        if os.path.exists(caminho):
+            with open(caminho, 'r') as f:
+                dados = json.load(f)
+            self.planilhas = dados.get('planilhas', {})
+            self.contagens = dados.get('contagens', {})
+
+    def _registro_atual(self, registro, caminho_arquivo):
+        # Retorna o registro se o arquivo não mudou (atualizando a data, se for o caso)
+        estado = os.stat(caminho_arquivo)
+        if registro is None or registro['tamanho'] != estado.st_size:
+            return None
+        if registro['mtime_ns'] == estado.st_mtime_ns:
+            return registro
+        if registro['sha256'] != hash_arquivo(caminho_arquivo):
+            return None
+
+        registro['mtime_ns'] = estado.st_mtime_ns
+        return registro
+
+    def planilha_processada(self, caminho_arquivo):
+        """
+        :param caminho_arquivo: Caminho da planilha
+        :return: Registro salvo ({'total_linhas', 'tem_mobile', ...}) se o arquivo não mudou, senão None
+        """
+        chave = os.path.abspath(caminho_arquivo)
+        return self._registro_atual(self.planilhas.get(chave), caminho_arquivo)
+
+    def registrar_planilha(self, caminho_arquivo, total_linhas, tem_mobile):
+        estado = os.stat(caminho_arquivo)
+        self.planilhas[os.path.abspath(caminho_arquivo)] = {
+            'tamanho': estado.st_size,
+            'mtime_ns': estado.st_mtime_ns,
+            'sha256': hash_arquivo(caminho_arquivo),
+            'total_linhas': total_linhas,
+            'tem_mobile': tem_mobile,
+        }
+
+    def remover_ausentes(self, caminho_pasta, arquivos):
+        """
+        Esquece as planilhas da pasta que não existem mais, para que o total da base
+        reflita apenas os arquivos atuais.
+
+        :param caminho_pasta: Pasta das planilhas
+        :param arquivos: Caminhos das planilhas encontradas nesta execução
+        """
+        pasta = os.path.abspath(caminho_pasta)
+        atuais = {os.path.abspath(arquivo) for arquivo in arquivos}
+        for chave in list(self.planilhas):
+            if os.path.dirname(chave) == pasta and chave not in atuais:
+                del self.planilhas[chave]
+
+    def contar_com_telefone(self, caminho_arquivo):
+        """
+        Conta os registros com 'Mobile' preenchido, lendo só essa coluna e apenas se o
+        arquivo mudou desde a última contagem.
+
+        :param caminho_arquivo: Caminho do arquivo .xlsx
+        :return: Quantidade de registros com telefone
+        """
+        chave = os.path.abspath(caminho_arquivo)
+        registro = self._registro_atual(self.contagens.get(chave), caminho_arquivo)
+        if registro is not None:
+            return registro['quantidade']
+
+        quantidade = int(ler_excel(caminho_arquivo, colunas=['Mobile'])['Mobile'].notna().sum())
+        estado = os.stat(caminho_arquivo)
+        self.contagens[chave] = {
+            'tamanho': estado.st_size,
+            'mtime_ns': estado.st_mtime_ns,
+            'sha256': hash_arquivo(caminho_arquivo),
+            'quantidade': quantidade,
+        }
+        return quantidade
+
+    def salvar(self):
+        caminho_tmp = self.caminho + '.tmp'
+        with open(caminho_tmp, 'w') as f:
+            json.dump({'planilhas': self.planilhas, 'contagens': self.contagens}, f, indent=4)
+        os.replace(caminho_tmp, self.caminho)
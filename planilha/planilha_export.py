@@ -1,151 +1,250 @@
 import os
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 import matplotlib.pyplot as plt
-from fpdf import FPDF
 import random
 
+from base_telefones import BaseTelefones, arquivo_base
+from manifesto_planilhas import ManifestoPlanilhas, arquivo_manifesto, ler_excel
+
 # Defina o caminho da pasta que contém os arquivos .xlsx
 caminho_pasta = '/Users/novaki/Downloads'
 
-# Nome do arquivo principal que armazenará todos os dados filtrados
+# Planilha completa com todos os dados filtrados; os dados ficam no banco (arquivo_base)
+# e a planilha só é gerada quando exportar_completo estiver ativo
 arquivo_completo = 'dados_filtrados.xlsx'
+exportar_completo = False
+
+# Processos usados para ler as planilhas novas (None usa todos os núcleos)
+workers_leitura = None
+
+
+def ler_planilha(caminho_arquivo):
+    """
+    Lê uma planilha e filtra os registros com 'Mobile' preenchido.
+
+    :param caminho_arquivo: Caminho do arquivo .xlsx
+    :return: Tupla (registros com telefone ou None se não há a coluna 'Mobile', total de linhas)
+    """
+    df = ler_excel(caminho_arquivo)
+
+    # Verifica se a coluna 'Mobile' existe no DataFrame
+    if 'Mobile' not in df.columns:
+        return None, len(df)
+
+    # Filtra os registros onde a coluna 'Mobile' não está vazia
+    return df[df['Mobile'].notna()], len(df)
+
+
+def ler_planilhas(caminho_pasta, manifesto=None, workers=None):
+    """
+    Lê os arquivos .xlsx da pasta e filtra os registros com 'Mobile' preenchido.
+
+    Com um manifesto, as planilhas que não mudaram desde a última execução não são lidas:
+    a quantidade de linhas delas vem do manifesto e os registros já estão nos dados salvos.
+    As demais são lidas em paralelo, e o resultado segue a ordem alfabética dos arquivos.
+    Um arquivo que não pode ser lido é informado e fica de fora (e do manifesto, para ser
+    tentado de novo na próxima execução).
+
+    :param caminho_pasta: Pasta com os arquivos exportados
+    :param manifesto: ManifestoPlanilhas com as planilhas já processadas (opcional)
+    :param workers: Processos de leitura (None usa workers_leitura)
+    :return: Tupla (lista de DataFrames filtrados, total de registros em todos os arquivos)
+    """
+    # Lista para armazenar os novos dados filtrados desta execução
+    novos_dados_filtrados = []
+
+    # Total de registros em todos os arquivos na pasta
+    total_base = 0
+
+    # Percorre todos os arquivos na pasta, sempre na mesma ordem
+    caminhos = [os.path.join(caminho_pasta, arquivo) for arquivo in sorted(os.listdir(caminho_pasta))
+                if arquivo.endswith('.xlsx')]
+    if manifesto is not None:
+        manifesto.remover_ausentes(caminho_pasta, caminhos)
+
+    pendentes = []
+    for caminho_arquivo in caminhos:
+        # Planilha já processada e sem alteração: só o total de linhas é aproveitado
+        registro = manifesto.planilha_processada(caminho_arquivo) if manifesto is not None else None
+        if registro is not None:
+            total_base += registro['total_linhas']
+        else:
+            pendentes.append(caminho_arquivo)
 
-# Carrega os dados existentes do arquivo completo, se ele já existir
-if os.path.exists(arquivo_completo):
-    dados_filtrados = pd.read_excel(arquivo_completo)
-else:
-    dados_filtrados = pd.DataFrame()
+    workers = min(workers or workers_leitura or os.cpu_count() or 1, len(pendentes))
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        resultados = [executor.submit(ler_planilha, caminho_arquivo) for caminho_arquivo in pendentes]
+    else:
+        executor = None
+        resultados = pendentes
 
-# Lista para armazenar os novos dados filtrados desta execução
-novos_dados_filtrados = []
+    try:
+        for caminho_arquivo, resultado in zip(pendentes, resultados):
+            arquivo = os.path.basename(caminho_arquivo)
+            try:
+                df_filtrado, total_linhas = resultado.result() if executor else ler_planilha(resultado)
+            except Exception as e:
+                print(f"Erro ao ler o arquivo {arquivo}: {e}")
+                continue
+
+            # Soma o total de registros em todos os arquivos da pasta
+            total_base += total_linhas
+
+            if df_filtrado is not None:
+                # Adiciona os novos dados filtrados à lista
+                novos_dados_filtrados.append(df_filtrado)
+            else:
+                print(f"A coluna 'Mobile' não foi encontrada no arquivo: {arquivo}")
 
-# Total de registros em todos os arquivos na pasta
-total_base = 0
+            if manifesto is not None:
+                manifesto.registrar_planilha(caminho_arquivo, total_linhas, df_filtrado is not None)
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
-# Percorre todos os arquivos na pasta
-for arquivo in os.listdir(caminho_pasta):
-    # Verifica se o arquivo tem a extensão .xlsx
-    if arquivo.endswith('.xlsx'):
-        # Lê o arquivo Excel
-        caminho_arquivo = os.path.join(caminho_pasta, arquivo)
-        df = pd.read_excel(caminho_arquivo)
+    return novos_dados_filtrados, total_base
 
-        # Soma o total de registros em todos os arquivos da pasta
-        total_base += len(df)
 
-        # Verifica se a coluna 'Mobile' existe no DataFrame
-        if 'Mobile' in df.columns:
-            # Filtra os registros onde a coluna 'Mobile' não está vazia
-            df_filtrado = df[df['Mobile'].notna()]
+def ler_historico_diario(manifesto=None):
+    """
+    :param manifesto: ManifestoPlanilhas com as contagens já feitas (opcional)
+    :return: Tupla (datas, quantidade de registros com telefone) dos arquivos diários
+    """
+    historico_datas = []
+    historico_quantidades = []
 
-            # Adiciona os novos dados filtrados à lista
-            novos_dados_filtrados.append(df_filtrado)
-        else:
-            print(f"A coluna 'Mobile' não foi encontrada no arquivo: {arquivo}")
+    # Percorre os arquivos 'dados_filtrados_YYYY-MM-DD.xlsx' para extrair a quantidade de novos registros diários
+    for arquivo in sorted(os.listdir()):
+        if arquivo.startswith('dados_filtrados_') and arquivo.endswith('.xlsx'):
+            data_str = arquivo.replace('dados_filtrados_', '').replace('.xlsx', '')
+            if manifesto is not None:
+                qtd_diario = manifesto.contar_com_telefone(arquivo)
+            else:
+                df_diario = ler_excel(arquivo, colunas=['Mobile'])
+                qtd_diario = len(df_diario[df_diario['Mobile'].notna()])
+            historico_datas.append(data_str)
+            historico_quantidades.append(qtd_diario)
 
-# Combina todos os novos dados filtrados em um único DataFrame
-if novos_dados_filtrados:
-    novos_dados = pd.concat(novos_dados_filtrados, ignore_index=True)
+    return historico_datas, historico_quantidades
 
-    # Remove duplicatas com base na coluna 'Mobile', comparando com os dados antigos
-    if 'Mobile' in dados_filtrados.columns:
-        novos_dados_unicos = novos_dados[~novos_dados['Mobile'].isin(dados_filtrados['Mobile'])]
-    else:
-        novos_dados_unicos = novos_dados
 
-    # Atualiza o arquivo completo com os novos dados únicos (sem duplicatas)
-    dados_filtrados_atualizado = pd.concat([dados_filtrados, novos_dados_unicos], ignore_index=True)
+def gerar_grafico(historico_datas, historico_quantidades, grafico_path='grafico_evolucao.png'):
+    # Criar gráfico da evolução dos registros diários (barras finas com cor azul fixa)
+    plt.figure(figsize=(10, 6))
+
+    # Cor fixa azul para as barras
+    cor_barra = '#1f77b4'  # Cor azul
+
+    # Gráfico de barras finas com espaçamento adequado
+    largura_barra = 0.4  # Reduzindo a largura das barras
+    bar_positions = range(len(historico_datas))  # Posições das barras
+    espacamento_barra = 0.2  # Adicionando espaçamento entre as barras
+
+    plt.bar([p + espacamento_barra for p in bar_positions], historico_quantidades, width=largura_barra, color=cor_barra, label='Quantidade por dia')
+
+    # Adicionar a linha de evolução (vermelha)
+    plt.plot(bar_positions, historico_quantidades, marker='o', color='red', linestyle='-', label='Evolução (linha)')
+
+    # Adicionar os valores em cada pico
+    for i, valor in enumerate(historico_quantidades):
+        plt.text(i, valor + 0.5, str(valor), ha='center', va='bottom')
+
+    # Ajustar eixos e layout
+    plt.title('Evolução Diária de Registros com Telefone')
+    plt.xlabel('Data')
+    plt.ylabel('Quantidade de Registros')
+    plt.xticks(bar_positions, historico_datas, rotation=45)
+    plt.legend()
+
+    # Ajuste de layout
+    plt.tight_layout()
+
+    # Salvar gráfico como imagem
+    plt.savefig(grafico_path)
+    plt.close()
+
+    return grafico_path
+
+
+def gerar_relatorio_pdf(total_base, total_com_telefone, grafico_path, arquivo_pdf):
+    # Importado aqui para que as funções de leitura possam ser usadas sem o fpdf instalado
+    from fpdf import FPDF
+
+    # Gerar PDF com as informações
+    pdf = FPDF()
+    pdf.add_page()
+
+    # Título
+    pdf.set_font('Arial', 'B', 16)
+    pdf.cell(200, 10, 'Relatório de Registros com Telefone', ln=True, align='C')
 
-    # Salva o arquivo completo com todos os dados desde o início
-    dados_filtrados_atualizado.to_excel(arquivo_completo, index=False)
+    # Texto de total da base
+    pdf.set_font('Arial', '', 12)
+    pdf.ln(10)
+    pdf.cell(200, 10, f'Total de registros na base (todos os usúarios): {total_base}', ln=True)
+    pdf.cell(200, 10, f'Total de registros com telefone: {total_com_telefone}', ln=True)
+
+    # Adicionar gráfico ao PDF
+    pdf.ln(10)
+    pdf.image(grafico_path, x=10, y=pdf.get_y(), w=pdf.w - 20)
+
+    # Salvar o PDF
+    pdf.output(arquivo_pdf)
+
+
+def main():
+    base = BaseTelefones(arquivo_base)
+
+    # Na primeira execução, os dados da planilha completa antiga passam para o banco
+    importados = base.importar_excel(arquivo_completo)
+    if importados:
+        print(f"{importados} registros importados de '{arquivo_completo}'.")
+
+    manifesto = ManifestoPlanilhas(arquivo_manifesto)
+    novos_dados_filtrados, total_base = ler_planilhas(caminho_pasta, manifesto)
 
-    # Salva um novo arquivo apenas com os novos dados únicos desta execução
     data_atual = datetime.now().strftime('%Y-%m-%d')
-    arquivo_novos_dados = f'dados_filtrados_{data_atual}.xlsx'
 
-    # Verifica se há novos dados antes de salvar
-    if not novos_dados_unicos.empty:
-        novos_dados_unicos.to_excel(arquivo_novos_dados, index=False)
-        print(f"Arquivo '{arquivo_novos_dados}' criado com os novos registros desta execução.")
+    if novos_dados_filtrados:
+        # Só os números que ainda não estão na base são incluídos
+        novos_dados_unicos = base.adicionar(pd.concat(novos_dados_filtrados, ignore_index=True))
+
+        # Salva um novo arquivo apenas com os novos dados únicos desta execução
+        arquivo_novos_dados = f'dados_filtrados_{data_atual}.xlsx'
+
+        # Verifica se há novos dados antes de salvar
+        if not novos_dados_unicos.empty:
+            novos_dados_unicos.to_excel(arquivo_novos_dados, index=False)
+            print(f"Arquivo '{arquivo_novos_dados}' criado com os novos registros desta execução.")
+        else:
+            print("Nenhum novo dado foi encontrado. Nenhum arquivo de novos registros foi criado.")
+
+        print(f"'{arquivo_base}' foi atualizado com {len(novos_dados_unicos)} novos registros.")
     else:
-        print("Nenhum novo dado foi encontrado. Nenhum arquivo de novos registros foi criado.")
-
-    print(f"'dados_filtrados.xlsx' foi atualizado com todos os dados desde o início.")
-else:
-    print("Nenhum dado válido foi encontrado nos arquivos .xlsx.")
-
-# Total com telefone (total em dados_filtrados.xlsx)
-total_com_telefone = len(dados_filtrados_atualizado[dados_filtrados_atualizado['Mobile'].notna()])
-
-# Criar gráfico de evolução
-historico_datas = []
-historico_quantidades = []
-
-# Percorre os arquivos 'dados_filtrados_YYYY-MM-DD.xlsx' para extrair a quantidade de novos registros diários
-for arquivo in os.listdir():
-    if arquivo.startswith('dados_filtrados_') and arquivo.endswith('.xlsx'):
-        data_str = arquivo.replace('dados_filtrados_', '').replace('.xlsx', '')
-        df_diario = pd.read_excel(arquivo)
-        qtd_diario = len(df_diario[df_diario['Mobile'].notna()])
-        historico_datas.append(data_str)
-        historico_quantidades.append(qtd_diario)
-
-# Criar gráfico da evolução dos registros diários (barras finas com cor azul fixa)
-plt.figure(figsize=(10, 6))
-
-# Cor fixa azul para as barras
-cor_barra = '#1f77b4'  # Cor azul
-
-# Gráfico de barras finas com espaçamento adequado
-largura_barra = 0.4  # Reduzindo a largura das barras
-bar_positions = range(len(historico_datas))  # Posições das barras
-espacamento_barra = 0.2  # Adicionando espaçamento entre as barras
-
-plt.bar([p + espacamento_barra for p in bar_positions], historico_quantidades, width=largura_barra, color=cor_barra, label='Quantidade por dia')
-
-# Adicionar a linha de evolução (vermelha)
-plt.plot(bar_positions, historico_quantidades, marker='o', color='red', linestyle='-', label='Evolução (linha)')
-
-# Adicionar os valores em cada pico
-for i, valor in enumerate(historico_quantidades):
-    plt.text(i, valor + 0.5, str(valor), ha='center', va='bottom')
-
-# Ajustar eixos e layout
-plt.title('Evolução Diária de Registros com Telefone')
-plt.xlabel('Data')
-plt.ylabel('Quantidade de Registros')
-plt.xticks(bar_positions, historico_datas, rotation=45)
-plt.legend()
-
-# Ajuste de layout
-plt.tight_layout()
-
-# Salvar gráfico como imagem
-grafico_path = 'grafico_evolucao.png'
-plt.savefig(grafico_path)
-plt.close()
-
-# Gerar PDF com as informações
-pdf = FPDF()
-pdf.add_page()
-
-# Título
-pdf.set_font('Arial', 'B', 16)
-pdf.cell(200, 10, 'Relatório de Registros com Telefone', ln=True, align='C')
-
-# Texto de total da base
-pdf.set_font('Arial', '', 12)
-pdf.ln(10)
-pdf.cell(200, 10, f'Total de registros na base (todos os usúarios): {total_base}', ln=True)
-pdf.cell(200, 10, f'Total de registros com telefone: {total_com_telefone}', ln=True)
-
-# Adicionar gráfico ao PDF
-pdf.ln(10)
-pdf.image(grafico_path, x=10, y=pdf.get_y(), w=pdf.w - 20)
-
-# Salvar o PDF
-arquivo_pdf = f'relatorio_{data_atual}.pdf'
-pdf.output(arquivo_pdf)
-
-print(f"Relatório PDF '{arquivo_pdf}' criado com sucesso.")
+        print("Nenhuma planilha nova ou alterada com a coluna 'Mobile' foi encontrada.")
+
+    if exportar_completo:
+        base.exportar_excel(arquivo_completo)
+        print(f"'{arquivo_completo}' foi gerado com todos os dados desde o início.")
+
+    # Total com telefone (todos os registros da base)
+    total_com_telefone = base.total()
+
+    # Criar gráfico de evolução
+    historico_datas, historico_quantidades = ler_historico_diario(manifesto)
+    grafico_path = gerar_grafico(historico_datas, historico_quantidades)
+
+    # O manifesto só é gravado depois que os dados lidos foram salvos
+    manifesto.salvar()
+
+    arquivo_pdf = f'relatorio_{data_atual}.pdf'
+    gerar_relatorio_pdf(total_base, total_com_telefone, grafico_path, arquivo_pdf)
+
+    print(f"Relatório PDF '{arquivo_pdf}' criado com sucesso.")
+
+
+if __name__ == '__main__':
+    main()
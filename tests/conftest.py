@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Os módulos usam imports planos a partir da própria pasta, como nos benchmarks
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for name in ('consumo', 'anomalia', 'planilha'):
+    path = os.path.join(ROOT_DIR, name)
+    if path not in sys.path:
+        sys.path.insert(0, path)
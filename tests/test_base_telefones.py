@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+
+from base_telefones import BaseTelefones, normalizar_mobile
+
+
+@pytest.fixture
+def base(tmp_path):
+    return BaseTelefones(str(tmp_path / 'base.db'))
+
+
+def test_normalizar_mobile_deixa_so_os_digitos():
+    mobile = pd.Series(['+55 (11) 91234-5678', '5511912345678', 5511912345678.0, None, '', '---'])
+    assert normalizar_mobile(mobile).tolist() == ['5511912345678'] * 3 + [None] * 3
+
+
+def test_normalizar_mobile_mantem_o_indice():
+    mobile = pd.Series(['11 9999-0000', None], index=[10, 20])
+    assert normalizar_mobile(mobile).index.tolist() == [10, 20]
+
+
+def test_adicionar_ignora_numeros_repetidos(base):
+    primeiro = pd.DataFrame({'Nome': ['Ana', 'Bia', 'Caio', 'Duda'],
+                             'Mobile': ['+55 11 91111-1111', '5511911111111', None, '11 92222-2222']})
+    incluidos = base.adicionar(primeiro)
+
+    # Repetido no próprio lote: fica a primeira ocorrência; sem número: fica de fora
+    assert incluidos['Nome'].tolist() == ['Ana', 'Duda']
+    assert base.total() == 2
+
+    segundo = pd.DataFrame({'Nome': ['Eva', 'Fabio'], 'Mobile': ['11 92222-2222', '11 93333-3333']})
+    assert base.adicionar(segundo)['Nome'].tolist() == ['Fabio']
+    assert base.total() == 3
+
+
+def test_carregar_na_ordem_de_inclusao(base):
+    base.adicionar(pd.DataFrame({'Nome': ['Ana'], 'Mobile': ['111']}))
+    base.adicionar(pd.DataFrame({'Nome': ['Bia', 'Caio'], 'Mobile': ['222', '333']}))
+
+    dados = base.carregar()
+    assert dados['Nome'].tolist() == ['Ana', 'Bia', 'Caio']
+    assert dados['Mobile'].astype(str).tolist() == ['111', '222', '333']
+
+
+def test_base_vazia(base):
+    assert base.total() == 0
+    assert base.carregar().empty
+    assert base.adicionar(pd.DataFrame({'Nome': ['Ana'], 'Mobile': [None]})).empty
+
+
+def test_importar_excel_uma_vez(base, tmp_path):
+    caminho = str(tmp_path / 'dados_filtrados.xlsx')
+    pd.DataFrame({'Nome': ['Ana', 'Bia'], 'Mobile': ['111', '222']}).to_excel(caminho, index=False)
+
+    assert base.importar_excel(caminho) == 2
+    assert base.importar_excel(caminho) == 0
+    assert base.importar_excel(str(tmp_path / 'inexistente.xlsx')) == 0
+    assert base.total() == 2
@@ -0,0 +1,64 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip('quart')
+
+from consumo_async import CpuOffloader, Overloaded
+
+
+def test_identical_requests_share_one_call():
+    offloader = CpuOffloader(max_workers=2)
+    release = threading.Event()
+    calls = []
+
+    def work(value):
+        calls.append(value)
+        release.wait(5)
+        return value * 2
+
+    async def scenario():
+        first = asyncio.ensure_future(offloader.coalesce('key', work, 21))
+        await asyncio.sleep(0.05)
+        second = asyncio.ensure_future(offloader.coalesce('key', work, 21))
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(first, second)
+
+    assert asyncio.run(scenario()) == [42, 42]
+    assert calls == [21]
+    assert offloader.stats() == {'queue_depth': 0, 'in_flight': 0, 'coalesced': 1, 'rejected': 0}
+
+
+def test_full_queue_is_rejected():
+    offloader = CpuOffloader(max_workers=1, max_queue_depth=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(offloader.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+        with pytest.raises(Overloaded):
+            await offloader.run(lambda: None)
+        release.set()
+        await running
+
+    asyncio.run(scenario())
+    assert offloader.rejected == 1
+    assert offloader.depth == 0
+
+
+def test_failed_call_is_not_kept_in_flight():
+    offloader = CpuOffloader(max_workers=1)
+
+    def fail():
+        raise RuntimeError('erro')
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await offloader.coalesce('key', fail)
+        await asyncio.sleep(0)
+        return await offloader.coalesce('key', lambda: 'ok')
+
+    assert asyncio.run(scenario()) == 'ok'
+    assert offloader.stats()['in_flight'] == 0
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from device_model_store import (DeviceModelStore, data_fingerprint, load_artifact, reusable_rows, row_keys,
+                                save_artifact)
+from log_reader import LOG_TABLES
+
+DAY = 86400
+
+
+def test_row_keys_accepts_table_names_or_positions():
+    names = pd.DataFrame({'source': ['CafeteiraLog', 'DeviceLog', 'GeladeiraLog'], 'rowid': [5, 1, 2 ** 40]})
+    positions = names.assign(source=[LOG_TABLES.index(name) for name in names['source']])
+
+    keys = row_keys(names)
+    np.testing.assert_array_equal(keys, row_keys(positions))
+    assert keys.tolist() == [5, (2 << 48) | 1, (1 << 48) | 2 ** 40]
+
+
+def test_data_fingerprint_ignores_the_reading_order():
+    keys = np.array([3, 1, 2])
+    voltage = np.array([220.0, 221.0, 222.0])
+    shuffled = data_fingerprint(keys[::-1], voltage[::-1])
+
+    assert data_fingerprint(keys, voltage) == shuffled
+    assert shuffled['rows'] == 3 and shuffled['last_key'] == 3
+    assert data_fingerprint(np.empty(0, dtype=np.int64), np.empty(0))['last_key'] == -1
+
+
+def _entry(keys, voltage, fitted_at=0.0):
+    return {'fitted_at': fitted_at, 'fingerprint': data_fingerprint(keys, voltage)}
+
+
+@pytest.fixture
+def trained():
+    keys = np.arange(1, 101)
+    return keys, np.linspace(210, 230, 100)
+
+
+def test_reusable_rows_marks_the_new_readings(trained):
+    keys, voltage = trained
+    current_keys = np.concatenate([keys, [150, 151]])
+    current_voltage = np.concatenate([voltage, [219.0, 400.0]])
+
+    seen = reusable_rows(_entry(keys, voltage), current_keys, current_voltage, now=DAY)
+    assert seen.tolist() == [True] * 100 + [False, False]
+
+
+def test_reusable_rows_without_entry_or_when_expired(trained):
+    keys, voltage = trained
+    assert reusable_rows(None, keys, voltage) is None
+    assert reusable_rows(_entry(keys, voltage), keys, voltage, now=8 * DAY) is None
+    assert reusable_rows(_entry(keys, voltage), keys, voltage, now=8 * DAY, max_age_days=10) is not None
+
+
+def test_reusable_rows_when_trained_readings_changed(trained):
+    keys, voltage = trained
+    entry = _entry(keys, voltage)
+
+    # Valor alterado, leitura removida ou leitura antiga que só apareceu agora
+    changed = voltage.copy()
+    changed[10] += 1
+    assert reusable_rows(entry, keys, changed, now=DAY) is None
+    assert reusable_rows(entry, keys[1:], voltage[1:], now=DAY) is None
+    assert reusable_rows(entry, np.append(keys, 0), np.append(voltage, 220.0), now=DAY) is None
+
+
+def test_reusable_rows_with_too_many_new_readings(trained):
+    keys, voltage = trained
+    entry = _entry(keys, voltage)
+
+    new_keys = np.arange(101, 152)
+    assert reusable_rows(entry, np.concatenate([keys, new_keys[:50]]),
+                         np.concatenate([voltage, np.full(50, 220.0)]), now=DAY) is not None
+    assert reusable_rows(entry, np.concatenate([keys, new_keys]),
+                         np.concatenate([voltage, np.full(51, 220.0)]), now=DAY) is None
+
+
+def test_store_round_trip(tmp_path):
+    store = DeviceModelStore(str(tmp_path))
+    store.update(42, {'mean': 220.0})
+    store.save()
+    save_artifact(str(tmp_path), 42, {'model': [1, 2, 3]})
+
+    reopened = DeviceModelStore(str(tmp_path))
+    assert reopened.entry(42) == {'mean': 220.0}
+    assert reopened.entry('42') == {'mean': 220.0}
+    assert reopened.entry(7) is None
+    assert load_artifact(str(tmp_path), 42) == {'model': [1, 2, 3]}
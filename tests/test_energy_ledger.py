@@ -0,0 +1,94 @@
+import sqlite3
+
+import pytest
+
+import consumo_flask
+from energy_ledger import EnergyLedger
+
+
+def _log(time_str, value):
+    return {'timeStr': time_str, 'value': value}
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return EnergyLedger(str(tmp_path / 'ledger.db'))
+
+
+def test_cursor_skips_already_processed_logs(ledger):
+    first = [_log('2024-01-01 10:00:00', 'true'), _log('2024-01-01 11:00:00', 'false')]
+    result = ledger.record('d', first, 1.0)
+    assert (result['processed'], result['cursor'], result['total']) == (2, '2024-01-01 11:00:00', 1.0)
+
+    # Reenviar o mesmo histórico não conta nada de novo
+    result = ledger.record('d', first, 1.0)
+    assert (result['processed'], result['total']) == (0, 1.0)
+
+
+def test_interval_open_across_calls(ledger):
+    ledger.record('d', [_log('2024-01-01 10:00:00', 'true')], 2.0)
+    result = ledger.record('d', [_log('2024-01-01 13:00:00', 'false')], 2.0)
+
+    assert result['total'] == pytest.approx(6.0)
+    assert result['daily'] == pytest.approx({'2024-01-01': 6.0})
+
+
+def test_second_log_in_the_cursor_second_is_not_lost(ledger):
+    ledger.record('d', [_log('2024-01-01 10:00:00', 'true'), _log('2024-01-01 10:00:05', 'false')], 3600.0)
+
+    # O aplicativo envia a partir do cursor (inclusive): o "false" já contado é ignorado e
+    # o "true" do mesmo segundo, que chegou depois, é processado
+    result = ledger.record('d', [_log('2024-01-01 10:00:05', 'false'), _log('2024-01-01 10:00:05', 'true')],
+                           3600.0)
+    assert result['processed'] == 1
+
+    result = ledger.record('d', [_log('2024-01-01 10:00:05', 'false'), _log('2024-01-01 10:00:05', 'true'),
+                                 _log('2024-01-01 10:00:15', 'false')], 3600.0)
+    assert result['processed'] == 1
+    assert result['total'] == pytest.approx(5.0 + 10.0)
+
+
+def test_logs_before_the_cursor_are_ignored(ledger):
+    ledger.record('d', [_log('2024-01-01 10:00:00', 'true'), _log('2024-01-01 11:00:00', 'false')], 1.0)
+    result = ledger.record('d', [_log('2024-01-01 09:00:00', 'true'), _log('2024-01-01 09:30:00', 'false')], 1.0)
+    assert (result['processed'], result['total']) == (0, 1.0)
+
+
+def test_record_returns_the_same_summary(ledger):
+    result = ledger.record('d', [_log('2024-01-01 10:00:00', 'true'), _log('2024-01-02 10:00:00', 'false')], 1.0)
+    summary = ledger.summary('d')
+
+    assert {key: result[key] for key in summary} == summary
+    assert summary['weekly'] == {'2024-W01': 24.0}
+    assert summary['monthly'] == {'2024-01': 24.0}
+
+
+def test_devices_are_independent(ledger):
+    ledger.record('a', [_log('2024-01-01 10:00:00', 'true'), _log('2024-01-01 11:00:00', 'false')], 1.0)
+    assert ledger.summary('b') == {'cursor': None, 'total': 0.0, 'daily': {}, 'weekly': {}, 'monthly': {}}
+
+
+def test_invalid_log_rolls_back(ledger):
+    with pytest.raises(ValueError):
+        ledger.record('d', [_log('2024-01-01 10:00:00', 'true'), {'value': 'false'}], 1.0)
+    assert ledger.summary('d')['cursor'] is None
+
+
+def test_old_database_keeps_its_cursor_second(tmp_path):
+    path = str(tmp_path / 'old.db')
+    with sqlite3.connect(path) as conn:
+        conn.execute('CREATE TABLE ledger_state (device_id TEXT PRIMARY KEY, cursor TEXT, open_since TEXT, '
+                     'total_energy REAL NOT NULL DEFAULT 0)')
+        conn.execute("INSERT INTO ledger_state VALUES ('d', '2024-01-01 10:00:00', '2024-01-01 10:00:00', 0)")
+
+    ledger = EnergyLedger(path)
+    # Na versão anterior todos os logs do segundo do cursor já tinham sido contados
+    result = ledger.record('d', [_log('2024-01-01 10:00:00', 'true'), _log('2024-01-01 12:00:00', 'false')], 1.0)
+    assert (result['processed'], result['total']) == (1, 2.0)
+
+
+def test_get_ledger_creates_one_instance(tmp_path, monkeypatch):
+    monkeypatch.setattr(consumo_flask, 'DEFAULT_LEDGER_PATH', str(tmp_path / 'flask.db'))
+    monkeypatch.setattr(consumo_flask, 'ledger', None)
+    assert consumo_flask.get_ledger() is consumo_flask.get_ledger()
+    assert consumo_flask.get_ledger().path == str(tmp_path / 'flask.db')
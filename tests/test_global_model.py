@@ -0,0 +1,110 @@
+import sqlite3
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import anomalia_ia
+from anomalia_ia import fit_global_model, reservoir_sample, score_chunks
+from log_reader import LOG_TABLES
+
+
+def _chunks(values, sizes):
+    start = 0
+    for size in sizes:
+        yield values[start:start + size]
+        start += size
+
+
+def test_reservoir_sample_has_fixed_size_and_distinct_values():
+    values = np.arange(1000, dtype=float)
+    sample = reservoir_sample(_chunks(values, [3, 500, 1, 496]), 100, random_state=7)
+
+    assert len(sample) == 100
+    assert len(np.unique(sample)) == 100
+    assert np.isin(sample, values).all()
+
+
+def test_reservoir_sample_is_deterministic():
+    values = np.arange(1000, dtype=float)
+    first = reservoir_sample(_chunks(values, [1000]), 50, random_state=1)
+    again = reservoir_sample(_chunks(values, [1000]), 50, random_state=1)
+    np.testing.assert_array_equal(first, again)
+
+
+def test_reservoir_sample_keeps_everything_when_input_is_short():
+    sample = reservoir_sample(_chunks(np.arange(30, dtype=float), [10, 0, 20]), 100)
+    np.testing.assert_array_equal(sample, np.arange(30, dtype=float))
+
+    assert len(reservoir_sample(iter([]), 100)) == 0
+
+
+def test_reservoir_sample_is_uniform():
+    # Cada valor deve entrar na amostra com probabilidade sample_size / total
+    trials, total, size = 2000, 100, 10
+    counts = np.zeros(total)
+    values = np.arange(total, dtype=float)
+    for seed in range(trials):
+        sample = reservoir_sample(_chunks(values, [7, 13, 40, 40]), size, random_state=seed)
+        counts[sample.astype(int)] += 1
+
+    expected = trials * size / total
+    std = np.sqrt(trials * size / total * (1 - size / total))
+    assert np.abs(counts - expected).max() < 5 * std
+
+
+def _logs(voltage):
+    return pd.DataFrame({
+        'source': 'DeviceLog',
+        'rowid': np.arange(len(voltage)),
+        'device_id': 'dev',
+        'voltage': voltage,
+        'timestamp': np.arange(len(voltage)) * 1000.0,
+    })
+
+
+def test_fit_global_model_threshold_marks_the_contamination_fraction():
+    sample = np.random.default_rng(0).normal(220, 3, 5000)
+    global_model = fit_global_model(sample, contamination=0.02, random_state=0)
+
+    scores = global_model['model'].score_samples(global_model['scaler'].transform(sample.reshape(-1, 1)))
+    assert (scores < global_model['threshold']).mean() == pytest.approx(0.02, abs=0.005)
+
+
+def test_score_chunks_keeps_anomalies_and_writes_every_score(tmp_path):
+    voltage = np.random.default_rng(1).normal(220, 3, 3000)
+    voltage[[10, 2500]] = [400.0, 20.0]
+    global_model = fit_global_model(voltage, contamination=0.01, random_state=0)
+    logs = _logs(voltage)
+    scores_path = tmp_path / 'escores.csv'
+
+    anomalies = score_chunks(global_model, (logs.iloc[i:i + 1000] for i in range(0, 3000, 1000)),
+                             n_jobs=1, scores_path=str(scores_path))
+
+    assert {10, 2500} <= set(anomalies['rowid'])
+    assert (anomalies['score'] < global_model['threshold']).all()
+
+    written = pd.read_csv(scores_path)
+    assert written['rowid'].tolist() == list(range(3000))
+    np.testing.assert_allclose(written.loc[anomalies['rowid'], 'score'], anomalies['score'])
+
+
+def test_score_chunks_without_chunks_returns_empty_frame():
+    global_model = fit_global_model(np.linspace(200, 240, 100))
+    anomalies = score_chunks(global_model, iter([]), n_jobs=1)
+    assert anomalies.empty
+    assert 'score' in anomalies.columns
+
+
+def test_main_stops_when_there_is_no_reading(tmp_path, monkeypatch, capsys):
+    db_path = tmp_path / 'logs.db'
+    with closing(sqlite3.connect(db_path)) as conn:
+        for table in LOG_TABLES:
+            conn.execute(f'CREATE TABLE {table} (device_id TEXT, status TEXT)')
+
+    monkeypatch.setattr(anomalia_ia, 'db_path', str(db_path))
+    monkeypatch.setattr(anomalia_ia, 'cache_dir', str(tmp_path / 'cache'))
+    anomalia_ia.main()
+
+    assert 'não há dados para treinar o modelo' in capsys.readouterr().out
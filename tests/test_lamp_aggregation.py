@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from lamp_aggregation import aggregate_usage, pair_usage_intervals, parse_log_times, total_usage_hours
+
+
+def _log(time_str, value):
+    return {'timeStr': time_str, 'value': value}
+
+
+def test_parse_log_times_sorts_stably():
+    times, values = parse_log_times([
+        _log('2024-01-01 12:00:00', 'false'),
+        _log('2024-01-01 10:00:00', 'true'),
+        _log('2024-01-01 12:00:00', 'true'),
+    ])
+    assert times.dtype == np.dtype('datetime64[s]')
+    assert values.tolist() == ['true', 'false', 'true']
+
+
+def test_parse_log_times_rejects_missing_time():
+    with pytest.raises(ValueError):
+        parse_log_times([_log('2024-01-01 10:00:00', 'true'), {'value': 'false'}])
+
+
+def test_false_logs_pair_with_the_last_true():
+    times, values = parse_log_times([
+        _log('2024-01-01 09:00:00', 'false'),  # Sem "true" anterior: ignorado
+        _log('2024-01-01 10:00:00', 'true'),
+        _log('2024-01-01 11:00:00', 'false'),
+        _log('2024-01-01 11:30:00', 'false'),  # Ainda medido a partir das 10:00
+    ])
+    _, hours = pair_usage_intervals(times, values)
+    assert hours.tolist() == [1.0, 1.5]
+
+
+def test_total_usage_hours():
+    assert total_usage_hours([]) == 0.0
+    assert total_usage_hours([_log('2024-01-01 10:00:00', 'true'),
+                              _log('2024-01-01 10:45:00', 'false')]) == pytest.approx(0.75)
+
+
+def test_buckets_by_day_iso_week_and_month():
+    logs = [
+        # O consumo vai para o dia do "false": 31/12/2024 já é a semana 1 de 2025
+        _log('2024-12-30 22:00:00', 'true'), _log('2024-12-31 01:00:00', 'false'),
+        _log('2025-01-01 10:00:00', 'true'), _log('2025-01-01 12:00:00', 'false'),
+        _log('2024-12-28 10:00:00', 'true'), _log('2024-12-28 11:00:00', 'false'),
+    ]
+    usage = aggregate_usage(logs, energy_per_hour=0.1)
+
+    assert usage['total'] == pytest.approx(0.6)
+    assert usage['daily'] == pytest.approx({'2024-12-28': 0.1, '2024-12-31': 0.3, '2025-01-01': 0.2})
+    assert usage['weekly'] == pytest.approx({'2024-W52': 0.1, '2025-W01': 0.5})
+    assert usage['monthly'] == pytest.approx({'2024-12': 0.4, '2025-01': 0.2})
+
+
+def test_empty_and_unpaired_logs():
+    empty = {'total': 0.0, 'daily': {}, 'weekly': {}, 'monthly': {}}
+    assert aggregate_usage([]) == empty
+    assert aggregate_usage([_log('2024-01-01 10:00:00', 'true')]) == empty
@@ -0,0 +1,81 @@
+import json
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from model_artifact import LazyModel, LinearArtifact, artifact_path, save_linear_artifact
+
+
+@pytest.fixture
+def trained(tmp_path):
+    X = np.array([[1.0, 2.0], [2.0, 1.0], [3.0, 5.0], [4.0, 3.0]])
+    model = LinearRegression().fit(X, X @ [2.0, -1.0] + 0.5)
+    path = str(tmp_path / 'model.pkl')
+    joblib.dump(model, path)
+    save_linear_artifact(model, artifact_path(path), source_path=path)
+    return model, path
+
+
+def test_artifact_path():
+    assert artifact_path('dir/energy_consumption_model.pkl') == 'dir/energy_consumption_model.json'
+
+
+def test_artifact_predicts_like_the_model(trained):
+    model, path = trained
+    artifact = LinearArtifact.load(artifact_path(path))
+    X = np.array([[0.5, 7.0], [10.0, -2.0]])
+
+    np.testing.assert_allclose(artifact.predict(X), model.predict(X))
+    np.testing.assert_allclose(artifact.predict([0.5, 7.0]), model.predict(X[:1]))
+    with pytest.raises(ValueError):
+        artifact.predict([[1.0, 2.0, 3.0]])
+
+
+def test_lazy_model_uses_the_matching_artifact(trained):
+    _, path = trained
+    lazy = LazyModel(path)
+    assert not lazy.is_loaded()
+    assert isinstance(lazy.load(), LinearArtifact)
+
+
+def test_lazy_model_ignores_an_artifact_from_another_pickle(trained, tmp_path):
+    model, path = trained
+    # Pickle treinado de novo depois do JSON: o hash gravado não confere mais
+    retrained = LinearRegression().fit([[0.0, 0.0], [1.0, 1.0], [2.0, 0.0]], [1.0, 2.0, 4.0])
+    joblib.dump(retrained, path)
+
+    loaded = LazyModel(path).load()
+    assert isinstance(loaded, LinearRegression)
+    np.testing.assert_allclose(loaded.coef_, retrained.coef_)
+
+
+def test_lazy_model_ignores_an_artifact_without_hash(trained):
+    model, path = trained
+    with open(artifact_path(path), 'r') as f:
+        data = json.load(f)
+    del data['source_sha256']
+    with open(artifact_path(path), 'w') as f:
+        json.dump(data, f)
+
+    assert isinstance(LazyModel(path).load(), LinearRegression)
+
+
+def test_lazy_model_without_files(tmp_path):
+    lazy = LazyModel(str(tmp_path / 'missing.pkl'))
+    assert not lazy.try_load()
+    with pytest.raises(FileNotFoundError):
+        lazy.predict([[1.0]])
+
+
+def test_unsupported_artifact_version(trained):
+    _, path = trained
+    with open(artifact_path(path), 'r') as f:
+        data = json.load(f)
+    data['version'] = 999
+    with open(artifact_path(path), 'w') as f:
+        json.dump(data, f)
+
+    with pytest.raises(ValueError):
+        LinearArtifact.load(artifact_path(path))
@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+
+import online_scorer
+from online_scorer import CompiledForest, OnlineScorer, RunningStats
+
+
+@pytest.fixture
+def scorer():
+    scorer = OnlineScorer(refit_every=10 ** 9)
+    yield scorer
+    scorer.close()
+
+
+def test_running_stats_match_numpy():
+    values = np.random.default_rng(0).normal(220, 5, 1000)
+    stats = RunningStats()
+    for value in values:
+        stats.update(value)
+
+    assert stats.count == len(values)
+    assert stats.mean == pytest.approx(values.mean())
+    assert stats.variance == pytest.approx(values.var(ddof=1))
+    assert stats.std == pytest.approx(values.std(ddof=1))
+
+
+def test_running_stats_single_value_has_zero_variance():
+    stats = RunningStats()
+    stats.update(10.0)
+    assert stats.variance == 0.0
+
+
+def test_band_excludes_the_current_reading(scorer):
+    for _ in range(9):
+        scorer.score('a', 220.0)
+    result = scorer.score('a', 300.0)
+
+    # Os limites vêm só das 9 leituras anteriores
+    assert result['mean_voltage'] == 220.0
+    assert result['voltage_upper_limit'] == pytest.approx(242.0)
+    assert result['outside_band']
+    assert result['readings'] == 10
+    assert scorer.stats('a')['mean_voltage'] == pytest.approx(228.0)
+
+
+def test_first_reading_has_no_band(scorer):
+    result = scorer.score('a', 220.0, current=1.0)
+    assert result['mean_voltage'] is None
+    assert result['voltage_lower_limit'] is None
+    assert not result['outside_band']
+    assert not result['anomaly']
+
+
+def test_device_id_is_stored_as_text(scorer):
+    scorer.score(7, 220.0)
+    scorer.score('7', 221.0)
+    assert len(scorer) == 1
+    assert scorer.stats(7)['readings'] == 2
+
+
+def test_lru_evicts_least_recently_seen_device():
+    scorer = OnlineScorer(max_devices=2, refit_every=10 ** 9)
+    try:
+        scorer.score('a', 220.0)
+        scorer.score('b', 220.0)
+        scorer.score('a', 220.0)
+        scorer.score('c', 220.0)
+        assert scorer.stats('b') is None
+        assert scorer.stats('a') is not None
+        assert scorer.evicted == 1
+    finally:
+        scorer.close()
+
+
+@pytest.mark.parametrize('n_features', [1, 2])
+def test_compiled_forest_matches_sklearn(n_features):
+    rng = np.random.default_rng(1)
+    X = np.round(rng.normal(220, 5, (500, n_features)), 1)
+    scaler = StandardScaler().fit(X)
+    model = IsolationForest(contamination=0.05, random_state=42).fit(scaler.transform(X))
+    forest = CompiledForest(scaler, model)
+
+    # Inclui valores repetidos, que caem exatamente nos limiares das árvores
+    test = np.vstack([X, np.round(rng.normal(220, 20, (500, n_features)), 1)])
+    np.testing.assert_allclose(forest.score_samples(test), model.score_samples(scaler.transform(test)),
+                               rtol=0, atol=1e-12)
+    expected = model.predict(scaler.transform(test)) == -1
+    assert [forest.is_anomaly(row) for row in test] == expected.tolist()
+
+
+def test_refit_error_is_reported_in_stats(scorer, monkeypatch):
+    def broken_forest(**kwargs):
+        raise RuntimeError('sem memória')
+
+    monkeypatch.setattr(online_scorer, 'IsolationForest', broken_forest)
+    state = scorer._get_state('a')
+    scorer._refit('a', state, [(220.0, None)] * 20)
+
+    stats = scorer.stats('a')
+    assert stats['refit_error'] == 'RuntimeError: sem memória'
+    assert not stats['has_model']
+    assert not state.refitting
+
+
+def test_anomaly_needs_band_and_model(scorer):
+    values = np.random.default_rng(2).normal(220, 1, 500)
+    for value in values:
+        scorer.score('a', float(value))
+    state = scorer._get_state('a')
+    scorer._refit('a', state, list(state.history))
+
+    assert scorer.stats('a')['refit_error'] is None
+    assert scorer.score('a', 300.0)['anomaly']
+    normal = scorer.score('a', 220.0)
+    assert not normal['outside_band']
+    assert normal['model_anomaly'] is None
+    assert not normal['anomaly']
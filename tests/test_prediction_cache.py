@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+import consumo_flask
+from prediction_cache import PredictionCache
+
+
+class RecordingModel:
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=float)
+        self.calls.append(X)
+        return X[:, 0] / 1000 * X[:, 1]
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = RecordingModel()
+    monkeypatch.setattr(consumo_flask, 'model', model)
+    monkeypatch.setattr(consumo_flask, 'prediction_cache', PredictionCache(max_size=100, ttl=3600))
+    return model
+
+
+def test_key_rounds_hours():
+    cache = PredictionCache(hours_precision=2)
+    assert cache.key(60, 1.23456) == (60.0, 1.23)
+    assert cache.key(60, 1.2349) == cache.key(60.0, 1.23)
+
+
+def test_lru_eviction_and_stats():
+    cache = PredictionCache(max_size=2)
+    cache.put('a', 1.0)
+    cache.put('b', 2.0)
+    assert cache.get('a') == 1.0
+    cache.put('c', 3.0)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1.0
+    stats = cache.stats()
+    assert (stats['size'], stats['hits'], stats['misses']) == (2, 2, 1)
+
+
+def test_expired_items_are_dropped(monkeypatch):
+    cache = PredictionCache(ttl=10)
+    now = [100.0]
+    monkeypatch.setattr('prediction_cache.time.monotonic', lambda: now[0])
+    cache.put('a', 1.0)
+    now[0] = 111.0
+    assert cache.get('a') is None
+    assert cache.stats()['size'] == 0
+
+
+def test_predict_energy_uses_exact_features(model):
+    predictions = consumo_flask.predict_energy([(60, 1.23456), (100, 2.0)])
+
+    # O modelo recebe as horas exatas; o arredondamento é só da chave do cache
+    np.testing.assert_array_equal(model.calls[0], [[60, 1.23456], [100, 2.0]])
+    assert predictions == pytest.approx([0.06 * 1.23456, 0.2])
+
+
+def test_predict_energy_batches_only_the_misses(model):
+    consumo_flask.predict_energy([(60, 1.0)])
+    predictions = consumo_flask.predict_energy([(60, 1.001), (100, 3.0)])
+
+    # (60, 1.001) cai na chave de (60, 1.0), já em cache
+    assert len(model.calls) == 2
+    np.testing.assert_array_equal(model.calls[1], [[100, 3.0]])
+    assert predictions[0] == pytest.approx(0.06)
+
+
+def test_batch_endpoint_reports_invalid_devices(model):
+    client = consumo_flask.app.test_client()
+    logs = [{'timeStr': '2024-01-01 10:00:00', 'value': 'true'},
+            {'timeStr': '2024-01-01 12:00:00', 'value': 'false'}]
+    response = client.post('/predictLamp/batch', json={'devices': [
+        {'device_power': 100, 'logs': logs},
+        {'device_power': 0, 'logs': logs},
+    ]})
+
+    predictions = response.get_json()['predictions']
+    assert response.status_code == 200
+    assert predictions[0]['predicted_monthly_energy'] == pytest.approx(0.2)
+    assert predictions[1] == {'error': 'Device power must be greater than zero'}
+    assert len(model.calls) == 1
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from robust_detector import MIN_READINGS, detect_sorted, group_bounds, score_sorted
+
+
+def _per_device_rolling_median(values, bounds, window):
+    # Referência: um rolling do pandas por dispositivo, com a janela truncada nas pontas
+    return np.concatenate([
+        pd.Series(values[start:end]).rolling(window, center=True, min_periods=1).median().to_numpy()
+        for start, end in zip(bounds[:-1], bounds[1:])
+    ])
+
+
+def test_group_bounds_keeps_the_original_order_inside_each_device():
+    order, device_ids, bounds = group_bounds(pd.Series(['b', 'a', 'b', 'c', 'a']))
+    assert device_ids.tolist() == ['b', 'a', 'c']
+    assert bounds.tolist() == [0, 2, 4, 5]
+    assert order.tolist() == [0, 2, 1, 4, 3]
+
+
+@pytest.mark.parametrize('counts', [[1], [5, 1, 200, 30], [61, 62, 60, 3, 1000]])
+def test_rolling_median_never_crosses_devices(counts):
+    rng = np.random.default_rng(sum(counts))
+    bounds = np.concatenate([[0], np.cumsum(counts)])
+    # Níveis bem diferentes por dispositivo: qualquer vazamento entre eles muda a mediana
+    voltage = np.concatenate([rng.normal(100 * (i + 1), 2, n) for i, n in enumerate(counts)])
+
+    scores = score_sorted(voltage, bounds, window=61)
+    expected = _per_device_rolling_median(voltage, bounds, 61)
+    np.testing.assert_array_equal(scores['median'], expected)
+
+    deviation = np.abs(voltage - expected)
+    mad = _per_device_rolling_median(deviation, bounds, 61) * 1.4826
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.testing.assert_allclose(scores['score'][mad > 0], (deviation / mad)[mad > 0])
+
+
+def test_band_uses_the_device_mean():
+    voltage = np.array([100.0, 110.0, 120.0, 200.0, 200.0])
+    scores = score_sorted(voltage, np.array([0, 3, 5]))
+    np.testing.assert_allclose(scores['lower_limit'], [99.0] * 3 + [180.0] * 2)
+    np.testing.assert_allclose(scores['upper_limit'], [121.0] * 3 + [220.0] * 2)
+
+
+def test_spike_is_flagged_and_constant_window_scores_infinite():
+    voltage = np.full(100, 220.0)
+    voltage[50] = 300.0
+    anomaly, scores = detect_sorted(voltage, np.array([0, 100]))
+
+    assert np.flatnonzero(anomaly).tolist() == [50]
+    assert scores['score'][50] == np.inf
+    assert scores['score'][0] == 0.0
+
+
+def test_small_devices_are_ignored():
+    voltage = np.concatenate([np.full(MIN_READINGS - 1, 220.0), np.full(50, 220.0)])
+    voltage[[3, 30]] = 300.0
+    anomaly, _ = detect_sorted(voltage, np.array([0, MIN_READINGS - 1, MIN_READINGS + 49]))
+    assert np.flatnonzero(anomaly).tolist() == [30]
+
+
+def test_empty_input():
+    anomaly, scores = detect_sorted(np.empty(0), np.array([0]))
+    assert anomaly.shape == (0,)
+    assert all(values.shape == (0,) for values in scores.values())
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from anomalia_ia import find_simultaneous_anomalies
+
+
+def _brute_force_clusters(timestamps, time_window):
+    # Versão direta da regra: uma anomalia entra no cluster da anterior se estiver dentro da janela dela
+    clusters = []
+    for timestamp in sorted(timestamps):
+        if clusters and timestamp - clusters[-1][-1] <= time_window:
+            clusters[-1].append(timestamp)
+        else:
+            clusters.append([timestamp])
+    return clusters
+
+
+def test_overlapping_windows_form_one_cluster():
+    anomalies = pd.DataFrame({
+        'device_id': ['a', 'b', 'c', 'a'],
+        'timestamp': [0, 50000, 100000, 500000],
+    })
+    sorted_anomalies, clusters = find_simultaneous_anomalies(anomalies, 60000)
+
+    assert sorted_anomalies['cluster_id'].tolist() == [0, 0, 0, 1]
+    assert clusters['n_anomalies'].tolist() == [3, 1]
+    assert clusters.loc[0, 'window_start'] == 0
+    assert clusters.loc[0, 'window_end'] == 160000
+    assert clusters.loc[0, 'devices'] == frozenset({'a', 'b', 'c'})
+    assert clusters.loc[1, 'devices'] == frozenset({'a'})
+
+
+def test_window_count_counts_anomalies_inside_each_window():
+    anomalies = pd.DataFrame({'device_id': ['a'] * 4, 'timestamp': [0, 10, 20, 100]})
+    sorted_anomalies, _ = find_simultaneous_anomalies(anomalies, 15)
+
+    # A janela de 0 alcança 10 e a de 10 alcança 20 (o fim da janela é inclusivo)
+    assert sorted_anomalies['window_count'].tolist() == [2, 2, 1, 1]
+
+
+def test_unsorted_input_and_duplicates():
+    anomalies = pd.DataFrame({
+        'device_id': ['b', 'a', 'a', 'c'],
+        'timestamp': [70, 0, 0, 200],
+    })
+    sorted_anomalies, clusters = find_simultaneous_anomalies(anomalies, 100)
+
+    assert sorted_anomalies['timestamp'].tolist() == [0, 70, 200]
+    assert clusters['n_anomalies'].tolist() == [2, 1]
+
+
+def test_matches_brute_force_on_random_timestamps():
+    rng = np.random.default_rng(0)
+    timestamps = rng.integers(0, 10 ** 6, 500)
+    anomalies = pd.DataFrame({'device_id': rng.integers(0, 20, 500).astype(str), 'timestamp': timestamps})
+    _, clusters = find_simultaneous_anomalies(anomalies.drop_duplicates(), 5000)
+
+    expected = _brute_force_clusters(anomalies.drop_duplicates()['timestamp'].tolist(), 5000)
+    assert clusters['n_anomalies'].tolist() == [len(cluster) for cluster in expected]
+    assert clusters['window_start'].tolist() == [cluster[0] for cluster in expected]
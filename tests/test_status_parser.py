@@ -0,0 +1,75 @@
+import ast
+import math
+
+import numpy as np
+
+from status_parser import parse_status, parse_status_column
+
+STATUS = ("[{'code': 'switch_1', 'value': True, 't': 1704067200000}, "
+          "{'code': 'cur_current', 'value': 12, 't': 1704067200001}, "
+          "{'code': 'cur_power', 'value': 154, 't': 1704067200002}, "
+          "{'code': 'cur_voltage', 'value': 2227, 't': 1704067200003}]")
+
+
+def _literal_eval_reference(status_str, code):
+    # Comportamento anterior: ast.literal_eval e o primeiro item com o código, dividido por 10
+    for item in ast.literal_eval(status_str):
+        if code in item.get('code', ''):
+            return float(item['value']) / 10, item.get('t')
+    return None, None
+
+
+def test_parse_status_matches_literal_eval():
+    result = parse_status(STATUS)
+
+    assert (result['voltage'], result['voltage_t']) == _literal_eval_reference(STATUS, 'cur_voltage')
+    assert (result['current'], result['current_t']) == _literal_eval_reference(STATUS, 'cur_current')
+    assert (result['power'], result['power_t']) == _literal_eval_reference(STATUS, 'cur_power')
+
+
+def test_strings_containing_constants_use_the_token_path():
+    status = "[{'code': 'cur_voltage', 'value': 2200, 't': 5, 'name': 'True None'}]"
+    assert parse_status(status, fields=('voltage',)) == {'voltage': 220.0, 'voltage_t': 5.0}
+
+
+def test_python_only_literals_fall_back_to_literal_eval():
+    # Tupla e aspas internas não passam pela gramática do caminho rápido
+    status = "({'code': 'cur_voltage', 'value': 2200, 't': 7, 'note': \"it's\"},)"
+    assert parse_status(status, fields=('voltage',)) == {'voltage': 220.0, 'voltage_t': 7.0}
+
+
+def test_malformed_status_invalidates_every_field():
+    for status in ("[{'code': 'cur_voltage', 'value': ", None, 42, "not a list"):
+        assert parse_status(status) == dict.fromkeys(
+            ['voltage', 'voltage_t', 'current', 'current_t', 'power', 'power_t'])
+
+
+def test_bad_value_invalidates_only_its_field():
+    status = ("[{'code': 'cur_voltage', 'value': 2200, 't': 1}, "
+              "{'code': 'cur_current', 'value': 'n/a', 't': 2}]")
+    result = parse_status(status, fields=('voltage', 'current'))
+
+    assert result == {'voltage': 220.0, 'voltage_t': 1.0, 'current': None, 'current_t': None}
+
+
+def test_bad_timestamp_invalidates_only_the_timestamp():
+    status = "[{'code': 'cur_voltage', 'value': 2200, 't': 'later'}]"
+    assert parse_status(status, fields=('voltage',)) == {'voltage': 220.0, 'voltage_t': None}
+
+
+def test_parse_status_column_uses_nan_for_missing_values():
+    statuses = [STATUS, "[{'code': 'cur_voltage', 'value': 2300}]", 'broken', None]
+    columns = parse_status_column(statuses, fields=('voltage', 'current'))
+
+    assert set(columns) == {'voltage', 'voltage_t', 'current', 'current_t'}
+    assert columns['voltage'].dtype == np.float64
+    np.testing.assert_array_equal(columns['voltage'], [222.7, 230.0, np.nan, np.nan])
+    np.testing.assert_array_equal(columns['current'], [1.2, np.nan, np.nan, np.nan])
+    assert columns['voltage_t'][0] == 1704067200003
+    assert math.isnan(columns['voltage_t'][1])
+
+
+def test_parse_status_column_empty_input():
+    columns = parse_status_column([], fields=('voltage',))
+    assert columns['voltage'].shape == (0,)
+    assert columns['voltage_t'].shape == (0,)
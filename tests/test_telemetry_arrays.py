@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+from anomalia_ia_media_dispositivo import detect_anomalies_fast
+from telemetry_arrays import TelemetryArrays, as_telemetry
+
+
+def _logs():
+    return pd.DataFrame({
+        'source': ['DeviceLog', 'CafeteiraLog', 'DeviceLog', 'GeladeiraLog', 'DeviceLog', 'DeviceLog'],
+        'rowid': [1, 2, 3, 4, 5, 6],
+        'device_id': ['b', 'a', 'b', 'c', 'a', 'b'],
+        'voltage': [220.0, 110.0, np.nan, 127.0, 111.0, 221.0],
+        'timestamp': [3000.0, 1000.0, 2000.0, np.nan, 500.0, 1000.0],
+    })
+
+
+def test_from_frame_builds_csr_offsets_in_order_of_appearance():
+    telemetry = TelemetryArrays.from_frame(_logs())
+
+    # A leitura sem voltagem é descartada; a ordem original vale dentro de cada dispositivo
+    assert telemetry.device_ids.tolist() == ['b', 'a', 'c']
+    assert telemetry.offsets.tolist() == [0, 2, 4, 5]
+    assert telemetry.rowid.tolist() == [1, 6, 2, 5, 4]
+    assert telemetry.fields['voltage'].dtype == np.float32
+    assert telemetry.position('c') == 2 and telemetry.position('x') is None
+
+    # As colunas de um dispositivo são views dos arrays do container
+    columns = telemetry.device('a')
+    assert columns['rowid'].tolist() == [2, 5]
+    assert np.shares_memory(columns['rowid'], telemetry.rowid)
+
+
+def test_from_chunks_sorts_by_timestamp_with_missing_last():
+    logs = _logs()
+    chunks = [logs.iloc[:3], logs.iloc[3:]]
+    telemetry = TelemetryArrays.from_chunks(chunks, fields=('voltage',), required=('voltage',))
+
+    assert telemetry.device_ids.tolist() == ['b', 'a', 'c']
+    assert telemetry.offsets.tolist() == [0, 2, 4, 5]
+    assert telemetry.rowid.tolist() == [6, 1, 5, 2, 4]
+    assert np.isnan(telemetry.timestamp[-1])
+
+    # Uma leitura sem timestamp vai para o fim do dispositivo
+    late = pd.DataFrame({'source': ['DeviceLog'] * 3, 'rowid': [1, 2, 3], 'device_id': 'd',
+                         'voltage': [1.0, 2.0, 3.0], 'timestamp': [np.nan, 20.0, 10.0]})
+    assert TelemetryArrays.from_chunks([late], fields=('voltage',)).rowid.tolist() == [3, 2, 1]
+
+
+def test_frames_match_the_container_slices():
+    telemetry = TelemetryArrays.from_frame(_logs())
+    frame = telemetry.to_frame()
+
+    for i, (device_id, device_logs) in enumerate(telemetry.iter_device_frames()):
+        start, end = telemetry.offsets[i], telemetry.offsets[i + 1]
+        expected = frame.iloc[start:end].reset_index(drop=True)
+        # O device_id é categórico no to_frame e um valor repetido no device_frame
+        pd.testing.assert_frame_equal(device_logs.drop(columns='device_id'), expected.drop(columns='device_id'))
+        assert device_logs['device_id'].tolist() == expected['device_id'].tolist() == [device_id] * (end - start)
+
+    assert telemetry.frame_for('a')['source'].tolist() == ['CafeteiraLog', 'DeviceLog']
+    assert telemetry.frame_for('a')['voltage'].dtype == np.float64
+
+
+def test_frame_for_unknown_device_is_empty_with_the_same_columns():
+    telemetry = TelemetryArrays.from_frame(_logs())
+    missing = telemetry.frame_for('x')
+
+    assert missing.empty
+    assert missing.columns.tolist() == telemetry.frame_for('a').columns.tolist()
+
+
+def test_as_telemetry_keeps_an_existing_container():
+    telemetry = TelemetryArrays.from_frame(_logs())
+    assert as_telemetry(telemetry) is telemetry
+    assert telemetry.nbytes == sum(array.nbytes for array in (
+        telemetry.offsets, telemetry.source, telemetry.rowid, telemetry.timestamp, telemetry.fields['voltage']))
+
+
+def test_detect_anomalies_fast_builds_frames_only_for_flagged_devices():
+    n = 100
+    voltage = np.concatenate([np.full(n, 220.0), np.full(n, 127.0), np.full(5, 220.0)])
+    voltage[30] = 300.0
+    logs = pd.DataFrame({
+        'source': 'DeviceLog',
+        'rowid': np.arange(len(voltage)),
+        'device_id': np.repeat(['spike', 'flat', 'small'], [n, n, 5]),
+        'voltage': voltage,
+        'timestamp': np.arange(len(voltage)) * 1000.0,
+    })
+
+    results = {device_id: (device_logs, anomalies) for device_id, device_logs, anomalies in detect_anomalies_fast(logs)}
+    assert list(results) == ['spike', 'flat', 'small']
+
+    device_logs, anomalies = results['spike']
+    assert len(device_logs) == n
+    assert {'lower_limit', 'upper_limit', 'robust_score'} <= set(device_logs.columns)
+    assert anomalies['rowid'].tolist() == [30]
+
+    for device_id in ('flat', 'small'):
+        device_logs, anomalies = results[device_id]
+        assert device_logs.empty and anomalies.empty
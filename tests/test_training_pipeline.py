@@ -0,0 +1,147 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from training_pipeline import (FeatureBuilder, ModelRegistry, _ShardTrainer, feature_names, iter_history_chunks,
+                               train_fleet)
+
+
+def _history(n_devices=6, n_months=24, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for d in range(n_devices):
+        base = rng.uniform(20, 80)
+        for m in range(n_months):
+            rows.append({
+                'device_id': f'dev{d}',
+                'device_class': 'lampada' if d % 2 else 'geladeira',
+                'date': f'{2020 + m // 12}-{m % 12 + 1:02d}-01 00:00:00.000',
+                'totalCoust': round(base + 5 * np.sin(2 * np.pi * m / 12) + rng.normal(0, 1), 2),
+            })
+    return pd.DataFrame(rows).sort_values('date', kind='stable')
+
+
+def _write_ndjson(frame, path):
+    with open(path, 'w') as f:
+        for record in frame.to_dict('records'):
+            f.write(json.dumps(record) + '\n')
+    return str(path)
+
+
+def test_lags_are_the_same_across_chunk_boundaries(tmp_path):
+    path = _write_ndjson(_history(), tmp_path / 'history.ndjson')
+
+    def build(chunk_size):
+        builder = FeatureBuilder(n_lags=3)
+        parts = [builder.transform(chunk) for chunk in iter_history_chunks(path, chunk_size)]
+        return np.concatenate([X for _, X, _ in parts]), np.concatenate([y for _, _, y in parts])
+
+    X_whole, y_whole = build(10 ** 6)
+    X_chunked, y_chunked = build(7)
+    assert X_whole.shape == (6 * 21, len(feature_names(3)))
+    order_whole, order_chunked = np.lexsort(X_whole.T), np.lexsort(X_chunked.T)
+    np.testing.assert_allclose(X_whole[order_whole], X_chunked[order_chunked])
+    np.testing.assert_allclose(y_whole[order_whole], y_chunked[order_chunked])
+
+
+def test_missing_month_drops_rows_that_need_it():
+    chunk = pd.DataFrame({
+        'device_id': ['a'] * 4,
+        'device_class': 'default',
+        'month': np.array([0, 1, 3, 4]),
+        'totalCoust': [1.0, 2.0, 4.0, 5.0],
+    })
+    rows, X, y = FeatureBuilder(n_lags=1).transform(chunk)
+
+    # O mês 3 não tem o mês 2 anterior
+    assert rows.tolist() == [1, 3]
+    assert X[:, 0].tolist() == [1.0, 4.0]
+    assert y.tolist() == [2.0, 5.0]
+
+
+def test_scaler_is_frozen_after_the_first_batch():
+    rng = np.random.default_rng(0)
+    trainer = _ShardTrainer(min_batch=50, epochs=5, random_state=0)
+    keys = np.array(['a'] * 50, dtype=object)
+
+    first = rng.normal(0, 1, (50, 3))
+    trainer.add(keys, first, first @ [1.0, 2.0, 3.0])
+    scaler = trainer.models['a']['scaler']
+    mean, scale = scaler.mean_.copy(), scaler.scale_.copy()
+
+    # Lotes seguintes em outra escala não mexem no escalonador
+    for i in range(1, 5):
+        X = rng.normal(10 * i, 1 + i, (50, 3))
+        trainer.add(keys, X, X @ [1.0, 2.0, 3.0])
+    assert trainer.models['a']['scaler'] is scaler
+    np.testing.assert_array_equal(scaler.mean_, mean)
+    np.testing.assert_array_equal(scaler.scale_, scale)
+    np.testing.assert_allclose(scaler.mean_, first.mean(axis=0))
+
+
+def test_unscaled_coefficients_reproduce_the_model():
+    rng = np.random.default_rng(1)
+    trainer = _ShardTrainer(min_batch=64, epochs=10, random_state=0)
+    for i in range(10):
+        X = rng.normal(5 * i, 1 + i, (64, 4))
+        trainer.add(np.array(['a'] * 64, dtype=object), X, X @ [1.0, -2.0, 0.5, 3.0] + 7)
+    state = trainer.models['a']
+    coef, intercept, rows, mae = trainer.finish()['a']
+
+    X_test = rng.normal(20, 10, (20, 4))
+    expected = state['model'].predict(state['scaler'].transform(X_test))
+    np.testing.assert_allclose(X_test @ coef + intercept, expected, rtol=1e-10, atol=1e-8)
+    assert rows == 640
+    assert np.isfinite(mae)
+
+
+@pytest.mark.parametrize('group_by, keys', [
+    ('device', {f'dev{d}' for d in range(6)}),
+    ('class', {'geladeira', 'lampada'}),
+    ('global', {'global'}),
+])
+def test_train_fleet_writes_a_registry_version(tmp_path, group_by, keys):
+    path = _write_ndjson(_history(), tmp_path / 'history.ndjson')
+    registry = str(tmp_path / 'registry')
+
+    version_path = train_fleet(path, registry, group_by=group_by, n_jobs=1, chunk_size=20, min_batch=8)
+    assert os.path.basename(version_path) == 'v0001'
+
+    loaded = ModelRegistry(registry)
+    assert loaded.version == 'v0001'
+    assert set(loaded.keys.tolist()) == keys
+    assert loaded.manifest['features'] == feature_names(3)
+    assert loaded.manifest['training_rows'] == 6 * 21
+
+    prediction = loaded.predict(next(iter(keys)), np.full(len(feature_names(3)), 50.0))
+    assert prediction.shape == (1,)
+    assert np.isfinite(prediction).all()
+
+
+def test_registry_versions_and_latest(tmp_path):
+    path = _write_ndjson(_history(n_devices=2), tmp_path / 'history.ndjson')
+    registry = str(tmp_path / 'registry')
+    train_fleet(path, registry, group_by='global', n_jobs=1)
+    train_fleet(path, registry, group_by='global', n_jobs=1)
+
+    assert ModelRegistry(registry).version == 'v0002'
+    assert ModelRegistry(registry, 'v0001').version == 'v0001'
+
+
+def test_invalid_group_by(tmp_path):
+    with pytest.raises(ValueError):
+        train_fleet(str(tmp_path / 'missing.ndjson'), str(tmp_path / 'registry'), group_by='hourly')
+
+
+def test_worker_processes_train_the_same_models(tmp_path):
+    path = _write_ndjson(_history(), tmp_path / 'history.ndjson')
+    serial = ModelRegistry(os.path.dirname(train_fleet(path, str(tmp_path / 'serial'), n_jobs=1, chunk_size=20)))
+    sharded = ModelRegistry(os.path.dirname(train_fleet(path, str(tmp_path / 'sharded'), n_jobs=2, chunk_size=20)))
+
+    # Cada chave fica em um único processo e recebe os mesmos lotes, na mesma ordem
+    assert serial.keys.tolist() == sharded.keys.tolist()
+    np.testing.assert_allclose(serial.coef, sharded.coef)
+    np.testing.assert_allclose(serial.intercept, sharded.intercept)